@@ -7,16 +7,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app.core.dependencies import get_user_service
-from app.core.security import create_access_token
-from app.schemas.token import Token, TokenData
+from app.core.dependencies import get_session_service, get_user_service
+from app.core.query_budget import QueryBudget
+from app.schemas.token import RefreshRequest, Token
 from app.schemas.user import UserCreate, UserRead
 from app.services.auth import UserService
+from app.services.session import SessionService
 
 router = APIRouter(prefix='/auth', tags=['auth'])
 
 
-@router.post('/register', response_model=UserRead, status_code=status.HTTP_201_CREATED)
+@router.post(
+    '/register',
+    response_model=UserRead,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(QueryBudget(3))]
+)
 async def register_user(
         user_data: UserCreate,
         service: UserService = Depends(get_user_service)
@@ -41,10 +47,11 @@ async def register_user(
         ) from e
 
 
-@router.post('/token', response_model=Token)
+@router.post('/token', response_model=Token, dependencies=[Depends(QueryBudget(2))])
 async def login_for_access_token(
         form_data: OAuth2PasswordRequestForm = Depends(),
-        service: UserService = Depends(get_user_service)
+        service: UserService = Depends(get_user_service),
+        session_service: SessionService = Depends(get_session_service)
 ):
     """
     Аутентификация пользователя и получение JWT токена.
@@ -55,6 +62,7 @@ async def login_for_access_token(
 
     Возвращает:
     - access_token: JWT токен для авторизации
+    - refresh_token: токен для получения новой пары токенов без повторного ввода пароля
     """
     user = await service.authenticate_user(form_data.username, form_data.password)
     if not user:
@@ -63,7 +71,47 @@ async def login_for_access_token(
             detail='Неверное имя пользователя или пароль',
         )
 
-    token_data = TokenData(user_id=str(user.id))
-    access_token = create_access_token(token_data=token_data)
+    return await session_service.issue_tokens(user.id)
+
+
+@router.post('/refresh', response_model=Token, dependencies=[Depends(QueryBudget(2))])
+async def refresh_access_token(
+        refresh_data: RefreshRequest,
+        session_service: SessionService = Depends(get_session_service)
+):
+    """
+    Обновление пары токенов по refresh-токену.
+
+    Параметры:
+    - refresh_token: действующий refresh-токен
+
+    Возвращает:
+    - Новую пару access/refresh токенов (использованный refresh-токен отзывается)
+    """
+    try:
+        return await session_service.refresh(refresh_data.refresh_token)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        ) from e
+
 
-    return {'access_token': access_token}
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(QueryBudget(1))])
+async def logout(
+        refresh_data: RefreshRequest,
+        session_service: SessionService = Depends(get_session_service)
+):
+    """
+    Завершение сессии: отзыв refresh-токена.
+
+    Параметры:
+    - refresh_token: refresh-токен завершаемой сессии
+    """
+    try:
+        await session_service.revoke(refresh_data.refresh_token)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        ) from e
@@ -6,13 +6,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 
 from app.core.dependencies import get_chat_service, get_current_user
-from app.schemas.chat import ChatCreate, ChatRead
+from app.core.query_budget import QueryBudget
+from app.schemas.chat import ChatCreate, ChatRead, ChatRetentionUpdate
 from app.services.chat import ChatService
 
 router = APIRouter(prefix='/chats', tags=['chats'])
 
 
-@router.post('/', response_model=ChatRead, status_code=status.HTTP_201_CREATED)
+@router.post('/', response_model=ChatRead, status_code=status.HTTP_201_CREATED, dependencies=[Depends(QueryBudget(4))])
 async def create_chat(
         chat_data: ChatCreate,
         current_user_id: int = Depends(get_current_user),
@@ -37,3 +38,32 @@ async def create_chat(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         ) from e
+
+
+@router.put('/{chat_id}/retention', response_model=ChatRead, dependencies=[Depends(QueryBudget(3))])
+async def set_chat_retention(
+        chat_id: int,
+        data: ChatRetentionUpdate,
+        current_user_id: int = Depends(get_current_user),
+        service: ChatService = Depends(get_chat_service)
+):
+    """
+    Изменение срока хранения сообщений чата.
+
+    Параметры:
+    - chat_id: ID чата
+    - retention_days: срок хранения в днях (null - общий срок MESSAGE_RETENTION_DAYS)
+
+    Сообщения старше срока удаляются фоновой задачей. Срок меняет создатель группы
+    (для личного чата - любой из участников), остальным возвращается 403.
+
+    Возвращает:
+    - Чат с новым сроком хранения
+    """
+    try:
+        chat = await service.set_retention(chat_id, current_user_id, data.retention_days)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    if chat is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Срок хранения меняет только создатель чата')
+    return chat
@@ -3,16 +3,22 @@
 Содержит эндпоинты для создания групп и управления их участниками.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import TypeAdapter
 
 from app.core.dependencies import get_current_user, get_group_service
-from app.schemas.group import GroupCreate, GroupList, GroupRead
+from app.core.http_cache import conditional_response, make_etag
+from app.core.query_budget import QueryBudget
+from app.schemas.group import GroupCreate, GroupList, GroupMembersAdd, GroupRead
 from app.services.group import GroupService
 
 router = APIRouter(prefix='/groups', tags=['groups'])
 
+group_list_adapter = TypeAdapter(GroupList)
+members_adapter = TypeAdapter(list[int])
 
-@router.post('/', response_model=GroupRead, status_code=status.HTTP_201_CREATED)
+
+@router.post('/', response_model=GroupRead, status_code=status.HTTP_201_CREATED, dependencies=[Depends(QueryBudget(3))])
 async def create_group(
         group_data: GroupCreate,
         current_user: int = Depends(get_current_user),
@@ -31,8 +37,9 @@ async def create_group(
     return await service.create_group(group_data)
 
 
-@router.get('/', response_model=GroupList)
+@router.get('/', response_model=GroupList, dependencies=[Depends(QueryBudget(3))])
 async def get_user_groups(
+        request: Request,
         current_user: int = Depends(get_current_user),
         service: GroupService = Depends(get_group_service)
 ):
@@ -41,11 +48,17 @@ async def get_user_groups(
 
     Возвращает:
     - Список групп, в которых участвует пользователь
+
+    Поддерживает условные запросы (ETag / If-None-Match).
     """
-    return await service.get_user_groups(current_user)
+    versions = await service.get_user_group_versions(current_user)
+    etag = make_etag('groups', current_user, versions)
+    return await conditional_response(
+        request, etag, group_list_adapter, lambda: service.get_user_groups(current_user)
+    )
 
 
-@router.get('/{group_id}', response_model=GroupRead)
+@router.get('/{group_id}', response_model=GroupRead, dependencies=[Depends(QueryBudget(2))])
 async def get_group(
         group_id: int,
         current_user: int = Depends(get_current_user),
@@ -76,8 +89,9 @@ async def get_group(
     return group
 
 
-@router.get('/{group_id}/members', response_model=list[int])
+@router.get('/{group_id}/members', response_model=list[int], dependencies=[Depends(QueryBudget(2))])
 async def get_group_members(
+        request: Request,
         group_id: int,
         current_user: int = Depends(get_current_user),
         service: GroupService = Depends(get_group_service)
@@ -90,6 +104,8 @@ async def get_group_members(
 
     Возвращает:
     - Список ID участников группы
+
+    Поддерживает условные запросы (ETag / If-None-Match).
     """
     group = await service.get_group(group_id)
     if not group:
@@ -104,10 +120,17 @@ async def get_group_members(
             detail='Вы не являетесь участником этой группы'
         )
 
-    return await service.get_group_members(group_id)
+    etag = make_etag('group_members', group_id, await service.get_group_version(group_id))
+    return await conditional_response(
+        request, etag, members_adapter, lambda: service.get_group_members(group_id)
+    )
 
 
-@router.post('/{group_id}/members/{user_id}', status_code=status.HTTP_204_NO_CONTENT)
+@router.post(
+    '/{group_id}/members/{user_id}',
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(QueryBudget(3))]
+)
 async def add_group_member(
         group_id: int,
         user_id: int,
@@ -141,7 +164,50 @@ async def add_group_member(
         )
 
 
-@router.delete('/{group_id}/members/{user_id}', status_code=status.HTTP_204_NO_CONTENT)
+@router.post('/{group_id}/members', response_model=list[int], dependencies=[Depends(QueryBudget(3))])
+async def add_group_members(
+        group_id: int,
+        members_data: GroupMembersAdd,
+        current_user: int = Depends(get_current_user),
+        service: GroupService = Depends(get_group_service)
+):
+    """
+    Массовое добавление участников в группу.
+
+    Параметры:
+    - group_id: ID группы
+    - user_ids: список ID добавляемых пользователей
+
+    Возвращает:
+    - Актуальный список ID участников группы
+    """
+    group = await service.get_group(group_id)
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Группа не найдена'
+        )
+
+    if current_user not in group.members:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Вы не являетесь участником этой группы'
+        )
+
+    members = await service.add_members(group_id, members_data.user_ids)
+    if members is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Группа не найдена'
+        )
+    return members
+
+
+@router.delete(
+    '/{group_id}/members/{user_id}',
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(QueryBudget(4))]
+)
 async def remove_group_member(
         group_id: int,
         user_id: int,
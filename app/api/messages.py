@@ -3,19 +3,30 @@
 Содержит ручки для отправки сообщений и получения истории сообщений.
 Реализует пагинацию и фильтрацию сообщений по чатам.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import TypeAdapter
 
 from app.core.dependencies import get_current_user, get_message_service
-from app.schemas.message import MessageCreate, MessageRead
+from app.core.http_cache import conditional_response, make_etag
+from app.core.query_budget import QueryBudget
+from app.schemas.message import ChatSync, MessageCreate, MessageRead, SyncRequest, UnreadCount
 from app.services.message import MessageService
 
 router = APIRouter(prefix='/messages', tags=['messages'])
 
+history_adapter = TypeAdapter(list[MessageRead])
 
-@router.post('/{chat_id}/send', response_model=MessageRead, status_code=status.HTTP_201_CREATED)
+
+@router.post(
+    '/{chat_id}/send',
+    response_model=MessageRead,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(QueryBudget(7))]
+)
 async def send_message(
         chat_id: int,
         message_data: MessageCreate,
+        response: Response,
         current_user: int = Depends(get_current_user),
         service: MessageService = Depends(get_message_service)
 ):
@@ -25,27 +36,38 @@ async def send_message(
     Параметры:
     - chat_id: ID чата
     - text: текст сообщения
+    - client_message_id: необязательный ключ идемпотентности
 
     Возвращает:
     - Отправленное сообщение с ID и временем отправки
+
+    Повтор запроса с тем же client_message_id не создает дубликат:
+    возвращается ранее созданное сообщение со статусом 200.
     """
     try:
-        return await service.send_message(
+        message, created = await service.send_message_once(
             chat_id=chat_id,
             sender_id=current_user,
-            text=message_data.text
+            text=message_data.text,
+            client_message_id=message_data.client_message_id
         )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e)) from e
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return message
 
 
-@router.get('/history/{chat_id}', response_model=list[MessageRead])
+@router.get('/history/{chat_id}', response_model=list[MessageRead], dependencies=[Depends(QueryBudget(6))])
 async def get_chat_history(
+        request: Request,
         chat_id: int,
         current_user: int = Depends(get_current_user),
         service: MessageService = Depends(get_message_service),
         limit: int = 100,
         offset: int = 0,
+        before_seq: int | None = None,
+        include_sender: bool = False,
 ):
     """
     Получение истории сообщений чата.
@@ -54,11 +76,91 @@ async def get_chat_history(
     - chat_id: ID чата
     - limit: количество сообщений (по умолчанию 100)
     - offset: смещение (для пагинации)
+    - before_seq: курсор следующей страницы - seq последнего полученного сообщения
+      (в отличие от offset, не замедляется по мере листания вглубь истории)
+    - include_sender: встроить краткие профили отправителей (id, username)
 
     Возвращает:
     - Список сообщений в хронологическом порядке
+
+    Поддерживает условные запросы: в ответе передается заголовок ETag,
+    при совпадении If-None-Match возвращается 304 без тела.
     """
     try:
-        return await service.get_chat_history(chat_id, current_user, limit, offset)
+        version = await service.get_chat_version(chat_id, current_user)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e)) from e
+
+    etag = make_etag('history', chat_id, version, limit, offset, before_seq, include_sender)
+    return await conditional_response(
+        request,
+        etag,
+        history_adapter,
+        lambda: service.get_chat_history(
+            chat_id,
+            current_user,
+            limit,
+            offset,
+            before_seq=before_seq,
+            include_sender=include_sender,
+            check_access=False
+        )
+    )
+
+
+@router.post('/sync', response_model=list[ChatSync], dependencies=[Depends(QueryBudget(3))])
+async def sync_messages(
+        sync_data: SyncRequest,
+        current_user: int = Depends(get_current_user),
+        service: MessageService = Depends(get_message_service)
+):
+    """
+    Синхронизация: новые сообщения по всем чатам пользователя за один запрос.
+
+    Параметры:
+    - chats: последний известный клиенту seq по чатам {chat_id: last_seq}
+    - limit: максимум сообщений на чат (по умолчанию 100)
+
+    Возвращает:
+    - Список чатов, в которых есть сообщения новее переданного seq, с этими сообщениями
+      по возрастанию seq; при has_more=true запрос повторяется с seq последнего полученного сообщения
+
+    Недоступные пользователю чаты пропускаются.
+    """
+    return await service.sync(current_user, sync_data.chats, sync_data.limit)
+
+
+@router.get('/inbox', response_model=list[MessageRead], dependencies=[Depends(QueryBudget(4))])
+async def get_inbox(
+        current_user: int = Depends(get_current_user),
+        service: MessageService = Depends(get_message_service),
+        limit: int = Query(50, ge=1, le=200),
+        before_id: int | None = None,
+        include_sender: bool = False,
+):
+    """
+    Получение входящих сообщений по всем чатам пользователя.
+
+    Параметры:
+    - limit: количество сообщений (по умолчанию 50)
+    - before_id: курсор следующей страницы - ID последнего полученного сообщения
+    - include_sender: встроить краткие профили отправителей (id, username)
+
+    Возвращает:
+    - Сообщения других участников, от новых к старым
+    """
+    return await service.get_inbox(current_user, limit, before_id, include_sender=include_sender)
+
+
+@router.get('/unread', response_model=list[UnreadCount], dependencies=[Depends(QueryBudget(3))])
+async def get_unread_counts(
+        current_user: int = Depends(get_current_user),
+        service: MessageService = Depends(get_message_service)
+):
+    """
+    Получение количества непрочитанных сообщений.
+
+    Возвращает:
+    - Список чатов с непрочитанными сообщениями и их количеством
+    """
+    return await service.get_unread_counts(current_user)
@@ -0,0 +1,38 @@
+"""
+Модуль поиска пользователей.
+Содержит ручку автодополнения username при создании чатов и групп.
+"""
+
+from fastapi import APIRouter, Depends, Query
+
+from app.core.dependencies import get_current_user, get_profile_service
+from app.core.query_budget import QueryBudget
+from app.schemas.user import UserSummary
+from app.services.profile import ProfileService
+
+router = APIRouter(prefix='/users', tags=['users'])
+
+
+@router.get(
+    '/search',
+    response_model=list[UserSummary],
+    dependencies=[Depends(get_current_user), Depends(QueryBudget(3))]
+)
+async def search_users(
+        q: str = Query(..., min_length=1, max_length=50),
+        limit: int = Query(20, ge=1, le=50),
+        service: ProfileService = Depends(get_profile_service)
+):
+    """
+    Поиск пользователей по username.
+
+    Параметры:
+    - q: начало username (регистр не учитывается); от трех символов в выдачу
+      добавляются и похожие username
+    - limit: количество пользователей (по умолчанию 20)
+
+    Возвращает:
+    - Краткие профили пользователей (id, username): сначала совпадения по началу
+      в алфавитном порядке, затем похожие
+    """
+    return await service.search(q, limit)
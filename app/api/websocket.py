@@ -2,19 +2,78 @@
 Модуль WebSocket соединений.
 Реализует real-time коммуникацию между пользователями через WebSocket.
 Обрабатывает подключения, аутентификацию и маршрутизацию сообщений.
+Сессия БД открывается на время обработки одного фрейма, а не на все время жизни сокета,
+поэтому простаивающие подключения не удерживают соединения из пула.
+События чатов рассылаются диспетчером outbox, запускаемым вместе с приложением.
 """
 
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
-from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from app.core.dependencies import get_message_service
+from app.core.dependencies import get_current_operator, get_message_service, get_profile_service
+from app.core.scheduler import scheduler
 from app.db.repositories.chat import ChatRepository
-from app.db.session import get_db
+from app.db.session import write_session
+from app.db.uow import UnitOfWork
+from app.services.message import MessageService
 from app.websocket.manager import ConnectionManager
+from app.websocket.outbox import OutboxDispatcher
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 manager = ConnectionManager()
+outbox_dispatcher = OutboxDispatcher(manager.publish)
+
+
+@asynccontextmanager
+async def frame_message_service() -> AsyncIterator[MessageService]:
+    """Сервис сообщений с собственной сессией БД для обработки одного фрейма."""
+    async with write_session() as db:
+        yield await get_message_service(db, UnitOfWork(db), await get_profile_service(db))
+
+
+@router.websocket('/ws')
+async def multiplexed_websocket_endpoint(
+        websocket: WebSocket,
+        token: str,
+        device_id: str | None = None
+):
+    """
+    Мультиплексированное WebSocket соединение: один сокет для всех чатов пользователя.
+
+    Параметры:
+    - token: JWT токен для аутентификации
+    - device_id: ID устройства; повторное подключение с тем же ID заменяет прежнее
+
+    Функционал:
+    - Подписка/отписка на чаты фреймами subscribe/unsubscribe (с проверкой доступа)
+    - Отправка/получение сообщений и статусов прочтения во всех подписанных чатах
+      (во входящих фреймах указывается chat_id)
+    """
+    try:
+        user_id = await manager.authenticate_token(token)
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    connection = await manager.connect(user_id, websocket, device_id)
+    try:
+        while True:
+            data = await websocket.receive_text()
+            async with frame_message_service() as message_service:
+                await manager.handle_message(connection, data, message_service)
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        logger.exception('WebSocket connection of user %s failed', user_id)
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+    finally:
+        manager.disconnect(connection)
 
 
 @router.websocket('/ws/{chat_id}')
@@ -22,7 +81,7 @@ async def websocket_endpoint(
         websocket: WebSocket,
         chat_id: int,
         token: str,
-        db: AsyncSession = Depends(get_db)
+        device_id: str | None = None
 ):
     """
     WebSocket соединение для реального времени.
@@ -30,30 +89,59 @@ async def websocket_endpoint(
     Параметры:
     - chat_id: ID чата
     - token: JWT токен для аутентификации
+    - device_id: ID устройства (необязательно)
 
     Функционал:
     - Отправка/получение сообщений в реальном времени
     - Обновление статусов прочтения
     """
     try:
-        # Аутентификация через токен
         user_id = await manager.authenticate_token(token)
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
 
+    try:
         # Проверка доступа к чату
-        chat_repo = ChatRepository(db)
-        if not await chat_repo.user_has_access(user_id, chat_id):
+        async with write_session() as db:
+            members = await ChatRepository(db).get_member_count(user_id, chat_id)
+        if members is None:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
 
         # Подключение
-        await manager.connect(user_id, chat_id, websocket)
+        connection = await manager.connect(user_id, websocket, device_id)
+        await manager.subscribe(connection, chat_id, members)
 
         try:
-            message_service = await get_message_service()
             while True:
                 data = await websocket.receive_text()
-                await manager.handle_message(user_id, chat_id, data, message_service)
+                async with frame_message_service() as message_service:
+                    await manager.handle_message(connection, data, message_service, chat_id)
         except WebSocketDisconnect:
-            manager.disconnect(user_id, chat_id)
+            pass
+        finally:
+            manager.disconnect(connection)
     except Exception:
+        logger.exception('WebSocket connection of user %s to chat %s failed', user_id, chat_id)
         await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+
+
+@router.get('/ws/stats', dependencies=[Depends(get_current_operator)])
+async def websocket_stats():
+    """
+    Статистика WebSocket-рассылки (только для операторов из OPERATOR_IDS).
+
+    Возвращает:
+    - large_chats: ID чатов в режиме шардированной рассылки
+    - fanout: метрики рассылки по чатам (число рассылок и получателей, отброшенные
+      из-за переполнения очередей сообщения, среднее/максимальное/последнее время в мс)
+    - outbox: курсор диспетчера событий, число доставленных событий, уведомлений
+      и опросов по таймауту и счетчики пропусков в последовательности id событий:
+      unresolved - пройденные курсором и еще не разрешенные, rolled_back - пропуски
+      откаченных транзакций, late - события, доставленные после пропуска курсором,
+      lost - пропуски, не разрешившиеся за срок хранения outbox
+    - scheduler: задачи обслуживания этого процесса (расписание, лидерство, число
+      запусков и ошибок, длительность последнего запуска, время до следующего)
+    """
+    return {**manager.stats(), 'outbox': outbox_dispatcher.stats(), 'scheduler': scheduler.stats()}
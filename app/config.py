@@ -2,6 +2,7 @@
 
 import logging
 
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 
 
@@ -16,6 +17,23 @@ class DataBaseSettings(BaseSettings):
     """Настройки подключенияк БД."""
 
     database_dsn: str
+    pool_timeout: float = 3.0
+
+
+class IdSettings(BaseSettings):
+    """
+    Настройки генератора идентификаторов.
+
+    WORKER_ID уникален для каждого процесса приложения. Если он не задан, процесс
+    при старте занимает свободный номер advisory-блокировкой (класс WORKER_LOCK_CLASS).
+    """
+
+    worker_id: int | None = Field(None, ge=0, le=31)
+    worker_lock_class: int = 4_802
+    worker_lease_retry_interval: float = 5.0
+    # Проверка, что блокировка номера все еще удерживается (соединение могло тихо оборваться)
+    worker_lease_probe_interval: float = 5.0
+    id_epoch_ms: int = 1_704_067_200_000  # 2024-01-01 00:00:00 UTC
 
 
 class AuthSettings(BaseSettings):
@@ -24,6 +42,134 @@ class AuthSettings(BaseSettings):
     secret_key: str
     token_algorythm: str = 'HS256'
     access_token_expire_minutes: int = 30
+    refresh_token_expire_days: int = 30
+    revocation_cache_size: int = 100_000
+    # Пользователи с доступом к служебной статистике (OPERATOR_IDS='[1, 2]')
+    operator_ids: set[int] = set()
+
+
+class CacheSettings(BaseSettings):
+    """Настройки внутрипроцессных кэшей."""
+
+    user_summary_cache_size: int = 10_000
+    response_cache_size: int = 1_000
+    response_cache_ttl: float = 30.0
+    send_dedupe_size: int = 100_000
+    send_dedupe_ttl: float = 300.0
+    user_search_cache_size: int = 2_000
+    user_search_cache_ttl: float = 60.0
+    user_search_cached_prefix: int = 3
+
+
+class InboxSettings(BaseSettings):
+    """Настройки проекции входящих сообщений."""
+
+    # Группы с большим числом участников не раскладываются по входящим при отправке
+    inbox_fanout_max_members: int = 500
+    # Счетчик непрочитанных большой группы не превышает этого значения
+    unread_count_limit: int = 1_000
+
+
+class WebSocketSettings(BaseSettings):
+    """Настройки WebSocket-рассылки."""
+
+    large_chat_threshold: int = 500
+    large_chat_member_threshold: int = 5_000
+    fanout_shards: int = 8
+    fanout_queue_size: int = 1_000
+    fanout_yield_every: int = 100
+    fanout_stats_size: int = 1_000
+    # Очередь рассылки одного подключения и время ожидания сокета (медленный клиент отключается)
+    send_queue_size: int = 256
+    send_timeout: float = 10.0
+    inbox_size: int = 100
+    inbox_ttl: float = 300.0
+    inbox_users: int = 50_000
+    heartbeat_interval: float = 25.0
+    heartbeat_timeout: float = 60.0
+    heartbeat_tick: float = 1.0
+
+
+class OutboxSettings(BaseSettings):
+    """Настройки доставки событий через outbox (LISTEN/NOTIFY с опросом таблицы как запасным путем)."""
+
+    outbox_channel: str = 'chat_events'
+    outbox_poll_interval: float = 1.0
+    outbox_batch_size: int = 500
+    outbox_gap_timeout: float = 5.0
+    outbox_retention: float = 3600.0
+    outbox_cleanup_interval: float = 60.0
+
+
+class RetentionSettings(BaseSettings):
+    """
+    Настройки удаления старых сообщений.
+
+    MESSAGE_RETENTION_DAYS - общий срок хранения (не задан - сообщения хранятся бессрочно);
+    срок отдельного чата может быть только короче общего.
+    """
+
+    message_retention_days: int | None = Field(None, ge=1)
+    retention_batch_size: int = 1_000
+    retention_batch_pause: float = 0.1
+    retention_interval: float = 3600.0
+
+
+class SchedulerSettings(BaseSettings):
+    """
+    Настройки планировщика фоновых задач.
+
+    При SCHEDULER_LEADER_ELECTION=false каждая задача выполняется в каждом процессе
+    (для запуска без доступа к advisory-блокировкам, например в тестах).
+    """
+
+    scheduler_tick: float = 1.0
+    scheduler_jitter: float = 5.0
+    scheduler_leader_election: bool = True
+    # Первый ключ advisory-блокировок задач (второй - хеш имени задачи)
+    scheduler_lock_class: int = 4_801
+    scheduler_shutdown_timeout: float = 10.0
+
+
+class AdmissionSettings(BaseSettings):
+    """Настройки контроля допуска нагрузки к БД."""
+
+    max_in_flight: int = 64
+    read_share: float = 0.75
+    pool_wait_threshold: float = 0.5
+    pool_wait_alpha: float = 0.2
+    pool_wait_half_life: float = 5.0
+
+
+class QueryBudgetSettings(BaseSettings):
+    """
+    Настройки бюджетов запросов к БД.
+
+    Превышение бюджета HTTP-запросом или фреймом WebSocket всегда записывается в лог;
+    при QUERY_BUDGET_STRICT=true оно еще и вызывает ошибку (для тестов).
+    """
+
+    query_budget_strict: bool = False
+
+
+class FrameRateLimit(BaseModel):
+    """Лимит фреймов одного типа: скорость (фреймов в секунду) и емкость корзины."""
+
+    user_rate: float
+    user_burst: int
+    chat_rate: float
+    chat_burst: int
+
+
+class RateLimitSettings(BaseSettings):
+    """Настройки ограничения частоты WebSocket-фреймов (задаются JSON-объектом WS_RATE_LIMITS)."""
+
+    ws_rate_limits: dict[str, FrameRateLimit] = {
+        'message': FrameRateLimit(user_rate=5, user_burst=20, chat_rate=50, chat_burst=100),
+        'read': FrameRateLimit(user_rate=20, user_burst=50, chat_rate=200, chat_burst=400),
+        'subscribe': FrameRateLimit(user_rate=10, user_burst=100, chat_rate=100, chat_burst=1_000),
+    }
+    rate_limit_buckets: int = 100_000
 
 
 class Settings(BaseSettings):
@@ -31,7 +177,31 @@ class Settings(BaseSettings):
 
     logger: LoggerSettings
     database: DataBaseSettings
+    ids: IdSettings
     auth: AuthSettings
-
-
-settings: Settings = Settings(logger=LoggerSettings(), database=DataBaseSettings(), auth=AuthSettings())
+    cache: CacheSettings
+    inbox: InboxSettings
+    websocket: WebSocketSettings
+    outbox: OutboxSettings
+    retention: RetentionSettings
+    scheduler: SchedulerSettings
+    rate_limit: RateLimitSettings
+    admission: AdmissionSettings
+    query_budget: QueryBudgetSettings
+
+
+settings: Settings = Settings(
+    logger=LoggerSettings(),
+    database=DataBaseSettings(),
+    ids=IdSettings(),
+    auth=AuthSettings(),
+    cache=CacheSettings(),
+    inbox=InboxSettings(),
+    websocket=WebSocketSettings(),
+    outbox=OutboxSettings(),
+    retention=RetentionSettings(),
+    scheduler=SchedulerSettings(),
+    rate_limit=RateLimitSettings(),
+    admission=AdmissionSettings(),
+    query_budget=QueryBudgetSettings(),
+)
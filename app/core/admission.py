@@ -0,0 +1,105 @@
+"""
+Контроль допуска нагрузки к БД.
+Отслеживает число выполняемых операций и время ожидания соединения из пула
+и при перегрузке отклоняет новые операции сразу, не дожидаясь таймаута пула.
+Запись сообщений имеет приоритет над чтением истории.
+"""
+
+import math
+import time
+from enum import IntEnum
+
+from app.config import settings
+
+
+class Priority(IntEnum):
+    """Приоритет операции."""
+
+    LOW = 0  # Чтение: история, списки
+    HIGH = 1  # Запись: отправка сообщений и прочие изменения
+
+
+class AdmissionController:
+    """
+    Допуск операций по числу выполняемых и по времени ожидания пула.
+
+    Операции низкого приоритета допускаются, пока занято не больше read_share
+    от max_in_flight и сглаженное время ожидания пула меньше wait_threshold;
+    операции высокого приоритета - до полной емкости и вдвое большего ожидания.
+    Сглаженное ожидание (EWMA) затухает со временем, чтобы после всплеска
+    нагрузки допуск восстанавливался и без новых замеров.
+    """
+
+    def __init__(
+            self,
+            max_in_flight: int = settings.admission.max_in_flight,
+            read_share: float = settings.admission.read_share,
+            wait_threshold: float = settings.admission.pool_wait_threshold,
+            alpha: float = settings.admission.pool_wait_alpha,
+            half_life: float = settings.admission.pool_wait_half_life
+    ):
+        self.max_in_flight = max_in_flight
+        self.read_share = read_share
+        self.wait_threshold = wait_threshold
+        self.alpha = alpha
+        self.half_life = half_life
+        self.in_flight = 0
+        self.rejected = {priority: 0 for priority in Priority}
+        self._pool_wait = 0.0
+        self._pool_wait_at = time.monotonic()
+
+    def pool_wait(self, now: float | None = None) -> float:
+        """Сглаженное время ожидания соединения из пула (с учетом затухания)."""
+        now = time.monotonic() if now is None else now
+        # Момент раньше последнего замера не усиливает ожидание (и не переполняет степень)
+        elapsed = max(0.0, now - self._pool_wait_at)
+        return self._pool_wait * 0.5 ** (elapsed / self.half_life)
+
+    def observe_pool_wait(self, seconds: float, now: float | None = None) -> None:
+        """Учет замера времени ожидания соединения из пула."""
+        now = time.monotonic() if now is None else now
+        self._pool_wait = self.alpha * seconds + (1 - self.alpha) * self.pool_wait(now)
+        self._pool_wait_at = now
+
+    def try_admit(self, priority: Priority, now: float | None = None) -> int | None:
+        """
+        Попытка допуска операции.
+
+        При успешном допуске операция учитывается как выполняемая,
+        по ее окончании нужно вызвать release.
+
+        Args:
+            priority: Приоритет операции
+            now: Текущее время (time.monotonic) - для тестов
+
+        Returns:
+            int | None: None, если операция допущена, иначе через сколько секунд повторить
+
+        """
+        pool_wait = self.pool_wait(now)
+        if priority is Priority.HIGH:
+            capacity, wait_limit = self.max_in_flight, self.wait_threshold * 2
+        else:
+            capacity, wait_limit = int(self.max_in_flight * self.read_share), self.wait_threshold
+
+        if self.in_flight >= capacity or pool_wait >= wait_limit:
+            self.rejected[priority] += 1
+            return max(1, math.ceil(pool_wait * 2))
+
+        self.in_flight += 1
+        return None
+
+    def release(self) -> None:
+        """Окончание допущенной операции."""
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """Текущая загрузка и число отклоненных операций по приоритетам."""
+        return {
+            'in_flight': self.in_flight,
+            'pool_wait_ms': round(self.pool_wait() * 1000, 3),
+            'rejected': {priority.name.lower(): count for priority, count in self.rejected.items()},
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,65 @@
+"""
+Внутрипроцессные кэши приложения.
+Содержит компактный LRU-кэш для часто запрашиваемых данных небольшого размера
+с необязательным временем жизни записей.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Generic, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Кэш с вытеснением давно не использованных записей.
+
+    Кэш локален для процесса (воркера) и не требует синхронизации:
+    все обращения выполняются в одном event loop. Если задан ttl (в секундах),
+    просроченные записи удаляются лениво при обращении к ним.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[V, float]] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        """Получение значения по ключу (None, если ключа нет или запись просрочена)."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        """Сохранение значения с вытеснением самой старой записи при переполнении."""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        """Удаление значения по ключу."""
+        entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def items(self) -> list[tuple[K, V]]:
+        """Актуальные записи кэша (от давно использованных к недавним)."""
+        now = time.monotonic()
+        return [(key, value) for key, (value, expires_at) in self._data.items() if expires_at >= now]
+
+    def clear(self) -> None:
+        """Очистка кэша."""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        """Количество записей в кэше."""
+        return len(self._data)
@@ -1,39 +1,119 @@
 """Модуль зависимостей приложения."""
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.core.admission import Priority, admission
+from app.core.query_budget import count_queries
+from app.core.security import REFRESH_TOKEN_TYPE
 from app.db.repositories.chat import ChatRepository
 from app.db.repositories.group import GroupRepository
+from app.db.repositories.inbox import InboxRepository
 from app.db.repositories.message import MessageRepository
+from app.db.repositories.outbox import OutboxRepository
+from app.db.repositories.session import SessionRepository
 from app.db.repositories.user import UserRepository
 from app.db.session import get_db
-from app.services import ChatService, GroupService, MessageService, UserService
+from app.db.uow import UnitOfWork
+from app.services import ChatService, GroupService, MessageService, ProfileService, SessionService, UserService
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='api/v1/auth/token')
 
 
-async def get_user_service(db: AsyncSession = Depends(get_db)) -> UserService:
+async def admission_control(request: Request):
+    """
+    Зависимость контроля допуска к БД.
+
+    Выполняется до получения сессии: при перегрузке запрос сразу отклоняется
+    с 503 и Retry-After. GET-запросы (чтение) имеют низкий приоритет,
+    изменения (в том числе отправка сообщений) - высокий.
+    """
+    priority = Priority.LOW if request.method == 'GET' else Priority.HIGH
+    retry_after = admission.try_admit(priority)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Сервис перегружен, повторите запрос позже',
+            headers={'Retry-After': str(retry_after)}
+        )
+    try:
+        yield
+    finally:
+        admission.release()
+
+
+async def track_queries(request: Request):
+    """
+    Зависимость учета запросов к БД за время HTTP-запроса.
+
+    Подключается к роутерам раньше зависимостей, открывающих сессию, поэтому учитывает
+    все запросы, включая проверку пользователя и фиксацию транзакции. Бюджет задается
+    зависимостью маршрута QueryBudget и проверяется по окончании запроса.
+    """
+    route = request.scope.get('route')
+    with count_queries(f'{request.method} {route.path if route else request.url.path}'):
+        yield
+
+
+async def get_uow(db: AsyncSession = Depends(get_db)) -> UnitOfWork:
+    """Зависимость для получения единицы работы (общей для всех сервисов запроса)."""
+    return UnitOfWork(db)
+
+
+async def get_user_service(
+        db: AsyncSession = Depends(get_db),
+        uow: UnitOfWork = Depends(get_uow)
+) -> UserService:
     """Зависимость для получения сервиса работы с пользователями."""
-    return UserService(UserRepository(db))
+    return UserService(UserRepository(db), uow)
+
 
+async def get_session_service(
+        db: AsyncSession = Depends(get_db),
+        uow: UnitOfWork = Depends(get_uow)
+) -> SessionService:
+    """Зависимость для получения сервиса сессий пользователей."""
+    return SessionService(SessionRepository(db), uow)
 
-async def get_chat_service(db: AsyncSession = Depends(get_db)) -> ChatService:
+
+async def get_chat_service(
+        db: AsyncSession = Depends(get_db),
+        uow: UnitOfWork = Depends(get_uow)
+) -> ChatService:
     """Зависимость для получения сервиса чатов."""
-    return ChatService(ChatRepository(db))
+    return ChatService(ChatRepository(db), uow)
 
 
-async def get_group_service(db: AsyncSession = Depends(get_db)) -> GroupService:
+async def get_group_service(
+        db: AsyncSession = Depends(get_db),
+        uow: UnitOfWork = Depends(get_uow)
+) -> GroupService:
     """Зависимость для получения сервиса групп."""
-    return GroupService(GroupRepository(db), ChatRepository(db))
+    return GroupService(GroupRepository(db), ChatRepository(db), uow)
+
 
+async def get_profile_service(db: AsyncSession = Depends(get_db)) -> ProfileService:
+    """Зависимость для получения сервиса профилей пользователей."""
+    return ProfileService(UserRepository(db))
 
-async def get_message_service(db: AsyncSession = Depends(get_db)) -> MessageService:
+
+async def get_message_service(
+        db: AsyncSession = Depends(get_db),
+        uow: UnitOfWork = Depends(get_uow),
+        profile_service: ProfileService = Depends(get_profile_service)
+) -> MessageService:
     """Зависимость для получения сервиса сообщений."""
-    return MessageService(MessageRepository(db), ChatRepository(db))
+    return MessageService(
+        MessageRepository(db),
+        ChatRepository(db),
+        uow,
+        profile_service,
+        InboxRepository(db),
+        OutboxRepository(db)
+    )
 
 
 async def get_current_user(
@@ -53,6 +133,11 @@ async def get_current_user(
     """
     try:
         payload = jwt.decode(token, settings.auth.secret_key, algorithms=[settings.auth.token_algorythm])
+        if payload.get('type') == REFRESH_TOKEN_TYPE:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='Недействительный токен'
+            )
         user_id: int = int(payload.get('user_id')) if payload.get('user_id') is not None else None
         if user_id is None:
             raise HTTPException(
@@ -72,10 +157,32 @@ async def get_current_user(
 
     # Проверка существования пользователя
     repo = UserRepository(db)
-    if not await repo.get(user_id):
+    if not await repo.load(user_id):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Пользователь не найден в БД'
         )
 
     return user_id
+
+
+async def get_current_operator(user_id: int = Depends(get_current_user)) -> int:
+    """
+    Авторизация оператора (пользователя из OPERATOR_IDS).
+
+    Args:
+        user_id: ID авторизованного пользователя
+
+    Returns:
+        int: ID оператора
+
+    Raises:
+        HTTPException: 403, если пользователь не оператор
+
+    """
+    if user_id not in settings.auth.operator_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Доступно только операторам'
+        )
+    return user_id
@@ -0,0 +1,73 @@
+"""
+Условные GET-запросы (ETag / If-None-Match).
+ETag строится из версии ресурса, поэтому для ответа 304 достаточно прочитать версию,
+а сериализованные тела ответов кратковременно кэшируются по ETag.
+"""
+
+import hashlib
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+
+from app.config import settings
+from app.core.cache import LRUCache
+
+response_cache: LRUCache[str, bytes] = LRUCache(settings.cache.response_cache_size, settings.cache.response_cache_ttl)
+
+
+def make_etag(*parts: object) -> str:
+    """
+    Построение ETag по ключу представления ресурса.
+
+    Args:
+        parts: Тип ресурса, его ID, версия и параметры запроса, влияющие на тело ответа
+
+    Returns:
+        str: Сильный ETag в кавычках
+
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Проверка совпадения ETag с заголовком If-None-Match (слабое сравнение)."""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return '*' in candidates or etag in candidates
+
+
+async def conditional_response(
+        request: Request,
+        etag: str,
+        adapter: TypeAdapter,
+        load: Callable[[], Awaitable[Any]]
+) -> Response:
+    """
+    Ответ на условный GET-запрос.
+
+    Если клиент прислал актуальный ETag, возвращается 304 без тела и без вызова load.
+    Иначе тело берется из кэша сериализованных ответов либо загружается и сериализуется.
+
+    Args:
+        request: Входящий запрос
+        etag: ETag текущей версии ресурса
+        adapter: Адаптер схемы ответа для сериализации
+        load: Загрузка данных ответа (вызывается только при промахе кэша)
+
+    Returns:
+        Response: Ответ 304 или 200 с JSON-телом
+
+    """
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = response_cache.get(etag)
+    if body is None:
+        body = adapter.dump_json(await load())
+        response_cache.set(etag, body)
+    return Response(content=body, media_type='application/json', headers=headers)
@@ -0,0 +1,58 @@
+"""
+Блокировки по ключу.
+Сериализуют операции над одним объектом (например, отправку сообщений в один чат),
+не мешая параллельной работе с разными объектами.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Hashable
+from contextlib import asynccontextmanager
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class _Entry:
+    """Блокировка ключа и число задач, которые ее держат или ждут."""
+
+    __slots__ = ('lock', 'users')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class KeyedLock(Generic[K]):
+    """
+    Таблица блокировок {ключ: asyncio.Lock}.
+
+    Запись создается при первом обращении к ключу и удаляется, когда блокировку
+    никто не держит и не ждет, поэтому размер таблицы ограничен числом ключей
+    с операциями в процессе выполнения. asyncio.Lock выдает блокировку
+    в порядке очереди, так что порядок операций над одним ключом сохраняется.
+    """
+
+    def __init__(self):
+        self._entries: dict[K, _Entry] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: K) -> AsyncIterator[None]:
+        """Захват блокировки ключа на время блока async with."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        """Количество ключей с захваченными или ожидаемыми блокировками."""
+        return len(self._entries)
+
+
+chat_locks: KeyedLock[int] = KeyedLock()
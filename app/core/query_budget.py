@@ -0,0 +1,147 @@
+"""
+Учет запросов к БД и бюджеты запросов операций.
+Запросы любого движка SQLAlchemy засчитываются текущей операции (HTTP-запросу или фрейму
+WebSocket): отдельно число выполненных команд и число обращений к серверу, включая BEGIN,
+COMMIT и ROLLBACK. Превышение бюджета операции записывается в лог, а в строгом режиме
+(QUERY_BUDGET_STRICT, для тестов) вызывает QueryBudgetExceededError.
+"""
+
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceededError(AssertionError):
+    """Операция выполнила больше запросов, чем допускает ее бюджет."""
+
+
+class QueryBudget:
+    """
+    Допустимое число запросов операции.
+
+    Экземпляр подключается к маршруту как зависимость (dependencies=[Depends(QueryBudget(3))])
+    и задает бюджет отслеживаемого HTTP-запроса.
+    """
+
+    __slots__ = ('statements', 'round_trips')
+
+    def __init__(self, statements: int, round_trips: int | None = None):
+        self.statements = statements
+        # None - число обращений к серверу не ограничивается
+        self.round_trips = round_trips
+
+    async def __call__(self) -> None:
+        """Назначение бюджета отслеживаемому запросу (вызывается как зависимость маршрута)."""
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = self
+
+    def __repr__(self) -> str:
+        """Представление бюджета для лога."""
+        return f'QueryBudget(statements={self.statements}, round_trips={self.round_trips})'
+
+
+class QueryStats:
+    """Число запросов отслеживаемой операции."""
+
+    __slots__ = ('name', 'budget', 'statements', 'round_trips', 'parent')
+
+    def __init__(self, name: str, budget: QueryBudget | None = None, parent: 'QueryStats | None' = None):
+        self.name = name
+        self.budget = budget
+        self.statements = 0
+        self.round_trips = 0
+        # Внешняя операция (например, тест вокруг запроса к API) учитывает и вложенные запросы
+        self.parent = parent
+
+    def exceeded(self) -> bool:
+        """Превышен ли бюджет операции."""
+        if self.budget is None:
+            return False
+        if self.budget.round_trips is not None and self.round_trips > self.budget.round_trips:
+            return True
+        return self.statements > self.budget.statements
+
+    def __str__(self) -> str:
+        """Счетчики и бюджет операции для лога."""
+        budget = '' if self.budget is None else f', {self.budget!r}'
+        return f'{self.name}: {self.statements} statements, {self.round_trips} round trips{budget}'
+
+
+_current: ContextVar[QueryStats | None] = ContextVar('query_stats', default=None)
+
+
+def current_stats() -> QueryStats | None:
+    """Счетчик запросов текущей операции или None, если операция не отслеживается."""
+    return _current.get()
+
+
+@contextmanager
+def count_queries(name: str = '', budget: QueryBudget | None = None) -> Iterator[QueryStats]:
+    """
+    Учет запросов к БД внутри блока with.
+
+    Бюджет можно задать сразу или позже (зависимостью маршрута); он проверяется
+    при успешном выходе из блока.
+
+    Args:
+        name: Название операции для лога
+        budget: Бюджет запросов операции
+
+    Yields:
+        QueryStats: Счетчик запросов операции
+
+    Raises:
+        QueryBudgetExceededError: Бюджет превышен в строгом режиме
+
+    """
+    stats = QueryStats(name, budget, _current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+    check_budget(stats)
+
+
+def check_budget(stats: QueryStats) -> None:
+    """
+    Проверка бюджета операции: превышение записывается в лог.
+
+    Raises:
+        QueryBudgetExceededError: Бюджет превышен в строгом режиме
+
+    """
+    if not stats.exceeded():
+        return
+    logger.warning('Query budget exceeded: %s', stats)
+    if settings.query_budget.query_budget_strict:
+        raise QueryBudgetExceededError(str(stats))
+
+
+def _count(statements: int) -> None:
+    stats = _current.get()
+    while stats is not None:
+        stats.statements += statements
+        stats.round_trips += 1
+        stats = stats.parent
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(_conn, _cursor, _statement, parameters, _context, executemany) -> None:
+    _count(len(parameters) if executemany else 1)
+
+
+@event.listens_for(Engine, 'begin')
+@event.listens_for(Engine, 'commit')
+@event.listens_for(Engine, 'rollback')
+def _count_transaction(_conn) -> None:
+    _count(0)
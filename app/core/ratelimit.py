@@ -0,0 +1,89 @@
+"""
+Ограничение частоты запросов по алгоритму token bucket.
+Корзины хранятся в ограниченном LRU-кэше процесса: давно не использованные
+вытесняются, что равносильно их полному восстановлению.
+"""
+
+import time
+from collections.abc import Hashable, Mapping
+
+from app.config import FrameRateLimit, settings
+from app.core.cache import LRUCache
+
+
+class TokenBucket:
+    """
+    Набор корзин с общими параметрами, по одной на ключ.
+
+    Состояние корзины - пара [токены, время последнего пополнения].
+    """
+
+    def __init__(self, rate: float, burst: int, maxsize: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: LRUCache[Hashable, list[float]] = LRUCache(maxsize)
+
+    def _refill(self, key: Hashable, now: float) -> list[float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+            self._buckets.set(key, bucket)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def wait_time(self, key: Hashable, now: float | None = None) -> float:
+        """Сколько секунд ждать до появления токена (0, если токен есть)."""
+        tokens = self._refill(key, time.monotonic() if now is None else now)[0]
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key: Hashable, now: float | None = None) -> None:
+        """Списание токена (наличие проверяется через wait_time)."""
+        self._refill(key, time.monotonic() if now is None else now)[0] -= 1
+
+
+class FrameRateLimiter:
+    """Лимиты WebSocket-фреймов по типам: отдельно на пользователя и на чат."""
+
+    def __init__(
+            self,
+            limits: Mapping[str, FrameRateLimit] = settings.rate_limit.ws_rate_limits,
+            maxsize: int = settings.rate_limit.rate_limit_buckets
+    ):
+        self._limits = {
+            frame_type: (
+                TokenBucket(limit.user_rate, limit.user_burst, maxsize),
+                TokenBucket(limit.chat_rate, limit.chat_burst, maxsize),
+            )
+            for frame_type, limit in limits.items()
+        }
+
+    def check(self, frame_type: str, user_id: int, chat_id: int, now: float | None = None) -> float:
+        """
+        Проверка и учет фрейма.
+
+        Токены списываются только если фрейм укладывается и в лимит пользователя,
+        и в лимит чата. Фреймы типов без настроенного лимита не ограничиваются.
+
+        Args:
+            frame_type: Тип фрейма
+            user_id: ID пользователя
+            chat_id: ID чата
+            now: Текущее время (time.monotonic) - для тестов
+
+        Returns:
+            float: 0, если фрейм разрешен, иначе через сколько секунд повторить
+
+        """
+        buckets = self._limits.get(frame_type)
+        if buckets is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        user_bucket, chat_bucket = buckets
+        wait = max(user_bucket.wait_time(user_id, now), chat_bucket.wait_time(chat_id, now))
+        if wait:
+            return wait
+        user_bucket.take(user_id, now)
+        chat_bucket.take(chat_id, now)
+        return 0.0
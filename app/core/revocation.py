@@ -0,0 +1,79 @@
+"""
+Кэш отозванных refresh-токенов.
+Позволяет отклонять повторно используемые и отозванные токены без обращения к БД.
+Хранит идентификаторы токенов (jti) только до истечения их срока действия.
+"""
+
+import time
+from collections import OrderedDict
+
+from app.config import settings
+
+
+class RevocationCache:
+    """
+    Ограниченный по размеру кэш отозванных токенов {jti: время истечения}.
+
+    Записи с истекшим сроком удаляются при обращении: такой токен
+    и так не пройдет проверку подписи. При переполнении вытесняются
+    самые старые записи, поэтому кэш — лишь быстрый путь, а источником
+    истины остается таблица sessions.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, float] = OrderedDict()
+        # Токены, повторное предъявление которых уже привело к отзыву всех сессий
+        self._reused: set[str] = set()
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        """
+        Помечает токен как отозванный.
+
+        Args:
+            jti: Идентификатор токена
+            expires_at: Время истечения токена (unix timestamp)
+
+        """
+        if expires_at <= time.time():
+            return
+        self._entries[jti] = expires_at
+        self._entries.move_to_end(jti)
+        while len(self._entries) > self.maxsize:
+            evicted, _ = self._entries.popitem(last=False)
+            self._reused.discard(evicted)
+
+    def mark_reused(self, jti: str, expires_at: float) -> None:
+        """
+        Помечает токен, повторное предъявление которого уже обработано.
+
+        Args:
+            jti: Идентификатор токена
+            expires_at: Время истечения токена (unix timestamp)
+
+        """
+        self.revoke(jti, expires_at)
+        if jti in self._entries:
+            self._reused.add(jti)
+
+    def is_reused(self, jti: str) -> bool:
+        """Проверка, отозваны ли уже все сессии из-за повторного предъявления токена."""
+        return self.is_revoked(jti) and jti in self._reused
+
+    def is_revoked(self, jti: str) -> bool:
+        """Проверка, отозван ли токен."""
+        expires_at = self._entries.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self._entries[jti]
+            self._reused.discard(jti)
+            return False
+        return True
+
+    def __len__(self) -> int:
+        """Количество отозванных токенов в кэше."""
+        return len(self._entries)
+
+
+revocation_cache = RevocationCache(settings.auth.revocation_cache_size)
@@ -0,0 +1,382 @@
+"""
+Планировщик фоновых задач обслуживания.
+Задачи запускаются по интервалу или по расписанию cron одной фоновой задачей процесса.
+При нескольких процессах каждую задачу выполняет только один из них - владелец
+advisory-блокировки PostgreSQL этой задачи. Блокировки держатся на отдельном
+соединении (вне пула): при остановке или падении процесса сервер освобождает их,
+и задачу подхватывает другой процесс при следующем сроке.
+"""
+
+import asyncio
+import contextlib
+import datetime
+import logging
+import random
+import time
+import zlib
+from collections.abc import Awaitable, Callable
+
+import asyncpg
+
+from app.config import settings
+from app.db.session import write_engine
+
+logger = logging.getLogger(__name__)
+
+JobFunc = Callable[[], Awaitable[object]]
+
+# Блокировка уже захвачена этим соединением (повторный pg_try_advisory_lock увеличил бы счетчик захватов)
+LOCK_HELD_QUERY = """
+SELECT EXISTS (
+    SELECT 1 FROM pg_locks
+    WHERE locktype = 'advisory' AND pid = pg_backend_pid() AND granted
+      AND classid = $1::int::oid AND objid = $2::int::oid AND objsubid = 2
+)
+"""
+
+
+class IntervalSchedule:
+    """Запуск каждые seconds секунд; первый запуск - сразу после старта планировщика."""
+
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            msg = 'Интервал должен быть положительным'
+            raise ValueError(msg)
+        self.seconds = seconds
+
+    def first_run(self, now: float) -> float:
+        """Время первого запуска (Unix timestamp)."""
+        return now
+
+    def next_after(self, now: float) -> float:
+        """Время следующего запуска после now (Unix timestamp)."""
+        return now + self.seconds
+
+    def __repr__(self) -> str:
+        """Описание расписания для статистики."""
+        return f'every {self.seconds:g}s'
+
+
+class CronSchedule:
+    """
+    Расписание cron из пяти полей: минута, час, день месяца, месяц, день недели (0 и 7 - воскресенье).
+
+    Поддерживаются *, списки через запятую, диапазоны a-b и шаг /n; время - UTC.
+    Если заданы и день месяца, и день недели, достаточно совпадения любого из них.
+    """
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != len(self.FIELDS):
+            msg = f'Ожидается 5 полей cron: {expression!r}'
+            raise ValueError(msg)
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse_field(part, low, high) for part, (low, high) in zip(parts, self.FIELDS, strict=True)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = parts[2] == '*'
+        self._any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse_field(text: str, low: int, high: int) -> set[int]:
+        values: set[int] = set()
+        for part in text.split(','):
+            expr, has_step, step_text = part.partition('/')
+            try:
+                step = int(step_text) if has_step else 1
+                if expr == '*':
+                    start, end = low, high
+                elif '-' in expr:
+                    start, end = (int(value) for value in expr.split('-', 1))
+                else:
+                    start = int(expr)
+                    end = high if has_step else start
+            except ValueError:
+                start = end = step = -1
+            if step < 1 or not low <= start <= end <= high:
+                msg = f'Некорректное поле cron {text!r} (допустимо {low}-{high})'
+                raise ValueError(msg)
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime.datetime) -> bool:
+        day = moment.day in self.days
+        # datetime.weekday(): понедельник - 0; в cron воскресенье - 0
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def first_run(self, now: float) -> float:
+        """Время первого запуска (Unix timestamp)."""
+        return self.next_after(now)
+
+    def next_after(self, now: float) -> float:
+        """
+        Ближайшее подходящее время строго после now (Unix timestamp).
+
+        Несовпадающие месяц, день и час пропускаются целиком, поэтому поиск
+        занимает не больше нескольких сотен шагов.
+
+        Raises:
+            ValueError: Если расписание не срабатывает никогда (например, 30 февраля)
+
+        """
+        moment = datetime.datetime.fromtimestamp(now, datetime.UTC).replace(second=0, microsecond=0)
+        moment += datetime.timedelta(minutes=1)
+        limit = moment.year + 5
+        while moment.year <= limit:
+            if moment.month not in self.months:
+                year, month = divmod(moment.month, 12)
+                moment = moment.replace(year=moment.year + year, month=month + 1, day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        msg = f'Расписание cron {self.expression!r} не срабатывает'
+        raise ValueError(msg)
+
+    def __repr__(self) -> str:
+        """Описание расписания для статистики."""
+        return f'cron {self.expression}'
+
+
+Schedule = IntervalSchedule | CronSchedule
+
+
+class Job:
+    """Зарегистрированная задача: расписание, время следующего запуска и статистика выполнения."""
+
+    __slots__ = (
+        'failures', 'func', 'jitter', 'last_duration', 'last_error', 'last_started_at', 'leader',
+        'name', 'next_run', 'runs', 'schedule', 'skipped', 'task',
+    )
+
+    def __init__(self, name: str, func: JobFunc, schedule: Schedule, jitter: float):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.jitter = jitter
+        self.next_run = 0.0
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.leader = False
+        self.last_started_at: float | None = None
+        self.last_duration: float | None = None
+        self.last_error: str | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def lock_key(self) -> int:
+        """Второй ключ advisory-блокировки задачи (хеш имени в диапазоне int4)."""
+        return zlib.crc32(self.name.encode()) & 0x7FFFFFFF
+
+    def running(self) -> bool:
+        """Выполняется ли задача сейчас."""
+        return self.task is not None and not self.task.done()
+
+    def plan(self, moment: float) -> None:
+        """
+        Установка времени следующего запуска.
+
+        Случайная задержка до jitter секунд разносит запуски задач (и процессов
+        после одновременного перезапуска), чтобы они не нагружали БД в одну секунду.
+        """
+        self.next_run = moment + random.uniform(0, self.jitter)  # noqa: S311
+
+    def stats(self, now: float) -> dict:
+        """Статистика задачи."""
+        return {
+            'schedule': repr(self.schedule),
+            'leader': self.leader,
+            'running': self.running(),
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'last_started_at': self.last_started_at,
+            'last_duration': self.last_duration,
+            'last_error': self.last_error,
+            'next_run_in': round(self.next_run - now, 3),
+        }
+
+
+class Scheduler:
+    """
+    Планировщик задач процесса.
+
+    Раз в tick секунд проверяются сроки задач. Когда срок наступил, процесс
+    пытается стать лидером задачи (pg_try_advisory_lock без ожидания): лидер
+    запускает задачу, остальные процессы пропускают этот срок. Лидер сохраняет
+    блокировку между запусками, так что задача остается на одном процессе, пока
+    он работает. Задача не запускается повторно, пока не завершился предыдущий запуск.
+    """
+
+    def __init__(
+            self,
+            tick: float = settings.scheduler.scheduler_tick,
+            leader_election: bool = settings.scheduler.scheduler_leader_election,
+            lock_class: int = settings.scheduler.scheduler_lock_class,
+            shutdown_timeout: float = settings.scheduler.scheduler_shutdown_timeout
+    ):
+        self.tick = tick
+        self.leader_election = leader_election
+        self.lock_class = lock_class
+        self.shutdown_timeout = shutdown_timeout
+        self.jobs: dict[str, Job] = {}
+        self._connection: asyncpg.Connection | None = None
+        self._connection_lock = asyncio.Lock()
+        self._connect_failed = False
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    def add_job(
+            self,
+            name: str,
+            func: JobFunc,
+            schedule: Schedule,
+            jitter: float = settings.scheduler.scheduler_jitter
+    ) -> Job:
+        """
+        Регистрация задачи (задача с тем же именем заменяется).
+
+        Args:
+            name: Уникальное имя задачи (ключ блокировки лидера)
+            func: Корутинная функция без аргументов
+            schedule: Расписание
+            jitter: Максимальная случайная задержка запуска в секундах
+
+        Returns:
+            Job: Зарегистрированная задача
+
+        """
+        job = Job(name, func, schedule, jitter)
+        job.plan(schedule.first_run(time.time()))
+        self.jobs[name] = job
+        return job
+
+    def start(self) -> None:
+        """Запуск фоновой задачи планировщика (если еще не запущена)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Остановка планировщика.
+
+        Выполняющимся задачам дается shutdown_timeout секунд на завершение, затем они
+        отменяются. Закрытие соединения освобождает блокировки лидера для других процессов.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        tasks = [job.task for job in self.jobs.values() if job.running()]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=self.shutdown_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self._disconnect()
+
+    async def run_pending(self, now: float | None = None) -> list[str]:
+        """
+        Запуск задач, срок которых наступил.
+
+        Args:
+            now: Текущее время (Unix timestamp) - для тестов
+
+        Returns:
+            list[str]: Имена запущенных задач
+
+        """
+        now = time.time() if now is None else now
+        started = []
+        for job in self.jobs.values():
+            if self._stopping:
+                break
+            if job.next_run > now:
+                continue
+            job.plan(job.schedule.next_after(now))
+            if job.running():
+                job.skipped += 1
+                continue
+            job.leader = await self._is_leader(job)
+            if not job.leader:
+                continue
+            job.task = asyncio.create_task(self._execute(job))
+            started.append(job.name)
+        return started
+
+    async def _execute(self, job: Job) -> None:
+        job.last_started_at = time.time()
+        started = time.perf_counter()
+        try:
+            await job.func()
+        except Exception as e:
+            job.failures += 1
+            job.last_error = repr(e)
+            logger.exception('Scheduled job %s failed', job.name)
+        else:
+            job.last_error = None
+        finally:
+            job.runs += 1
+            job.last_duration = round(time.perf_counter() - started, 3)
+
+    async def _is_leader(self, job: Job) -> bool:
+        """Захват (или проверка уже захваченной) advisory-блокировки задачи."""
+        if not self.leader_election:
+            return True
+        async with self._connection_lock:
+            try:
+                if self._connection is None or self._connection.is_closed():
+                    dsn = write_engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+                    self._connection = await asyncpg.connect(dsn)
+                    self._connect_failed = False
+                if job.leader:
+                    return await self._connection.fetchval(LOCK_HELD_QUERY, self.lock_class, job.lock_key)
+                return await self._connection.fetchval(
+                    'SELECT pg_try_advisory_lock($1, $2)', self.lock_class, job.lock_key
+                )
+            except Exception:  # noqa: BLE001
+                if not self._connect_failed:
+                    logger.warning('Scheduler leader election is unavailable, jobs are paused', exc_info=True)
+                self._connect_failed = True
+                await self._disconnect()
+                return False
+
+    async def _disconnect(self) -> None:
+        if self._connection is not None:
+            with contextlib.suppress(Exception):
+                await self._connection.close()
+            self._connection = None
+        for job in self.jobs.values():
+            job.leader = False
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await self.run_pending()
+            except Exception:
+                logger.exception('Scheduler tick failed')
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.tick)
+
+    def stats(self) -> dict:
+        """Статистика задач по именам."""
+        now = time.time()
+        return {name: job.stats(now) for name, job in self.jobs.items()}
+
+
+scheduler = Scheduler()
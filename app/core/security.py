@@ -5,6 +5,9 @@ from jose import JWTError, jwt
 from app.config import settings
 from app.schemas import TokenData
 
+ACCESS_TOKEN_TYPE = 'access'  # noqa: S105
+REFRESH_TOKEN_TYPE = 'refresh'  # noqa: S105
+
 
 def create_access_token(token_data: TokenData) -> str:
     """
@@ -19,7 +22,25 @@ def create_access_token(token_data: TokenData) -> str:
     """
     to_encode = token_data.dict()
     expire = datetime.now(UTC) + timedelta(minutes=settings.auth.access_token_expire_minutes)
-    to_encode.update({'exp': expire})
+    to_encode.update({'exp': expire, 'type': ACCESS_TOKEN_TYPE})
+    return jwt.encode(to_encode, settings.auth.secret_key, algorithm=settings.auth.token_algorythm)
+
+
+def create_refresh_token(token_data: TokenData, jti: str, expires_at: datetime) -> str:
+    """
+    Создает refresh-токен, привязанный к сессии пользователя.
+
+    Args:
+        token_data: Данные для кодирования в токене
+        jti: Идентификатор сессии (refresh-токена)
+        expires_at: Дата истечения токена
+
+    Returns:
+        str: JWT refresh-токен
+
+    """
+    to_encode = token_data.dict()
+    to_encode.update({'exp': expires_at, 'jti': jti, 'type': REFRESH_TOKEN_TYPE})
     return jwt.encode(to_encode, settings.auth.secret_key, algorithm=settings.auth.token_algorythm)
 
 
@@ -38,3 +59,20 @@ def decode_token(token: str) -> dict | None:
         return jwt.decode(token, settings.auth.secret_key, algorithms=[settings.auth.token_algorythm])
     except JWTError:
         return None
+
+
+def decode_refresh_token(token: str) -> dict | None:
+    """
+    Декодирует refresh-токен.
+
+    Args:
+        token: JWT refresh-токен
+
+    Returns:
+        dict: Декодированные данные или None, если токен невалидный или не является refresh-токеном
+
+    """
+    payload = decode_token(token)
+    if not payload or payload.get('type') != REFRESH_TOKEN_TYPE or 'jti' not in payload:
+        return None
+    return payload
@@ -0,0 +1,99 @@
+"""
+Генератор целочисленных идентификаторов, упорядоченных по времени (Snowflake).
+Идентификатор известен до INSERT, поэтому запись можно разослать или собрать
+в пакет, не дожидаясь ответа БД, а сортировка по ID совпадает с порядком создания.
+"""
+
+import datetime
+import time
+
+from app.config import settings
+
+# 41 бит времени + 5 + 7 = 53 бита: идентификатор точно представим числом JavaScript
+WORKER_BITS = 5
+SEQUENCE_BITS = 7
+
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class SnowflakeGenerator:
+    """
+    Идентификаторы вида [миллисекунды от эпохи | ID процесса | номер в миллисекунде].
+
+    41 бит времени хватает на ~69 лет от эпохи, 5 бит - на 32 процесса,
+    7 бит - на 128 идентификаторов в миллисекунду на процесс. Идентификаторы
+    процесса строго возрастают: при переводе часов назад или исчерпании номеров
+    в миллисекунде генератор продолжает с последней выданной миллисекунды,
+    не блокируя цикл событий. Пока ID процесса не назначен (см. app.core.worker_id),
+    идентификаторы не выдаются.
+    """
+
+    def __init__(self, worker_id: int | None = settings.ids.worker_id, epoch_ms: int = settings.ids.id_epoch_ms):
+        self.worker_id: int | None = None
+        self.epoch_ms = epoch_ms
+        self._last_ms = -1
+        self._sequence = 0
+        self.assign(worker_id)
+
+    def assign(self, worker_id: int | None) -> None:
+        """
+        Назначение ID процесса.
+
+        Args:
+            worker_id: ID процесса (None - не назначен, выдача идентификаторов невозможна)
+
+        Raises:
+            ValueError: Если ID вне допустимого диапазона
+
+        """
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            msg = f"worker_id должен быть в диапазоне 0..{MAX_WORKER_ID}"
+            raise ValueError(msg)
+        self.worker_id = worker_id
+
+    def next_id(self, now_ms: int | None = None) -> int:
+        """
+        Следующий идентификатор.
+
+        Args:
+            now_ms: Текущее время в миллисекундах Unix - для тестов
+
+        Returns:
+            int: Идентификатор, больший всех ранее выданных этим генератором
+
+        Raises:
+            RuntimeError: Если ID процесса не назначен
+
+        """
+        if self.worker_id is None:
+            # Без уникального ID процесса идентификаторы разных процессов могут совпасть
+            msg = "ID процесса генератора идентификаторов не назначен"
+            raise RuntimeError(msg)
+        now_ms = time.time_ns() // 1_000_000 if now_ms is None else now_ms
+        if now_ms > self._last_ms:
+            self._last_ms = now_ms
+            self._sequence = 0
+        elif self._sequence < MAX_SEQUENCE:
+            self._sequence += 1
+        else:
+            self._last_ms += 1
+            self._sequence = 0
+        return (
+            (self._last_ms - self.epoch_ms) << (WORKER_BITS + SEQUENCE_BITS)
+            | self.worker_id << SEQUENCE_BITS
+            | self._sequence
+        )
+
+    def timestamp(self, snowflake_id: int) -> datetime.datetime:
+        """Момент создания идентификатора (с точностью до миллисекунды)."""
+        ms = (snowflake_id >> (WORKER_BITS + SEQUENCE_BITS)) + self.epoch_ms
+        return datetime.datetime.fromtimestamp(ms / 1000, tz=datetime.UTC)
+
+    def min_id(self, moment: datetime.datetime) -> int:
+        """Наименьший идентификатор, который мог быть выдан в указанный момент (для выборок по времени)."""
+        ms = int(moment.timestamp() * 1000)
+        return max(0, ms - self.epoch_ms) << (WORKER_BITS + SEQUENCE_BITS)
+
+
+message_ids = SnowflakeGenerator()
@@ -0,0 +1,159 @@
+"""
+Выбор ID процесса для генератора идентификаторов сообщений.
+Если WORKER_ID не задан, процесс при старте занимает первый свободный номер 0-31
+advisory-блокировкой PostgreSQL. Блокировка держится на отдельном соединении (вне пула)
+все время работы процесса: два работающих процесса не получат один номер, а номер
+остановленного или упавшего процесса сервер освобождает. Удержание блокировки
+периодически проверяется: соединение может оборваться незаметно для клиента.
+"""
+
+import asyncio
+import contextlib
+import logging
+
+import asyncpg
+
+from app.config import settings
+from app.core.scheduler import LOCK_HELD_QUERY
+from app.core.snowflake import MAX_WORKER_ID, SnowflakeGenerator, message_ids
+from app.db.session import write_engine
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerIdLease:
+    """
+    Аренда ID процесса на время работы приложения.
+
+    При обрыве соединения сервер освобождает блокировку и номер может занять другой
+    процесс, поэтому генератор сразу перестает выдавать идентификаторы, а аренда
+    возобновляется в фоне раз в retry_interval секунд. Тихий обрыв (сеть, перезапуск
+    сервера) обнаруживается проверкой блокировки раз в probe_interval секунд: если
+    она не удерживается или проверка не ответила за probe_interval, аренда считается
+    потерянной.
+    """
+
+    def __init__(
+            self,
+            generator: SnowflakeGenerator = message_ids,
+            worker_id: int | None = settings.ids.worker_id,
+            lock_class: int = settings.ids.worker_lock_class,
+            retry_interval: float = settings.ids.worker_lease_retry_interval,
+            probe_interval: float = settings.ids.worker_lease_probe_interval
+    ):
+        self.generator = generator
+        self.worker_id = worker_id
+        self.lock_class = lock_class
+        self.retry_interval = retry_interval
+        self.probe_interval = probe_interval
+        self._connection: asyncpg.Connection | None = None
+        self._retry_task: asyncio.Task | None = None
+        self._probe_task: asyncio.Task | None = None
+        self._released = False
+
+    async def acquire(self) -> int:
+        """
+        Назначение ID процесса генератору.
+
+        Returns:
+            int: Заданный WORKER_ID или занятый свободный номер
+
+        Raises:
+            RuntimeError: Если все номера заняты другими процессами
+
+        """
+        self._released = False
+        if self.worker_id is not None:
+            self.generator.assign(self.worker_id)
+            logger.info('Snowflake worker id %s (WORKER_ID)', self.worker_id)
+            return self.worker_id
+        return await self._claim()
+
+    async def _claim(self, preferred: int | None = None) -> int:
+        dsn = write_engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+        connection = await asyncpg.connect(dsn)
+        try:
+            worker_id = await self._lock_free_id(connection, preferred)
+        except BaseException:
+            await connection.close()
+            raise
+        if worker_id is None:
+            await connection.close()
+            msg = f'Все ID процессов 0..{MAX_WORKER_ID} заняты'
+            raise RuntimeError(msg)
+        connection.add_termination_listener(self._on_connection_lost)
+        self._connection = connection
+        self.generator.assign(worker_id)
+        self._probe_task = asyncio.create_task(self._probe(connection, worker_id))
+        logger.info('Snowflake worker id %s claimed', worker_id)
+        return worker_id
+
+    async def _lock_free_id(self, connection: asyncpg.Connection, preferred: int | None) -> int | None:
+        candidates = list(range(MAX_WORKER_ID + 1))
+        if preferred is not None:
+            # После обрыва соединения сначала пробуется прежний номер
+            candidates.remove(preferred)
+            candidates.insert(0, preferred)
+        for worker_id in candidates:
+            if await connection.fetchval('SELECT pg_try_advisory_lock($1, $2)', self.lock_class, worker_id):
+                return worker_id
+        return None
+
+    async def release(self) -> None:
+        """Освобождение номера (закрытие соединения снимает блокировку)."""
+        self._released = True
+        for task in (self._retry_task, self._probe_task):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._retry_task = self._probe_task = None
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.remove_termination_listener(self._on_connection_lost)
+            with contextlib.suppress(Exception):
+                await connection.close()
+
+    async def _probe(self, connection: asyncpg.Connection, worker_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                held = await connection.fetchval(
+                    LOCK_HELD_QUERY, self.lock_class, worker_id, timeout=self.probe_interval
+                )
+            except Exception:  # noqa: BLE001
+                logger.warning('Snowflake worker id %s lease check failed', worker_id, exc_info=True)
+                held = False
+            if not held:
+                break
+        if self._connection is connection:
+            # Соединение закрывается без ожидания: сервер мог уже освободить блокировку
+            connection.remove_termination_listener(self._on_connection_lost)
+            connection.terminate()
+            self._on_connection_lost(connection)
+
+    def _on_connection_lost(self, connection: asyncpg.Connection) -> None:
+        if self._connection is not connection:
+            return
+        self._connection = None
+        if self._probe_task is not None and self._probe_task is not asyncio.current_task():
+            self._probe_task.cancel()
+        self._probe_task = None
+        worker_id = self.generator.worker_id
+        self.generator.assign(None)
+        logger.error('Snowflake worker id %s lease is lost, message ids are unavailable until it is renewed', worker_id)
+        if not self._released and (self._retry_task is None or self._retry_task.done()):
+            self._retry_task = asyncio.get_running_loop().create_task(self._renew(worker_id))
+
+    async def _renew(self, worker_id: int | None) -> None:
+        while not self._released:
+            try:
+                await self._claim(worker_id)
+            except Exception:  # noqa: BLE001
+                logger.warning('Snowflake worker id lease renewal failed', exc_info=True)
+                await asyncio.sleep(self.retry_interval)
+            else:
+                return
+
+
+worker_ids = WorkerIdLease()
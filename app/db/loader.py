@@ -0,0 +1,79 @@
+"""
+Загрузчик сущностей с кэшем идентичности в рамках запроса.
+Устраняет повторные запросы одной и той же записи по ID из разных сервисов
+и объединяет выборки нескольких ID в один запрос.
+"""
+
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+if TYPE_CHECKING:
+    from app.db.repositories.base import BaseRepository
+
+ModelType = TypeVar("ModelType")
+
+LOADERS_KEY = 'loaders'
+
+
+class EntityLoader(Generic[ModelType]):
+    """
+    Кэш идентичности {id: запись} для одной модели.
+
+    Живет столько же, сколько сессия БД, то есть один HTTP-запрос: сессия
+    создается зависимостью get_db и общая для всех репозиториев и сервисов
+    запроса. Отсутствующие записи тоже кэшируются, чтобы повторная проверка
+    несуществующего ID не уходила в БД.
+    """
+
+    def __init__(self, repo: 'BaseRepository[ModelType]'):
+        self.repo = repo
+        self._cache: dict[int, ModelType | None] = {}
+
+    @classmethod
+    def for_session(cls, session: AsyncSession, repo: 'BaseRepository[ModelType]') -> 'EntityLoader[ModelType]':
+        """Получение загрузчика модели репозитория, привязанного к сессии."""
+        loaders: dict[type, EntityLoader] = session.info.setdefault(LOADERS_KEY, {})
+        if repo.model not in loaders:
+            loaders[repo.model] = cls(repo)
+        return loaders[repo.model]
+
+    async def load(self, instance_id: int) -> ModelType | None:
+        """Получение записи по ID (из кэша или из БД)."""
+        if instance_id not in self._cache:
+            await self.load_many([instance_id])
+        return self._cache[instance_id]
+
+    async def load_many(self, ids: Iterable[int]) -> list[ModelType | None]:
+        """
+        Получение записей по списку ID.
+
+        Отсутствующие в кэше ID запрашиваются одним запросом.
+
+        Args:
+            ids: Список ID
+
+        Returns:
+            list[ModelType | None]: Записи в порядке переданных ID (None для несуществующих)
+
+        """
+        ids = list(ids)
+        missing = [i for i in dict.fromkeys(ids) if i not in self._cache]
+        if missing:
+            found = {instance.id: instance for instance in await self.repo.get_many(missing)}
+            for instance_id in missing:
+                self._cache[instance_id] = found.get(instance_id)
+        return [self._cache[i] for i in ids]
+
+    def prime(self, instance: ModelType) -> None:
+        """Помещение актуальной записи в кэш (после создания или изменения)."""
+        self._cache[instance.id] = instance
+
+    def forget(self, instance_id: int) -> None:
+        """Удаление записи из кэша (после изменения, результат которого не загружен)."""
+        self._cache.pop(instance_id, None)
+
+    def clear(self) -> None:
+        """Очистка кэша."""
+        self._cache.clear()
@@ -4,8 +4,10 @@ import datetime
 from typing import ClassVar
 
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
+from app.core.snowflake import message_ids
 from app.db.session import Base
 
 
@@ -13,7 +15,16 @@ class User(Base):
     """Модель пользователя."""
 
     __tablename__ = 'users'
-    __table_args__: ClassVar[dict[str, str]] = {'comment': 'Пользователи системы'}
+    __table_args__: ClassVar[tuple] = (
+        # Нечеткий поиск и поиск по подстроке (pg_trgm)
+        sa.Index(
+            'ix_users_username_trgm',
+            'username',
+            postgresql_using='gin',
+            postgresql_ops={'username': 'gin_trgm_ops'}
+        ),
+        {'comment': 'Пользователи системы'},
+    )
 
     id: Mapped[int] = mapped_column(
         sa.Identity(always=True),
@@ -37,11 +48,27 @@ class User(Base):
     )
 
 
+# Поиск по префиксу без учета регистра: побайтовое сравнение (COLLATE "C") позволяет индексу
+# и отбирать диапазон префикса, и отдавать строки в порядке ORDER BY, так что LIMIT читает только нужные записи
+sa.Index('ix_users_username_lower', sa.func.lower(User.username).collate('C'))
+
+
 class Chat(Base):
-    """Модель чата."""
+    """
+    Модель чата.
+
+    Личный чат однозначно задается упорядоченной парой участников (user_low_id, user_high_id):
+    уникальный индекс по паре не допускает дубликатов и при параллельном создании.
+    У групповых чатов пара не заполняется.
+    """
 
     __tablename__ = 'chats'
-    __table_args__: ClassVar[dict[str, str]] = {'comment': 'Чаты пользователей'}
+    __table_args__: ClassVar[tuple] = (
+        sa.Index('ix_chats_personal_pair', 'user_low_id', 'user_high_id', unique=True),
+        # Задача удаления по сроку обходит только чаты с собственным сроком хранения
+        sa.Index('ix_chats_retention_days', 'retention_days', postgresql_where=sa.text('retention_days IS NOT NULL')),
+        {'comment': 'Чаты пользователей'},
+    )
 
     id: Mapped[int] = mapped_column(
         sa.Identity(always=True),
@@ -54,6 +81,27 @@ class Chat(Base):
         server_default=sa.false(),
         comment='Флаг группового чата (True - группа, False - личный)'
     )
+    user_low_id: Mapped[int | None] = mapped_column(
+        sa.ForeignKey('users.id'),
+        comment='Участник личного чата с меньшим ID'
+    )
+    user_high_id: Mapped[int | None] = mapped_column(
+        sa.ForeignKey('users.id'),
+        comment='Участник личного чата с большим ID'
+    )
+    retention_days: Mapped[int | None] = mapped_column(
+        comment='Срок хранения сообщений чата в днях (NULL - общий срок MESSAGE_RETENTION_DAYS)'
+    )
+    version: Mapped[int] = mapped_column(
+        sa.BigInteger,
+        server_default='0',
+        comment='Версия содержимого чата (увеличивается при каждом изменении сообщений)'
+    )
+    last_seq: Mapped[int] = mapped_column(
+        sa.BigInteger,
+        server_default='0',
+        comment='Последний выданный порядковый номер сообщения чата'
+    )
     created_at: Mapped[datetime.datetime] = mapped_column(
         sa.DateTime(timezone=True),
         server_default=sa.func.now(),
@@ -85,7 +133,10 @@ class Group(Base):
     """Модель группового чата."""
 
     __tablename__ = 'groups'
-    __table_args__: ClassVar[dict[str, str]] = {'comment': 'Групповые чаты'}
+    __table_args__: ClassVar[tuple] = (
+        sa.Index('ix_groups_members', 'members', postgresql_using='gin', postgresql_ops={'members': 'jsonb_path_ops'}),
+        {'comment': 'Групповые чаты'},
+    )
 
     id: Mapped[int] = mapped_column(
         sa.Identity(always=True),
@@ -96,7 +147,12 @@ class Group(Base):
     chat_id: Mapped[int] = mapped_column(sa.ForeignKey('chats.id'), unique=True, comment='ID связанного чата')
     name: Mapped[str] = mapped_column(sa.String(100), comment='Название группы')
     creator_id: Mapped[int] = mapped_column(sa.ForeignKey('users.id'), comment='ID создателя группы')
-    members: Mapped[list[int]] = mapped_column(sa.JSON, comment='Список ID участников группы')
+    members: Mapped[list[int]] = mapped_column(JSONB, comment='Список ID участников группы')
+    version: Mapped[int] = mapped_column(
+        sa.BigInteger,
+        server_default='0',
+        comment='Версия группы (увеличивается при каждом изменении состава)'
+    )
     created_at: Mapped[datetime.datetime] = mapped_column(
         sa.DateTime(timezone=True),
         server_default=sa.func.now(),
@@ -108,20 +164,176 @@ class Message(Base):
     """Модель сообщения."""
 
     __tablename__ = 'messages'
-    __table_args__: ClassVar[dict[str, str]] = {'comment': 'Сообщения в чатах'}
+    __table_args__: ClassVar[tuple] = (
+        sa.Index(
+            'ix_messages_client_message_id',
+            'chat_id',
+            'sender_id',
+            'client_message_id',
+            unique=True,
+            postgresql_where=sa.text('client_message_id IS NOT NULL')
+        ),
+        sa.Index('ix_messages_chat_id_seq', 'chat_id', 'seq', unique=True),
+        {'comment': 'Сообщения в чатах'},
+    )
 
     id: Mapped[int] = mapped_column(
-        sa.Identity(always=True),
+        sa.BigInteger,
         primary_key=True,
+        autoincrement=False,
+        default=message_ids.next_id,
         index=True,
-        comment='Уникальный идентификатор сообщения'
+        comment='Уникальный идентификатор сообщения (Snowflake: возрастает со временем создания)'
     )
-    chat_id: Mapped[int] = mapped_column(sa.ForeignKey('chats.id'), index=True, comment='ID чата')
+    # Отдельный индекс по chat_id не нужен: его заменяет префикс ix_messages_chat_id_seq
+    chat_id: Mapped[int] = mapped_column(sa.ForeignKey('chats.id'), comment='ID чата')
     sender_id: Mapped[int] = mapped_column(sa.ForeignKey('users.id'), comment='ID отправителя')
+    seq: Mapped[int] = mapped_column(sa.BigInteger, comment='Порядковый номер сообщения в чате (монотонно возрастает)')
     text: Mapped[str] = mapped_column(sa.Text(), comment='Текст сообщения')
+    client_message_id: Mapped[str | None] = mapped_column(
+        sa.String(64),
+        comment='Ключ идемпотентности, переданный клиентом (уникален в пределах чата и отправителя)'
+    )
     is_read: Mapped[bool] = mapped_column(server_default=sa.false(), comment='Флаг прочитанного сообщения')
     created_at: Mapped[datetime.datetime] = mapped_column(
         sa.DateTime(timezone=True),
         server_default=sa.func.now(),
         comment='Дата и время отправки'
     )
+
+
+class InboxEntry(Base):
+    """
+    Входящее сообщение пользователя (проекция messages по получателям).
+
+    Заполняется при отправке для личных чатов и групп не больше INBOX_FANOUT_MAX_MEMBERS
+    участников (fan-out-on-write); сообщения больших групп сюда не попадают и читаются
+    из messages (fan-out-on-read).
+    """
+
+    __tablename__ = 'inbox_entries'
+    __table_args__: ClassVar[tuple] = (
+        sa.Index(
+            'ix_inbox_entries_unread',
+            'user_id',
+            'chat_id',
+            postgresql_where=sa.text('NOT is_read')
+        ),
+        {'comment': 'Входящие сообщения пользователей'},
+    )
+
+    user_id: Mapped[int] = mapped_column(sa.ForeignKey('users.id'), primary_key=True, comment='ID получателя')
+    message_id: Mapped[int] = mapped_column(
+        sa.ForeignKey('messages.id', ondelete='CASCADE'),
+        primary_key=True,
+        # Каскадное удаление при удалении сообщений ищет записи по message_id
+        index=True,
+        comment='ID сообщения (Snowflake: порядок ключа совпадает с порядком отправки)'
+    )
+    chat_id: Mapped[int] = mapped_column(sa.ForeignKey('chats.id'), comment='ID чата')
+    is_read: Mapped[bool] = mapped_column(server_default=sa.false(), comment='Прочитано ли сообщение получателем')
+
+
+class ChatReadCursor(Base):
+    """
+    Позиция прочтения чата участником (seq последнего прочитанного сообщения).
+
+    Ведется для всех чатов, но нужна для больших групп: их сообщения не раскладываются
+    по inbox_entries, и непрочитанные считаются как сообщения чата с seq больше позиции.
+    """
+
+    __tablename__ = 'chat_read_cursors'
+    __table_args__: ClassVar[dict[str, str]] = {'comment': 'Позиции прочтения чатов участниками'}
+
+    user_id: Mapped[int] = mapped_column(sa.ForeignKey('users.id'), primary_key=True, comment='ID участника')
+    chat_id: Mapped[int] = mapped_column(sa.ForeignKey('chats.id'), primary_key=True, comment='ID чата')
+    last_read_seq: Mapped[int] = mapped_column(sa.BigInteger, comment='seq последнего прочитанного сообщения')
+
+
+class OutboxEvent(Base):
+    """
+    Событие для рассылки подключенным клиентам (transactional outbox).
+
+    Записывается в одной транзакции с изменением, поэтому событие появляется
+    тогда и только тогда, когда изменение зафиксировано. Каждый процесс читает
+    все события по возрастанию ID; старые события удаляются по сроку хранения.
+    """
+
+    __tablename__ = 'outbox_events'
+    __table_args__: ClassVar[dict[str, str]] = {'comment': 'События для рассылки по WebSocket'}
+
+    id: Mapped[int] = mapped_column(
+        sa.BigInteger,
+        sa.Identity(always=True),
+        primary_key=True,
+        comment='Уникальный идентификатор события (порядок записи)'
+    )
+    chat_id: Mapped[int] = mapped_column(sa.ForeignKey('chats.id', ondelete='CASCADE'), comment='ID чата события')
+    payload: Mapped[dict] = mapped_column(JSONB, comment='Фрейм WebSocket для участников чата')
+    origin: Mapped[str | None] = mapped_column(
+        sa.Text,
+        comment='Устройство-источник "user_id:device_id" (ему событие не рассылается)'
+    )
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        sa.DateTime(timezone=True),
+        server_default=sa.func.now(),
+        index=True,
+        comment='Дата создания события'
+    )
+
+
+class RetentionCheckpoint(Base):
+    """
+    Позиция задачи удаления сообщений по сроку хранения.
+
+    Каждый проход (общий - по ID сообщений, чата - по seq) продолжается с сохраненной
+    позиции и не перечитывает уже удаленные строки, мертвые версии которых еще
+    не убрал VACUUM.
+    """
+
+    __tablename__ = 'retention_checkpoints'
+    __table_args__: ClassVar[dict[str, str]] = {'comment': 'Позиции удаления сообщений по сроку хранения'}
+
+    name: Mapped[str] = mapped_column(
+        sa.String(64),
+        primary_key=True,
+        comment='Проход: "messages" (общий срок) или "chat:<id>" (срок чата)'
+    )
+    position: Mapped[int] = mapped_column(
+        sa.BigInteger,
+        comment='Ключ последнего удаленного сообщения (ID или seq)'
+    )
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        sa.DateTime(timezone=True),
+        server_default=sa.func.now(),
+        onupdate=sa.func.now(),
+        comment='Дата последнего сдвига позиции'
+    )
+
+
+class UserSession(Base):
+    """Модель сессии пользователя (refresh-токена)."""
+
+    __tablename__ = 'sessions'
+    __table_args__: ClassVar[dict[str, str]] = {'comment': 'Сессии пользователей (refresh-токены)'}
+
+    id: Mapped[int] = mapped_column(
+        sa.Identity(always=True),
+        primary_key=True,
+        comment='Уникальный идентификатор сессии'
+    )
+    user_id: Mapped[int] = mapped_column(sa.ForeignKey('users.id'), index=True, comment='ID пользователя')
+    jti: Mapped[str] = mapped_column(sa.String(36), unique=True, comment='Идентификатор refresh-токена')
+    expires_at: Mapped[datetime.datetime] = mapped_column(
+        sa.DateTime(timezone=True),
+        comment='Дата истечения refresh-токена'
+    )
+    revoked_at: Mapped[datetime.datetime | None] = mapped_column(
+        sa.DateTime(timezone=True),
+        comment='Дата отзыва (или ротации) refresh-токена'
+    )
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        sa.DateTime(timezone=True),
+        server_default=sa.func.now(),
+        comment='Дата создания сессии'
+    )
@@ -1,7 +1,21 @@
 from .base import BaseRepository
 from .chat import ChatRepository
 from .group import GroupRepository
+from .inbox import InboxRepository
 from .message import MessageRepository
+from .outbox import OutboxRepository
+from .retention import RetentionRepository
+from .session import SessionRepository
 from .user import UserRepository
 
-__all__ = ['BaseRepository', 'ChatRepository', 'GroupRepository', 'MessageRepository', 'UserRepository']
+__all__ = [
+    'BaseRepository',
+    'ChatRepository',
+    'GroupRepository',
+    'InboxRepository',
+    'MessageRepository',
+    'OutboxRepository',
+    'RetentionRepository',
+    'SessionRepository',
+    'UserRepository',
+]
@@ -4,12 +4,14 @@
 Реализует паттерн Repository для абстракции доступа к данным.
 """
 
+from collections.abc import Iterable
 from typing import Any, Generic, TypeVar
 
 from pydantic import BaseModel
-from sqlalchemy import func, select
+from sqlalchemy import ColumnElement, delete, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.loader import EntityLoader
 from app.db.session import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -17,12 +19,34 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 
 
 class BaseRepository(Generic[ModelType]):
-    """Базовый класс репозитория с общими методами для работы с моделями."""
+    """
+    Базовый класс репозитория с общими методами для работы с моделями.
+
+    Все операции записи выполняются одним запросом INSERT/UPDATE/DELETE ... RETURNING,
+    без предварительного SELECT и без повторного чтения записи после изменения.
+    Репозиторий не фиксирует транзакцию: границы транзакции задает UnitOfWork сервиса.
+
+    Методы load/load_many читают записи через кэш идентичности запроса, общий
+    для всех репозиториев одной сессии; операции записи поддерживают его актуальным.
+    """
 
     def __init__(self, model: type[ModelType], session: AsyncSession):
         self.model = model
         self.session = session
 
+    @property
+    def loader(self) -> EntityLoader[ModelType]:
+        """Загрузчик записей модели с кэшем идентичности в рамках сессии (запроса)."""
+        return EntityLoader.for_session(self.session, self)
+
+    async def load(self, instance_id: int) -> ModelType | None:
+        """Получение записи по ID через кэш запроса: повторные обращения не идут в БД."""
+        return await self.loader.load(instance_id)
+
+    async def load_many(self, ids: Iterable[int]) -> list[ModelType | None]:
+        """Получение записей по списку ID через кэш запроса (недостающие — одним запросом)."""
+        return await self.loader.load_many(ids)
+
     async def get(self, instance_id: int) -> ModelType | None:
         """Получение записи по ID."""
         result = await self.session.execute(
@@ -30,6 +54,16 @@ class BaseRepository(Generic[ModelType]):
         )
         return result.scalar_one_or_none()
 
+    async def get_many(self, ids: Iterable[int]) -> list[ModelType]:
+        """Получение записей по списку ID одним запросом."""
+        ids = set(ids)
+        if not ids:
+            return []
+        result = await self.session.execute(
+            select(self.model).where(self.model.id.in_(ids))
+        )
+        return list(result.scalars().all())
+
     async def get_all(self) -> list[ModelType]:
         """Получение всех записей."""
         result = await self.session.execute(select(self.model))
@@ -37,30 +71,62 @@ class BaseRepository(Generic[ModelType]):
 
     async def create(self, data: dict[str, Any]) -> ModelType:
         """Создание новой записи."""
-        instance = self.model(**data)
-        self.session.add(instance)
-        await self.session.commit()
-        await self.session.refresh(instance)
+        result = await self.session.execute(
+            insert(self.model).values(**data).returning(self.model)
+        )
+        instance = result.scalar_one()
+        self.loader.prime(instance)
         return instance
 
+    async def bulk_create(self, rows: list[dict[str, Any]]) -> list[ModelType]:
+        """Создание нескольких записей одним запросом (в порядке переданных данных)."""
+        if not rows:
+            return []
+        result = await self.session.scalars(
+            insert(self.model).returning(self.model, sort_by_parameter_order=True),
+            rows
+        )
+        instances = list(result.all())
+        for instance in instances:
+            self.loader.prime(instance)
+        return instances
+
     async def update(self, instance_id: int, data: dict[str, Any]) -> ModelType | None:
         """Обновление записи."""
-        instance = await self.get(instance_id)
-        if instance:
-            for key, value in data.items():
-                setattr(instance, key, value)
-            await self.session.commit()
-            await self.session.refresh(instance)
-        return instance
+        instances = await self.update_where(data, self.model.id == instance_id)
+        return instances[0] if instances else None
+
+    async def update_where(self, data: dict[str, Any], *where: ColumnElement[bool]) -> list[ModelType]:
+        """
+        Обновление всех записей, удовлетворяющих условиям.
+
+        Args:
+            data: Новые значения полей
+            where: Условия отбора записей
+
+        Returns:
+            list[ModelType]: Обновленные записи
+
+        """
+        result = await self.session.execute(
+            update(self.model)
+            .where(*where)
+            .values(**data)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        instances = list(result.scalars().all())
+        for instance in instances:
+            self.loader.prime(instance)
+        return instances
 
     async def delete(self, instance_id: int) -> bool:
         """Удаление записи."""
-        instance = await self.get(instance_id)
-        if instance:
-            await self.session.delete(instance)
-            await self.session.commit()
-            return True
-        return False
+        result = await self.session.execute(
+            delete(self.model).where(self.model.id == instance_id).returning(self.model.id)
+        )
+        self.loader.forget(instance_id)
+        return result.scalar_one_or_none() is not None
 
     async def count(self) -> int:
         """Подсчет количества объектов."""
@@ -5,8 +5,10 @@
 Поддерживает как личные, так и групповые чаты.
 """
 
-from sqlalchemy import alias, and_, select
-from sqlalchemy.dialects.postgresql import JSONB
+from collections.abc import Iterable
+
+from sqlalchemy import and_, delete, func, literal_column, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
 
 from app.db.models import Chat, Group, UserChat
 from app.db.repositories.base import BaseRepository
@@ -40,14 +42,23 @@ class ChatRepository(BaseRepository[Chat]):
         if result.scalar_one_or_none():
             return False
 
-        user_chat = UserChat(
-            chat_id=chat_id,
-            user_id=user_id
-        )
-        self.session.add(user_chat)
-        await self.session.commit()
+        await self.session.execute(insert(UserChat).values(chat_id=chat_id, user_id=user_id))
         return True
 
+    async def add_users_to_chat(self, chat_id: int, user_ids: list[int]) -> None:
+        """
+        Добавление нескольких пользователей в новый чат одним запросом.
+
+        Args:
+            chat_id: ID чата
+            user_ids: ID пользователей
+
+        """
+        await self.session.execute(
+            insert(UserChat),
+            [{"chat_id": chat_id, "user_id": user_id} for user_id in dict.fromkeys(user_ids)]
+        )
+
     async def user_has_access(self, user_id: int, chat_id: int) -> bool:
         """
         Проверка доступа пользователя к чату.
@@ -77,13 +88,151 @@ class ChatRepository(BaseRepository[Chat]):
             .where(
                 and_(
                     Chat.id == chat_id,
-                    Group.members.cast(JSONB).contains([user_id])
+                    Group.members.contains([user_id])
                 )
             )
         )
         result = await self.session.execute(group_chat_query)
         return result.scalar_one_or_none() is not None
 
+    async def get_member_count(self, user_id: int, chat_id: int) -> int | None:
+        """
+        Число участников чата, доступного пользователю.
+
+        Доступ проверяется так же, как в user_has_access, но одним запросом
+        вместе с числом участников (у личного чата их двое).
+
+        Args:
+            user_id: ID пользователя
+            chat_id: ID чата
+
+        Returns:
+            int | None: Число участников или None, если у пользователя нет доступа к чату
+
+        """
+        query = (
+            select(func.coalesce(func.jsonb_array_length(Group.members), 2))
+            .select_from(Chat)
+            .outerjoin(Group, Group.chat_id == Chat.id)
+            .where(
+                Chat.id == chat_id,
+                or_(
+                    Group.members.contains([user_id]),
+                    select(UserChat.id).where(UserChat.chat_id == Chat.id, UserChat.user_id == user_id).exists()
+                )
+            )
+        )
+        result = await self.session.execute(query)
+        return result.scalar_one_or_none()
+
+    async def is_owner(self, user_id: int, chat_id: int) -> bool:
+        """
+        Проверка, что пользователь управляет настройками чата.
+
+        Групповым чатом управляет создатель группы, личным - любой из двух участников
+        (у личного чата нет отдельного владельца). Проверяется одним запросом.
+
+        Args:
+            user_id: ID пользователя
+            chat_id: ID чата
+
+        Returns:
+            bool: True, если пользователь - создатель группы или участник личного чата
+
+        """
+        query = (
+            select(literal_column('1'))
+            .select_from(Chat)
+            .outerjoin(Group, Group.chat_id == Chat.id)
+            .where(
+                Chat.id == chat_id,
+                or_(
+                    Group.creator_id == user_id,
+                    and_(~Chat.is_group, or_(Chat.user_low_id == user_id, Chat.user_high_id == user_id))
+                )
+            )
+        )
+        result = await self.session.execute(query)
+        return result.scalar_one_or_none() is not None
+
+    async def bump_version(self, chat_id: int) -> None:
+        """
+        Увеличение версии чата.
+
+        Вызывается в той же транзакции, что и изменение сообщений чата:
+        версия участвует в ETag истории сообщений.
+
+        Args:
+            chat_id: ID чата
+
+        """
+        await self.session.execute(update(Chat).where(Chat.id == chat_id).values(version=Chat.version + 1))
+
+    async def bump_versions(self, chat_ids: Iterable[int]) -> None:
+        """
+        Увеличение версий нескольких чатов одним запросом.
+
+        Args:
+            chat_ids: ID чатов
+
+        """
+        chat_ids = sorted(set(chat_ids))
+        if chat_ids:
+            await self.session.execute(update(Chat).where(Chat.id.in_(chat_ids)).values(version=Chat.version + 1))
+
+    async def next_seq(self, chat_id: int) -> int:
+        """
+        Выдача следующего порядкового номера сообщения чата.
+
+        Номер выдается запросом UPDATE ... RETURNING в транзакции отправки: строка чата
+        остается заблокированной до фиксации, поэтому номера возрастают в порядке
+        фиксации сообщений, в том числе при отправке из нескольких процессов.
+        Тем же запросом увеличивается версия чата.
+
+        Args:
+            chat_id: ID чата
+
+        Returns:
+            int: Порядковый номер нового сообщения
+
+        """
+        result = await self.session.execute(
+            update(Chat)
+            .where(Chat.id == chat_id)
+            .values(last_seq=Chat.last_seq + 1, version=Chat.version + 1)
+            .returning(Chat.last_seq)
+        )
+        return result.scalar_one()
+
+    async def get_accessible_chats(self, user_id: int, chat_ids: Iterable[int]) -> list[Chat]:
+        """
+        Получение чатов из списка, доступных пользователю, одним запросом.
+
+        Args:
+            user_id: ID пользователя
+            chat_ids: ID запрашиваемых чатов
+
+        Returns:
+            list[Chat]: Доступные чаты (личные и групповые)
+
+        """
+        chat_ids = set(chat_ids)
+        if not chat_ids:
+            return []
+        result = await self.session.execute(
+            select(Chat).where(
+                Chat.id.in_(chat_ids),
+                or_(
+                    select(UserChat.id).where(UserChat.chat_id == Chat.id, UserChat.user_id == user_id).exists(),
+                    select(Group.id).where(Group.chat_id == Chat.id, Group.members.contains([user_id])).exists()
+                )
+            )
+        )
+        chats = list(result.scalars().all())
+        for chat in chats:
+            self.loader.prime(chat)
+        return chats
+
     async def get_user_chats(self, user_id: int) -> list[Chat]:
         """
         Получение всех чатов пользователя:
@@ -100,56 +249,48 @@ class ChatRepository(BaseRepository[Chat]):
 
     async def get_chat_by_id(self, chat_id: int) -> Chat | None:
         """Получение чата по ID."""
-        query = select(Chat).where(Chat.id == chat_id)
-        result = await self.session.execute(query)
-        return result.scalar_one_or_none()
+        return await self.get(chat_id)
 
     async def create_chat(self, name: str, is_group: bool = False) -> Chat:
         """Создание нового чата."""
-        chat = Chat(name=name, is_group=is_group)
-        self.session.add(chat)
-        await self.session.commit()
-        await self.session.refresh(chat)
-        return chat
+        return await self.create({"name": name, "is_group": is_group})
 
     async def remove_user_from_chat(self, user_id: int, chat_id: int) -> None:
         """Удаление пользователя из чата."""
-        query = select(UserChat).where(
-            and_(UserChat.user_id == user_id, UserChat.chat_id == chat_id)
+        await self.session.execute(
+            delete(UserChat).where(
+                and_(UserChat.user_id == user_id, UserChat.chat_id == chat_id)
+            )
         )
-        result = await self.session.execute(query)
-        user_chat = result.scalar_one_or_none()
-        if user_chat:
-            await self.session.delete(user_chat)
-            await self.session.commit()
 
-    async def check_chat_exists(self, user1_id: int, user2_id: int) -> bool:
+    async def get_or_create_personal_chat(self, user1_id: int, user2_id: int, name: str) -> tuple[Chat, bool]:
         """
-        Проверяет существование личного чата между двумя пользователями.
+        Получение или создание личного чата двух пользователей одним запросом.
+
+        Выполняется через INSERT ... ON CONFLICT DO UPDATE по уникальному индексу
+        упорядоченной пары участников: при параллельных запросах чат создается
+        ровно один раз, остальные получают уже созданный.
 
         Args:
             user1_id: ID первого пользователя
             user2_id: ID второго пользователя
+            name: Название нового чата
 
         Returns:
-            bool: True если чат существует, False если нет
+            tuple[Chat, bool]: Чат и флаг, создан ли он этим вызовом
 
         """
-        uc1 = alias(UserChat, name='uc1')
-        uc2 = alias(UserChat, name='uc2')
-
-        subquery = (
-            select(Chat.id)
-            .join(uc1, Chat.id == uc1.c.chat_id)
-            .join(uc2, Chat.id == uc2.c.chat_id)
-            .where(
-                and_(
-                    Chat.is_group.is_(False),
-                    uc1.c.user_id == user1_id,
-                    uc2.c.user_id == user2_id
-                )
+        user_low_id, user_high_id = sorted((user1_id, user2_id))
+        stmt = insert(Chat).values(name=name, is_group=False, user_low_id=user_low_id, user_high_id=user_high_id)
+        result = await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Chat.user_low_id, Chat.user_high_id],
+                # Обновление без изменений нужно, чтобы RETURNING вернул существующую строку
+                set_={'user_low_id': stmt.excluded.user_low_id}
             )
-        ).exists()
-
-        result = await self.session.execute(select(subquery))
-        return result.scalar()
+            # xmax = 0 только у строки, вставленной этим запросом
+            .returning(Chat, literal_column('xmax = 0'))
+        )
+        chat, created = result.one()
+        self.loader.prime(chat)
+        return chat, created
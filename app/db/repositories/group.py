@@ -3,69 +3,138 @@
 Содержит методы для получения и управления группами.
 Обеспечивает проверку прав доступа и валидацию операций с группами.
 """
-from sqlalchemy import select, text
+from sqlalchemy import delete, exists, func, literal, select, update
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
 
-from app.db.models import Group
+from app.db.models import Group, InboxEntry
 from app.db.repositories.base import BaseRepository
 
 
 class GroupRepository(BaseRepository[Group]):
-    """Репозиторий для работы с группами."""
+    """
+    Репозиторий для работы с группами.
+
+    Изменение состава участников выполняется атомарно на стороне БД одним
+    запросом UPDATE ... RETURNING: условие в WHERE делает операцию идемпотентной,
+    а блокировка строки сериализует конкурентные изменения одной группы
+    без потери обновлений. Каждое изменение увеличивает версию группы.
+    """
 
     def __init__(self, session):
         super().__init__(Group, session)
 
-    async def get(self, group_id: int) -> Group | None:
+    async def get_user_groups(self, user_id: int) -> list[Group]:
         """
-        Получение группы по ID.
+        Получение списка групп пользователя.
 
         Args:
-            group_id: ID группы
+            user_id: ID пользователя
 
         Returns:
-            Group | None: Группа или None, если не найдена
+            list[Group]: Список групп
 
         """
-        query = select(Group).where(Group.id == group_id)
+        query = select(Group).where(Group.members.contains([user_id]))
         result = await self.session.execute(query)
-        return result.scalar_one_or_none()
+        return list(result.scalars().all())
 
-    async def get_user_groups(self, user_id: int) -> list[Group]:
+    async def get_user_group_versions(self, user_id: int) -> list[tuple[int, int]]:
         """
-        Получение списка групп пользователя.
+        Получение версий групп пользователя без загрузки самих групп.
 
         Args:
             user_id: ID пользователя
 
         Returns:
-            list[Group]: Список групп
+            list[tuple[int, int]]: Пары (ID группы, версия), упорядоченные по ID
 
         """
-        query = select(Group).where(text("CAST(members AS jsonb) @> CAST(:user_id AS jsonb)"))
-        result = await self.session.execute(query, {"user_id": f"[{user_id}]"})
-        return list(result.scalars().all())
+        result = await self.session.execute(
+            select(Group.id, Group.version).where(Group.members.contains([user_id])).order_by(Group.id)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def add_members(self, group_id: int, user_ids: list[int]) -> list[int] | None:
+        """
+        Добавление участников в группу одним запросом.
+
+        Уже состоящие в группе пользователи пропускаются, порядок участников сохраняется.
 
-    async def add_member(self, group_id: int, user_id: int) -> bool:
-        """Добавление участника в группу."""
-        group = await self.get(group_id)
-        if not group or user_id in group.members:
-            return False
+        Args:
+            group_id: ID группы
+            user_ids: ID добавляемых пользователей
+
+        Returns:
+            list[int] | None: Новый список участников или None,
+            если группа не найдена либо все пользователи уже в ней состоят
 
-        group.members.append(user_id)
-        await self.session.commit()
-        return True
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        requested = func.jsonb_array_elements(literal(user_ids, JSONB)).table_valued('value').alias('requested')
+        new_members = (
+            select(func.coalesce(func.jsonb_agg(requested.c.value), literal([], JSONB)))
+            .where(~Group.members.contains(func.jsonb_build_array(requested.c.value)))
+            .scalar_subquery()
+        )
+        result = await self.session.execute(
+            update(Group)
+            .where(Group.id == group_id, ~Group.members.contains(user_ids))
+            .values(members=Group.members.op('||')(new_members), version=Group.version + 1)
+            .returning(Group.members)
+            .execution_options(synchronize_session='fetch')
+        )
+        self.loader.forget(group_id)
+        return result.scalar_one_or_none()
+
+    async def remove_member(self, group_id: int, user_id: int) -> list[int] | None:
+        """
+        Удаление участника из группы одним запросом.
 
-    async def remove_member(self, group_id: int, user_id: int) -> bool:
-        """Удаление участника из группы."""
-        group = await self.get(group_id)
-        if not group or user_id not in group.members:
-            return False
+        Входящие бывшего участника из чата группы удаляются в той же транзакции.
 
-        group.members.remove(user_id)
-        await self.session.commit()
-        return True
+        Args:
+            group_id: ID группы
+            user_id: ID пользователя
+
+        Returns:
+            list[int] | None: Новый список участников или None,
+            если группа не найдена либо пользователь в ней не состоит
+
+        """
+        current = (
+            func.jsonb_array_elements(Group.members)
+            .table_valued('value', with_ordinality='position')
+            .render_derived(name='current')
+        )
+        remaining = (
+            select(
+                func.coalesce(
+                    func.jsonb_agg(aggregate_order_by(current.c.value, current.c.position)),
+                    literal([], JSONB)
+                )
+            )
+            .where(current.c.value != func.to_jsonb(user_id))
+            .scalar_subquery()
+        )
+        result = await self.session.execute(
+            update(Group)
+            .where(Group.id == group_id, Group.members.contains([user_id]))
+            .values(members=remaining, version=Group.version + 1)
+            .returning(Group.members, Group.chat_id)
+            .execution_options(synchronize_session='fetch')
+        )
+        self.loader.forget(group_id)
+        row = result.one_or_none()
+        if row is None:
+            return None
+        await self.session.execute(
+            delete(InboxEntry).where(InboxEntry.user_id == user_id, InboxEntry.chat_id == row.chat_id)
+        )
+        return row.members
 
     async def is_member(self, user_id: int, group_id: int) -> bool:
         """Проверка участия пользователя в группе."""
-        group = await self.get(group_id)
-        return group is not None and user_id in group.members
+        result = await self.session.execute(
+            select(exists().where(Group.id == group_id, Group.members.contains([user_id])))
+        )
+        return result.scalar()
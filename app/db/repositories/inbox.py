@@ -0,0 +1,216 @@
+"""
+Репозиторий входящих сообщений пользователей.
+Поддерживает проекцию inbox_entries: раскладку сообщений по получателям при отправке,
+чтение входящих и счетчиков непрочитанного по индексу получателя.
+Сообщения больших групп читаются напрямую из messages, непрочитанные в них считаются
+по позициям прочтения участников (chat_read_cursors).
+"""
+
+from collections.abc import Iterable
+
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    cast,
+    column,
+    desc,
+    func,
+    lateral,
+    literal,
+    select,
+    true,
+    union,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db.models import ChatReadCursor, Group, InboxEntry, Message, UserChat
+from app.db.repositories.base import BaseRepository
+
+
+class InboxRepository(BaseRepository[InboxEntry]):
+    """Репозиторий для работы с входящими сообщениями."""
+
+    def __init__(self, session):
+        super().__init__(InboxEntry, session)
+
+    async def fan_out(self, message: Message, max_members: int) -> int:
+        """
+        Раскладка нового сообщения по входящим участников чата одним запросом.
+
+        Получатели - участники личного чата (user_chats) или группы не больше
+        max_members участников, кроме отправителя. Для больших групп ничего не пишется.
+
+        Args:
+            message: Новое сообщение
+            max_members: Максимальный размер группы для раскладки
+
+        Returns:
+            int: Количество созданных записей
+
+        """
+        member = func.jsonb_array_elements_text(Group.members).table_valued('value').render_derived(name='member')
+        recipients = union(
+            select(UserChat.user_id.label('user_id')).where(UserChat.chat_id == message.chat_id),
+            select(cast(member.c.value, Integer).label('user_id'))
+            .select_from(Group)
+            .join(member, literal(True))
+            .where(Group.chat_id == message.chat_id, func.jsonb_array_length(Group.members) <= max_members)
+        ).subquery('recipients')
+        result = await self.session.execute(
+            insert(InboxEntry).from_select(
+                ['user_id', 'message_id', 'chat_id'],
+                select(
+                    recipients.c.user_id,
+                    literal(message.id, BigInteger),
+                    literal(message.chat_id, Integer)
+                ).where(recipients.c.user_id != message.sender_id)
+            )
+        )
+        return result.rowcount
+
+    async def get_messages(self, user_id: int, limit: int, before_id: int | None = None) -> list[Message]:
+        """
+        Входящие сообщения пользователя, от новых к старым.
+
+        Читаются по первичному ключу (user_id, message_id): один проход по индексу
+        в пределах получателя.
+
+        Args:
+            user_id: ID получателя
+            limit: Количество сообщений
+            before_id: Курсор страницы: только сообщения с ID меньше указанного
+
+        Returns:
+            list[Message]: Сообщения
+
+        """
+        query = (
+            select(Message)
+            .join(InboxEntry, InboxEntry.message_id == Message.id)
+            .where(InboxEntry.user_id == user_id)
+        )
+        if before_id is not None:
+            query = query.where(InboxEntry.message_id < before_id)
+        result = await self.session.execute(query.order_by(desc(InboxEntry.message_id)).limit(limit))
+        return list(result.scalars().all())
+
+    async def unread_counts(self, user_id: int) -> list[tuple[int, int]]:
+        """Количество непрочитанных входящих по чатам [(chat_id, count)] (по частичному индексу непрочитанных)."""
+        result = await self.session.execute(
+            select(InboxEntry.chat_id, func.count())
+            .where(InboxEntry.user_id == user_id, InboxEntry.is_read.is_(False))
+            .group_by(InboxEntry.chat_id)
+        )
+        return list(result.tuples().all())
+
+    async def mark_read(self, user_id: int, chat_id: int, up_to_message_id: int, up_to_seq: int) -> int:
+        """
+        Пометка входящих чата прочитанными до указанного сообщения включительно.
+
+        Тем же запросом сдвигается позиция прочтения чата участником (только вперед):
+        по ней считаются непрочитанные сообщения больших групп без проекции.
+
+        Args:
+            user_id: ID получателя
+            chat_id: ID чата
+            up_to_message_id: ID последнего прочитанного сообщения
+            up_to_seq: seq последнего прочитанного сообщения
+
+        Returns:
+            int: Количество помеченных записей
+
+        """
+        cursor = insert(ChatReadCursor).values(user_id=user_id, chat_id=chat_id, last_read_seq=up_to_seq)
+        cursor = cursor.on_conflict_do_update(
+            index_elements=[ChatReadCursor.user_id, ChatReadCursor.chat_id],
+            set_={'last_read_seq': func.greatest(ChatReadCursor.last_read_seq, cursor.excluded.last_read_seq)}
+        ).cte('read_cursor')
+        result = await self.session.execute(
+            update(InboxEntry)
+            .add_cte(cursor)
+            .where(
+                InboxEntry.user_id == user_id,
+                InboxEntry.chat_id == chat_id,
+                InboxEntry.message_id <= up_to_message_id,
+                InboxEntry.is_read.is_(False)
+            )
+            .values(is_read=True)
+        )
+        return result.rowcount
+
+    async def get_large_group_chat_ids(self, user_id: int, max_members: int) -> list[int]:
+        """ID чатов групп пользователя, превышающих порог раскладки (fan-out-on-read)."""
+        result = await self.session.execute(
+            select(Group.chat_id).where(
+                Group.members.contains([user_id]),
+                func.jsonb_array_length(Group.members) > max_members
+            )
+        )
+        return list(result.scalars().all())
+
+    async def get_chat_messages(
+            self,
+            chat_ids: Iterable[int],
+            user_id: int,
+            limit: int,
+            before_id: int | None = None
+    ) -> list[Message]:
+        """Последние сообщения чатов без проекции (кроме сообщений самого пользователя), от новых к старым."""
+        chat_ids = set(chat_ids)
+        if not chat_ids:
+            return []
+        query = select(Message).where(Message.chat_id.in_(chat_ids), Message.sender_id != user_id)
+        if before_id is not None:
+            query = query.where(Message.id < before_id)
+        result = await self.session.execute(query.order_by(desc(Message.id)).limit(limit))
+        return list(result.scalars().all())
+
+    async def unread_chat_counts(self, chat_ids: Iterable[int], user_id: int, limit: int) -> list[tuple[int, int]]:
+        """
+        Количество непрочитанных пользователем сообщений чатов без проекции [(chat_id, count)].
+
+        Непрочитанные - чужие сообщения с seq больше позиции прочтения пользователя
+        (без позиции - все сообщения чата). Каждый чат читается диапазоном индекса
+        (chat_id, seq), счет ограничен limit: дальше клиенту достаточно «limit+».
+
+        Args:
+            chat_ids: ID чатов
+            user_id: ID пользователя
+            limit: Максимальное значение счетчика одного чата
+
+        Returns:
+            list[tuple[int, int]]: Чаты с непрочитанными сообщениями
+
+        """
+        chat_ids = set(chat_ids)
+        if not chat_ids:
+            return []
+        chats = values(column('chat_id', Integer), name='chats').data([(chat_id,) for chat_id in sorted(chat_ids)])
+        last_read_seq = (
+            select(ChatReadCursor.last_read_seq)
+            .where(ChatReadCursor.user_id == user_id, ChatReadCursor.chat_id == chats.c.chat_id)
+            .correlate(chats)
+            .scalar_subquery()
+        )
+        unread = lateral(
+            select(func.count().label('count')).select_from(
+                select(literal(1))
+                .where(
+                    Message.chat_id == chats.c.chat_id,
+                    Message.seq > func.coalesce(last_read_seq, 0),
+                    Message.sender_id != user_id
+                )
+                .correlate(chats)
+                .limit(limit)
+                .subquery()
+            )
+        )
+        result = await self.session.execute(
+            select(chats.c.chat_id, unread.c.count)
+            .select_from(chats)
+            .join(unread, true())
+            .where(unread.c.count > 0)
+        )
+        return list(result.tuples().all())
@@ -3,7 +3,11 @@
 Содержит методы для создания, получения и обновления сообщений.
 Реализует функционал пометки сообщений как прочитанных и получения истории сообщений.
 """
-from sqlalchemy import Sequence, desc, select, update
+from typing import Any
+
+from sqlalchemy import BigInteger, Sequence, column, desc, lateral, select, true, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
 
 from app.db.models import Message
 from app.db.repositories.base import BaseRepository
@@ -15,24 +19,127 @@ class MessageRepository(BaseRepository[Message]):
     def __init__(self, session):
         super().__init__(Message, session)
 
-    async def get_chat_messages(self, chat_id: int, limit: int = 100, offset: int = 0) -> Sequence[Message]:
-        """Получение сообщений чата с пагинацией."""
+    async def get_chat_messages(
+            self,
+            chat_id: int,
+            limit: int = 100,
+            offset: int = 0,
+            *,
+            before_seq: int | None = None
+    ) -> Sequence[Message]:
+        """
+        Получение сообщений чата с пагинацией, от новых к старым.
+
+        С курсором before_seq страница читается по индексу (chat_id, seq) сразу
+        с нужного места, без пропуска offset строк.
+        """
+        query = select(Message).where(Message.chat_id == chat_id)
+        if before_seq is not None:
+            query = query.where(Message.seq < before_seq)
         result = await self.session.execute(
+            query.order_by(desc(Message.seq)).limit(limit).offset(offset)
+        )
+        return result.scalars().all()
+
+    async def get_messages_after(self, cursors: dict[int, int], limit: int) -> list[Message]:
+        """
+        Получение новых сообщений нескольких чатов одним запросом.
+
+        Для каждого чата выбирается не больше limit сообщений с seq больше переданного:
+        курсоры передаются списком VALUES, к которому через LATERAL присоединяется
+        выборка по индексу (chat_id, seq), так что каждый чат читается отдельным
+        коротким проходом по индексу.
+
+        Args:
+            cursors: Последний известный seq по чатам {chat_id: last_seq}
+            limit: Максимум сообщений на чат
+
+        Returns:
+            list[Message]: Сообщения, упорядоченные по чату и seq
+
+        """
+        if not cursors:
+            return []
+        known = values(column('chat_id', BigInteger), column('seq', BigInteger), name='known').data(
+            list(cursors.items())
+        )
+        newer = lateral(
             select(Message)
-            .where(Message.chat_id == chat_id)
-            .order_by(desc(Message.created_at))
+            .where(Message.chat_id == known.c.chat_id, Message.seq > known.c.seq)
+            .order_by(Message.seq)
             .limit(limit)
-            .offset(offset)
         )
-        return result.scalars().all()
+        message = aliased(Message, newer)
+        result = await self.session.execute(
+            select(message)
+            .select_from(known)
+            .join(newer, true())
+            .order_by(message.chat_id, message.seq)
+        )
+        return list(result.scalars().all())
+
+    async def get_by_client_message_id(self, chat_id: int, sender_id: int, client_message_id: str) -> Message | None:
+        """Сообщение отправителя в чате с указанным ключом идемпотентности (по уникальному индексу)."""
+        result = await self.session.execute(
+            select(Message).where(
+                Message.chat_id == chat_id,
+                Message.sender_id == sender_id,
+                Message.client_message_id == client_message_id
+            )
+        )
+        message = result.scalar_one_or_none()
+        if message is not None:
+            self.loader.prime(message)
+        return message
+
+    async def create_once(self, data: dict[str, Any]) -> tuple[Message, bool]:
+        """
+        Создание сообщения с ключом идемпотентности client_message_id.
+
+        Вставка выполняется через INSERT ... ON CONFLICT DO NOTHING по уникальному индексу
+        (chat_id, sender_id, client_message_id), поэтому повторная отправка, в том числе
+        параллельная из другого процесса, не создает дубликат.
 
-    async def mark_as_read(self, message_id: int) -> bool:
-        """Пометка сообщения как прочитанного."""
+        Args:
+            data: Поля сообщения (включая client_message_id)
+
+        Returns:
+            tuple[Message, bool]: Сообщение и флаг, создано ли оно этим вызовом
+
+        """
         result = await self.session.execute(
-            update(Message)
-            .where(Message.id == message_id)
-            .values(is_read=True)
-            .returning(Message.id)
+            insert(Message)
+            .values(**data)
+            .on_conflict_do_nothing(
+                index_elements=[Message.chat_id, Message.sender_id, Message.client_message_id],
+                index_where=Message.client_message_id.is_not(None)
+            )
+            .returning(Message)
         )
-        await self.session.commit()
-        return result.scalar_one_or_none() is not None
+        message = result.scalar_one_or_none()
+        created = message is not None
+        if created:
+            self.loader.prime(message)
+        else:
+            message = await self.get_by_client_message_id(
+                data["chat_id"], data["sender_id"], data["client_message_id"]
+            )
+        return message, created
+
+    async def mark_as_read(self, message_id: int, chat_id: int | None = None) -> Message | None:
+        """
+        Пометка сообщения как прочитанного.
+
+        Args:
+            message_id: ID сообщения
+            chat_id: ID чата, которому должно принадлежать сообщение (если задан)
+
+        Returns:
+            Message | None: Сообщение или None, если оно не найдено (или оно из другого чата)
+
+        """
+        where = [Message.id == message_id]
+        if chat_id is not None:
+            where.append(Message.chat_id == chat_id)
+        messages = await self.update_where({"is_read": True}, *where)
+        return messages[0] if messages else None
@@ -0,0 +1,93 @@
+"""
+Репозиторий событий outbox.
+Событие записывается в транзакции изменения вместе с pg_notify: уведомление
+доставляется слушателям только при фиксации транзакции.
+"""
+
+import datetime
+
+from sqlalchemy import BigInteger, String, cast, delete, func, insert, select
+
+from app.config import settings
+from app.db.models import OutboxEvent
+from app.db.repositories.base import BaseRepository
+
+
+class OutboxRepository(BaseRepository[OutboxEvent]):
+    """Репозиторий для работы с событиями outbox."""
+
+    def __init__(self, session):
+        super().__init__(OutboxEvent, session)
+
+    async def add(
+            self,
+            chat_id: int,
+            payload: dict,
+            origin: str | None = None,
+            channel: str = settings.outbox.outbox_channel
+    ) -> int:
+        """
+        Запись события с уведомлением слушателей канала одним запросом.
+
+        Args:
+            chat_id: ID чата события
+            payload: Фрейм WebSocket для участников чата
+            origin: Устройство-источник "user_id:device_id" (ему событие не рассылается)
+            channel: Канал LISTEN/NOTIFY
+
+        Returns:
+            int: ID события
+
+        """
+        inserted = (
+            insert(OutboxEvent)
+            .values(chat_id=chat_id, payload=payload, origin=origin)
+            .returning(OutboxEvent.id)
+            .cte('inserted')
+        )
+        result = await self.session.execute(
+            select(inserted.c.id, func.pg_notify(channel, cast(inserted.c.id, String)))
+        )
+        return result.scalar_one()
+
+    async def get_after(self, after_id: int, limit: int) -> list[OutboxEvent]:
+        """События с ID больше указанного по возрастанию ID."""
+        result = await self.session.execute(
+            select(OutboxEvent).where(OutboxEvent.id > after_id).order_by(OutboxEvent.id).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def get_by_ids(self, event_ids: list[int]) -> list[OutboxEvent]:
+        """События с указанными ID по возрастанию ID (отсутствующие пропускаются)."""
+        result = await self.session.execute(
+            select(OutboxEvent).where(OutboxEvent.id.in_(event_ids)).order_by(OutboxEvent.id)
+        )
+        return list(result.scalars().all())
+
+    async def snapshot(self) -> tuple[int, int]:
+        """
+        Границы текущего снимка транзакций.
+
+        Returns:
+            tuple[int, int]: xmin (все транзакции с меньшим номером завершены)
+                и xmax (транзакции с этим и большими номерами еще не начались)
+
+        """
+        snapshot = func.pg_current_snapshot()
+        result = await self.session.execute(
+            select(
+                cast(cast(func.pg_snapshot_xmin(snapshot), String), BigInteger),
+                cast(cast(func.pg_snapshot_xmax(snapshot), String), BigInteger),
+            )
+        )
+        return tuple(result.one())
+
+    async def last_id(self) -> int:
+        """ID последнего записанного события (0, если событий нет)."""
+        result = await self.session.execute(select(func.coalesce(func.max(OutboxEvent.id), 0)))
+        return result.scalar_one()
+
+    async def delete_before(self, moment: datetime.datetime) -> int:
+        """Удаление событий, созданных раньше указанного момента (возвращает число удаленных)."""
+        result = await self.session.execute(delete(OutboxEvent).where(OutboxEvent.created_at < moment))
+        return result.rowcount
@@ -0,0 +1,90 @@
+"""
+Репозиторий удаления сообщений по сроку хранения.
+Сообщения читаются и удаляются небольшими пачками по возрастанию ключа
+(ID сообщения или seq в чате) начиная с сохраненной позиции.
+"""
+
+import datetime
+from collections.abc import Sequence
+
+from sqlalchemy import Row, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db.models import Chat, Message, RetentionCheckpoint
+from app.db.repositories.base import BaseRepository
+
+
+class RetentionRepository(BaseRepository[RetentionCheckpoint]):
+    """Репозиторий для удаления сообщений по сроку хранения."""
+
+    def __init__(self, session):
+        super().__init__(RetentionCheckpoint, session)
+
+    async def get_position(self, name: str) -> int:
+        """Сохраненная позиция прохода (0, если проход еще не выполнялся)."""
+        result = await self.session.execute(
+            select(RetentionCheckpoint.position).where(RetentionCheckpoint.name == name)
+        )
+        return result.scalar_one_or_none() or 0
+
+    async def save_position(self, name: str, position: int) -> None:
+        """Сохранение позиции прохода."""
+        stmt = insert(RetentionCheckpoint).values(name=name, position=position)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[RetentionCheckpoint.name],
+                set_={'position': stmt.excluded.position, 'updated_at': func.now()}
+            )
+        )
+
+    async def get_chat_policies(self) -> list[tuple[int, int]]:
+        """Чаты с собственным сроком хранения: [(chat_id, retention_days)]."""
+        result = await self.session.execute(
+            select(Chat.id, Chat.retention_days).where(Chat.retention_days.is_not(None)).order_by(Chat.id)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def get_messages_after(
+            self,
+            position: int,
+            limit: int,
+            chat_id: int | None = None
+    ) -> Sequence[Row[tuple[int, int, datetime.datetime]]]:
+        """
+        Очередная пачка сообщений после позиции прохода.
+
+        Без chat_id сообщения всех чатов читаются по первичному ключу (ID возрастают
+        со временем создания), с chat_id - сообщения чата по индексу (chat_id, seq).
+        Выборка ограничена limit строками независимо от того, истек ли их срок.
+
+        Args:
+            position: Ключ последнего обработанного сообщения (ID или seq)
+            limit: Размер пачки
+            chat_id: ID чата для прохода по сроку чата
+
+        Returns:
+            Sequence[Row]: Строки (position, id, created_at) по возрастанию ключа
+
+        """
+        key = Message.id if chat_id is None else Message.seq
+        query = select(key.label('position'), Message.id, Message.created_at).where(key > position)
+        if chat_id is not None:
+            query = query.where(Message.chat_id == chat_id)
+        result = await self.session.execute(query.order_by(key).limit(limit))
+        return result.all()
+
+    async def delete_messages(self, message_ids: list[int]) -> list[int]:
+        """
+        Удаление сообщений по ID (записи входящих удаляются каскадно).
+
+        Args:
+            message_ids: ID удаляемых сообщений
+
+        Returns:
+            list[int]: ID чата каждого удаленного сообщения - для увеличения версий чатов
+
+        """
+        result = await self.session.execute(
+            delete(Message).where(Message.id.in_(message_ids)).returning(Message.chat_id)
+        )
+        return list(result.scalars().all())
@@ -0,0 +1,63 @@
+"""
+Репозиторий для работы с сессиями пользователей в базе данных.
+Содержит методы для создания, ротации и отзыва refresh-токенов.
+"""
+import datetime
+
+from sqlalchemy import func
+
+from app.db.models import UserSession
+from app.db.repositories.base import BaseRepository
+
+
+class SessionRepository(BaseRepository[UserSession]):
+    """Репозиторий для работы с сессиями пользователей."""
+
+    def __init__(self, session):
+        super().__init__(UserSession, session)
+
+    async def create_session(self, user_id: int, jti: str, expires_at: datetime.datetime) -> UserSession:
+        """Создание новой сессии пользователя."""
+        return await self.create({
+            "user_id": user_id,
+            "jti": jti,
+            "expires_at": expires_at
+        })
+
+    async def consume(self, jti: str) -> int | None:
+        """
+        Атомарный отзыв действующей сессии при ротации refresh-токена.
+
+        Args:
+            jti: Идентификатор refresh-токена
+
+        Returns:
+            int | None: ID пользователя или None, если сессия не найдена, истекла или уже отозвана
+
+        """
+        sessions = await self.update_where(
+            {"revoked_at": func.now()},
+            UserSession.jti == jti,
+            UserSession.revoked_at.is_(None),
+            UserSession.expires_at > func.now()
+        )
+        return sessions[0].user_id if sessions else None
+
+    async def revoke_user_sessions(self, user_id: int) -> list[tuple[str, datetime.datetime]]:
+        """
+        Отзыв всех действующих сессий пользователя.
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            list[tuple[str, datetime]]: Пары (jti, дата истечения) отозванных сессий
+
+        """
+        sessions = await self.update_where(
+            {"revoked_at": func.now()},
+            UserSession.user_id == user_id,
+            UserSession.revoked_at.is_(None),
+            UserSession.expires_at > func.now()
+        )
+        return [(s.jti, s.expires_at) for s in sessions]
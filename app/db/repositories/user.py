@@ -1,9 +1,11 @@
 """
 Репозиторий для работы с пользователями в базе данных.
-Содержит методы для получения пользователей.
+Содержит методы для получения и поиска пользователей.
 """
 
-from sqlalchemy import select
+from collections.abc import Iterable
+
+from sqlalchemy import func, select
 
 from app.db.models import User
 from app.db.repositories.base import BaseRepository
@@ -28,3 +30,52 @@ class UserRepository(BaseRepository[User]):
             select(User).where(User.email == email)
         )
         return result.scalar_one_or_none()
+
+    async def search_by_prefix(self, prefix: str, limit: int) -> list[User]:
+        """
+        Поиск пользователей по началу username без учета регистра.
+
+        Выполняется по индексу lower(username) COLLATE "C": диапазонное чтение
+        в порядке индекса, останавливающееся на limit записях, без сортировки.
+
+        Args:
+            prefix: Начало username
+            limit: Максимум пользователей
+
+        Returns:
+            list[User]: Пользователи в порядке username (побайтово)
+
+        """
+        username = func.lower(User.username).collate('C')
+        result = await self.session.execute(
+            select(User)
+            .where(username.startswith(prefix.lower(), autoescape=True))
+            .order_by(username)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def search_similar(self, query: str, limit: int, exclude_ids: Iterable[int] = ()) -> list[User]:
+        """
+        Нечеткий поиск пользователей по username (опечатки, совпадение по подстроке).
+
+        Использует оператор сходства pg_trgm (%) по GIN-индексу триграмм;
+        результаты упорядочены по убыванию сходства.
+
+        Args:
+            query: Строка поиска (не короче трех символов, иначе триграммы не отбирают строки)
+            limit: Максимум пользователей
+            exclude_ids: ID пользователей, уже найденных по префиксу
+
+        Returns:
+            list[User]: Похожие пользователи
+
+        """
+        stmt = select(User).where(User.username.op('%')(query))
+        exclude_ids = set(exclude_ids)
+        if exclude_ids:
+            stmt = stmt.where(User.id.not_in(exclude_ids))
+        result = await self.session.execute(
+            stmt.order_by(func.similarity(User.username, query).desc(), User.username).limit(limit)
+        )
+        return list(result.scalars().all())
@@ -1,15 +1,39 @@
 """Модуль настройки подключения к БД."""
 
+import time
+
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
 from app.config import settings
+from app.core.admission import admission
+
+
+class AdmissionQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, сообщающий контролю допуска время получения соединения.
+
+    У пула нет события перед выдачей соединения (checkout срабатывает уже после),
+    поэтому замеряется сама выдача из очереди, включая ожидание и таймаут. Замер
+    приходится на первое реальное обращение сессии к БД, а не на открытие сессии.
+    """
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            admission.observe_pool_wait(time.perf_counter() - started)
+
 
 engine_settings = {
+    'poolclass': AdmissionQueuePool,
     'pool_pre_ping': True,
     'pool_size': 2,
     'max_overflow': 4,
-    'pool_timeout': 60 * 5,  # 5 минут
+    # Короткий таймаут: при исчерпании пула запрос быстро получает 503, а не висит минутами
+    'pool_timeout': settings.database.pool_timeout,
     'future': True,
 }
 
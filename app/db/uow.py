@@ -0,0 +1,51 @@
+"""
+Единица работы (Unit of Work).
+Объединяет все обращения репозиториев в рамках операции сервиса в одну транзакцию.
+Репозитории не фиксируют изменения самостоятельно: commit выполняется один раз при выходе из блока.
+"""
+
+from types import TracebackType
+from typing import Self
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class UnitOfWork:
+    """
+    Транзакция, охватывающая операцию сервиса.
+
+    Использование::
+
+        async with uow:
+            chat = await chat_repo.create(...)
+            await chat_repo.add_users_to_chat(chat.id, user_ids)
+
+    Вложенные блоки (вызов одного метода сервиса из другого) не фиксируют
+    транзакцию: commit выполняет только внешний блок. При исключении
+    транзакция откатывается целиком.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._depth = 0
+
+    async def __aenter__(self) -> Self:
+        """Вход в блок (транзакцию открывает первое обращение к сессии)."""
+        self._depth += 1
+        return self
+
+    async def __aexit__(
+            self,
+            exc_type: type[BaseException] | None,
+            exc: BaseException | None,
+            tb: TracebackType | None
+    ) -> None:
+        """Выход из блока: внешний блок фиксирует транзакцию или откатывает ее при исключении."""
+        self._depth -= 1
+        if self._depth:
+            return
+
+        if exc_type is None:
+            await self.session.commit()
+        else:
+            await self.session.rollback()
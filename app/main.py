@@ -3,18 +3,40 @@
 Инициализирует и настраивает приложение, подключает все роутеры и middleware.
 Содержит конфигурацию CORS и настройки для WebSocket соединений.
 """
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
-from app.api import auth_router, chats_router, groups_router, messages_router, websocket_router
-from app.core.dependencies import get_current_user
+from app.api import auth_router, chats_router, groups_router, messages_router, users_router, websocket_router
+from app.api.websocket import outbox_dispatcher
+from app.config import settings
+from app.core.dependencies import admission_control, track_queries
+from app.core.scheduler import IntervalSchedule, scheduler
+from app.core.worker_id import worker_ids
 from app.logger import setup_logger
+from app.services.retention import message_retention
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    """ID процесса для идентификаторов и фоновые задачи: доставка событий outbox и планировщик задач обслуживания."""
+    await worker_ids.acquire()
+    await outbox_dispatcher.start()
+    scheduler.start()
+    yield
+    await scheduler.stop()
+    await outbox_dispatcher.stop()
+    await worker_ids.release()
 
 
 def create_app() -> FastAPI:
     """Инициализация приложения."""
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
 
     # Настройка CORS
     app.add_middleware(
@@ -26,6 +48,8 @@ def create_app() -> FastAPI:
     )
 
     setup_routers(app)
+    setup_exception_handlers(app)
+    setup_jobs()
     setup_logger()
 
     return app
@@ -33,13 +57,42 @@ def create_app() -> FastAPI:
 
 def setup_routers(app: FastAPI) -> None:
     """Установка маршрутизации приложения."""
-    app.include_router(auth_router, prefix='/api/v1')
-    app.include_router(chats_router, prefix='/api/v1')
-    app.include_router(groups_router, prefix='/api/v1')
-    app.include_router(messages_router, prefix='/api/v1')
+    dependencies = [Depends(admission_control), Depends(track_queries)]
+    app.include_router(auth_router, prefix='/api/v1', dependencies=dependencies)
+    app.include_router(chats_router, prefix='/api/v1', dependencies=dependencies)
+    app.include_router(groups_router, prefix='/api/v1', dependencies=dependencies)
+    app.include_router(messages_router, prefix='/api/v1', dependencies=dependencies)
+    app.include_router(users_router, prefix='/api/v1', dependencies=dependencies)
     app.include_router(websocket_router)
 
 
+def setup_jobs() -> None:
+    """Регистрация задач обслуживания в планировщике."""
+    scheduler.add_job(
+        'outbox_cleanup',
+        outbox_dispatcher.cleanup,
+        IntervalSchedule(settings.outbox.outbox_cleanup_interval)
+    )
+    scheduler.add_job(
+        'message_retention',
+        message_retention.purge,
+        IntervalSchedule(settings.retention.retention_interval)
+    )
+
+
+def setup_exception_handlers(app: FastAPI) -> None:
+    """Установка обработчиков исключений."""
+
+    @app.exception_handler(PoolTimeoutError)
+    async def pool_timeout_handler(_request: Request, _exc: PoolTimeoutError) -> JSONResponse:
+        """Пул соединений исчерпан: запрос отклоняется вместо долгого ожидания."""
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={'detail': 'Сервис перегружен, повторите запрос позже'},
+            headers={'Retry-After': '1'}
+        )
+
+
 app = create_app()
 
 if __name__ == '__main__':
@@ -7,9 +7,9 @@
 from .base import BaseSchema, TimestampSchema
 from .chat import ChatBase, ChatCreate, ChatRead
 from .group import GroupBase, GroupCreate, GroupRead
-from .message import MessageBase, MessageCreate, MessageRead
-from .token import Token, TokenData
-from .user import UserBase, UserCreate, UserRead
+from .message import ChatSync, MessageBase, MessageCreate, MessageRead, SyncRequest, UnreadCount
+from .token import RefreshRequest, Token, TokenData
+from .user import UserBase, UserCreate, UserRead, UserSummary
 
 __all__ = [
     'BaseSchema',
@@ -24,8 +24,13 @@ __all__ = [
     'MessageBase',
     'MessageCreate',
     'MessageRead',
+    'ChatSync',
+    'SyncRequest',
+    'UnreadCount',
+    'RefreshRequest',
     'Token',
     'TokenData',
     'UserCreate',
     'UserRead',
+    'UserSummary',
 ]
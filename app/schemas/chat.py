@@ -27,3 +27,10 @@ class ChatRead(ChatBase, BaseSchema):
     """Схема для чтения данных чата."""
 
     id: int = Field(..., description="ID чата")
+    retention_days: int | None = Field(None, description="Срок хранения сообщений в днях (None - общий срок)")
+
+
+class ChatRetentionUpdate(BaseModel):
+    """Схема для изменения срока хранения сообщений чата."""
+
+    retention_days: int | None = Field(..., ge=1, description="Срок хранения сообщений в днях (None - общий срок)")
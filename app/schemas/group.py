@@ -28,6 +28,12 @@ class GroupRead(BaseSchema):
     members: list[int] = Field(..., description="Список ID участников")
 
 
+class GroupMembersAdd(BaseModel):
+    """Схема для массового добавления участников в группу."""
+
+    user_ids: list[int] = Field(..., min_length=1, max_length=1000, description="Список ID добавляемых пользователей")
+
+
 class GroupInfo(BaseSchema):
     """Схема для отображения группы."""
 
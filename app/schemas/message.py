@@ -8,6 +8,7 @@ from datetime import datetime
 from pydantic import BaseModel, Field
 
 from .base import BaseSchema
+from .user import UserSummary
 
 
 class MessageBase(BaseModel):
@@ -19,12 +20,49 @@ class MessageBase(BaseModel):
 class MessageCreate(MessageBase):
     """Схема для создания сообщения."""
 
+    client_message_id: str | None = Field(
+        None,
+        min_length=1,
+        max_length=64,
+        description="Ключ идемпотентности: повторная отправка с тем же ключом не создает дубликат"
+    )
+
 
 class MessageRead(MessageBase, BaseSchema):
     """Схема для чтения данных сообщения."""
 
     id: int = Field(..., description="ID сообщения")
     chat_id: int = Field(..., description="ID чата")
+    seq: int = Field(..., description="Порядковый номер сообщения в чате")
     sender_id: int = Field(..., description="ID отправителя")
+    client_message_id: str | None = Field(None, description="Ключ идемпотентности, переданный клиентом")
     is_read: bool = Field(False, description="Флаг прочитанного сообщения")
     created_at: datetime = Field(..., description="Дата и время отправки")
+    sender: UserSummary | None = Field(None, description="Профиль отправителя (если запрошен)")
+
+
+class SyncRequest(BaseModel):
+    """Запрос синхронизации: последние известные клиенту номера сообщений по чатам."""
+
+    chats: dict[int, int] = Field(
+        ...,
+        max_length=1000,
+        description="Последний известный seq по чатам {chat_id: last_seq} (0 - чат еще не загружался)"
+    )
+    limit: int = Field(100, ge=1, le=500, description="Максимум сообщений на чат")
+
+
+class ChatSync(BaseModel):
+    """Новые сообщения одного чата."""
+
+    chat_id: int = Field(..., description="ID чата")
+    last_seq: int = Field(..., description="Номер последнего сообщения чата на сервере")
+    messages: list[MessageRead] = Field(..., description="Сообщения новее известного клиенту, по возрастанию seq")
+    has_more: bool = Field(..., description="Есть ли еще новые сообщения (повторить с seq последнего полученного)")
+
+
+class UnreadCount(BaseModel):
+    """Количество непрочитанных сообщений чата."""
+
+    chat_id: int = Field(..., description="ID чата")
+    unread: int = Field(..., description="Количество непрочитанных сообщений")
@@ -3,16 +3,23 @@
 Содержит модели для создания и валидации токенов доступа.
 Определяет структуру данных для JWT токенов.
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class Token(BaseModel):
     """Схема для JWT токена."""
 
     access_token: str
+    refresh_token: str | None = Field(None, description="Refresh-токен для получения новой пары токенов")
 
 
 class TokenData(BaseModel):
     """Схема с данными в токене."""
 
     user_id: str
+
+
+class RefreshRequest(BaseModel):
+    """Схема запроса на обновление или отзыв refresh-токена."""
+
+    refresh_token: str = Field(..., description="Refresh-токен")
@@ -21,6 +21,13 @@ class UserCreate(UserBase):
     password: str = Field(..., min_length=6, example="strongpassword")
 
 
+class UserSummary(BaseSchema):
+    """Краткий профиль пользователя для встраивания в сообщения."""
+
+    id: int = Field(..., description="ID пользователя")
+    username: str = Field(..., description="Username пользователя")
+
+
 class UserRead(UserBase, BaseSchema):
     """Схема для чтения данных пользователя."""
 
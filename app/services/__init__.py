@@ -2,5 +2,7 @@ from .auth import UserService
 from .chat import ChatService
 from .group import GroupService
 from .message import MessageService
+from .profile import ProfileService
+from .session import SessionService
 
-__all__ = ['UserService', 'ChatService', 'GroupService', 'MessageService']
+__all__ = ['UserService', 'ChatService', 'GroupService', 'MessageService', 'ProfileService', 'SessionService']
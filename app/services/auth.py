@@ -6,6 +6,7 @@
 from passlib.context import CryptContext
 
 from app.db.repositories.user import UserRepository
+from app.db.uow import UnitOfWork
 from app.schemas.user import UserCreate
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -24,8 +25,9 @@ def get_password_hash(password: str) -> str:
 class UserService:
     """Сервис для работы с аутентификацией и пользователями."""
 
-    def __init__(self, user_repo: UserRepository):
+    def __init__(self, user_repo: UserRepository, uow: UnitOfWork):
         self.user_repo = user_repo
+        self.uow = uow
 
     async def create_user(self, user_data: UserCreate):
         """
@@ -48,7 +50,8 @@ class UserService:
 
         user_dict = user_data.model_dump()
         user_dict["hashed_password"] = get_password_hash(user_dict.pop("password"))
-        return await self.user_repo.create(user_dict)
+        async with self.uow:
+            return await self.user_repo.create(user_dict)
 
     async def authenticate_user(self, username: str, password: str):
         """
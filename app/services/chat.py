@@ -3,15 +3,18 @@
 Содержит бизнес-логику для создания и управления чатами.
 Реализует проверку прав доступа и управление участниками чатов.
 """
+from app.config import settings
 from app.db.repositories.chat import ChatRepository
+from app.db.uow import UnitOfWork
 from app.schemas.chat import ChatCreate, ChatRead
 
 
 class ChatService:
     """Сервис для работы с чатами."""
 
-    def __init__(self, chat_repo: ChatRepository):
+    def __init__(self, chat_repo: ChatRepository, uow: UnitOfWork):
         self.chat_repo = chat_repo
+        self.uow = uow
 
     async def create_chat(self, chat_data: ChatCreate) -> ChatRead:
         """
@@ -23,23 +26,64 @@ class ChatService:
         Returns:
             ChatRead: Созданный чат
 
+        Raises:
+            ValueError: Если личный чат между пользователями уже существует
+
         """
-        # Проверка существования личного чата между пользователями
-        if await self.chat_repo.check_chat_exists(chat_data.current_user_id, chat_data.user_id):
-            msg = 'Личный чат между этими пользователями уже существует'
-            raise ValueError(msg)
+        async with self.uow:
+            if chat_data.is_group:
+                chat = await self.chat_repo.create({
+                    "name": chat_data.name,
+                    "is_group": chat_data.is_group
+                })
+            else:
+                # Для личного чата генерируем имя на основе ID пользователей
+                chat_data.name = f"Personal Chat {chat_data.user_id}"
+
+                # Чат ищется и создается одним запросом по уникальной паре участников
+                chat, created = await self.chat_repo.get_or_create_personal_chat(
+                    chat_data.current_user_id,
+                    chat_data.user_id,
+                    chat_data.name
+                )
+                if not created:
+                    msg = 'Личный чат между этими пользователями уже существует'
+                    raise ValueError(msg)
+
+            # Добавляем обоих пользователей в чат одним запросом
+            await self.chat_repo.add_users_to_chat(chat.id, [chat_data.current_user_id, chat_data.user_id])
+
+        return ChatRead.from_orm(chat)
+
+    async def set_retention(self, chat_id: int, user_id: int, retention_days: int | None) -> ChatRead | None:
+        """
+        Изменение срока хранения сообщений чата.
 
-        # Для личного чата генерируем имя на основе ID пользователей
-        if not chat_data.is_group:
-            chat_data.name = f"Personal Chat {chat_data.user_id}"
+        Срок чата может быть только короче общего срока MESSAGE_RETENTION_DAYS:
+        сообщения старше общего срока удаляются во всех чатах. Срок меняет только
+        создатель группы (для личного чата - любой из двух участников): срок удаляет
+        сообщения всех участников.
 
-        chat = await self.chat_repo.create({
-            "name": chat_data.name,
-            "is_group": chat_data.is_group
-        })
+        Args:
+            chat_id: ID чата
+            user_id: ID пользователя, меняющего срок
+            retention_days: Срок хранения в днях (None - общий срок)
+
+        Returns:
+            ChatRead | None: Обновленный чат или None, если пользователь не управляет чатом
+
+        Raises:
+            ValueError: Если срок длиннее общего
+
+        """
+        limit = settings.retention.message_retention_days
+        if retention_days is not None and limit is not None and retention_days > limit:
+            msg = f"Срок хранения чата не может превышать общий срок ({limit} дн.)"
+            raise ValueError(msg)
 
-        # Добавляем обоих пользователей в чат
-        await self.chat_repo.add_user_to_chat(chat.id, chat_data.current_user_id)
-        await self.chat_repo.add_user_to_chat(chat.id, chat_data.user_id)
+        async with self.uow:
+            if not await self.chat_repo.is_owner(user_id, chat_id):
+                return None
+            chat = await self.chat_repo.update(chat_id, {"retention_days": retention_days})
 
         return ChatRead.from_orm(chat)
@@ -5,15 +5,17 @@
 """
 from app.db.repositories.chat import ChatRepository
 from app.db.repositories.group import GroupRepository
+from app.db.uow import UnitOfWork
 from app.schemas.group import GroupCreate, GroupInfo, GroupList, GroupRead
 
 
 class GroupService:
     """Сервис для работы с групповыми чатами."""
 
-    def __init__(self, group_repo: GroupRepository, chat_repo: ChatRepository):
+    def __init__(self, group_repo: GroupRepository, chat_repo: ChatRepository, uow: UnitOfWork):
         self.group_repo = group_repo
         self.chat_repo = chat_repo
+        self.uow = uow
 
     async def create_group(self, group_data: GroupCreate) -> GroupRead:
         """
@@ -26,19 +28,20 @@ class GroupService:
             GroupRead: Созданная группа
 
         """
-        # Сначала создаётся чат
-        chat = await self.chat_repo.create({
-            "name": group_data.name,
-            "is_group": True
-        })
-
-        # Затем создаётся группа с привязкой к чату
-        group = await self.group_repo.create({
-            "name": group_data.name,
-            "creator_id": group_data.creator_id,
-            "members": [group_data.creator_id],  # Создатель автоматически добавляется
-            "chat_id": chat.id
-        })
+        async with self.uow:
+            # Сначала создаётся чат
+            chat = await self.chat_repo.create({
+                "name": group_data.name,
+                "is_group": True
+            })
+
+            # Затем создаётся группа с привязкой к чату
+            group = await self.group_repo.create({
+                "name": group_data.name,
+                "creator_id": group_data.creator_id,
+                "members": [group_data.creator_id],  # Создатель автоматически добавляется
+                "chat_id": chat.id
+            })
 
         # Добавляем связь с чатом
         group.chat = chat
@@ -55,7 +58,7 @@ class GroupService:
             GroupRead | None: Информация о группе или None, если группа не найдена
 
         """
-        group = await self.group_repo.get(group_id)
+        group = await self.group_repo.load(group_id)
         if not group:
             return None
 
@@ -65,6 +68,33 @@ class GroupService:
             members=group.members
         )
 
+    async def get_group_version(self, group_id: int) -> int | None:
+        """
+        Получение версии группы для условных запросов.
+
+        Args:
+            group_id: ID группы
+
+        Returns:
+            int | None: Версия группы или None, если группа не найдена
+
+        """
+        group = await self.group_repo.load(group_id)
+        return group.version if group else None
+
+    async def get_user_group_versions(self, user_id: int) -> list[tuple[int, int]]:
+        """
+        Получение версий групп пользователя для условных запросов.
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            list[tuple[int, int]]: Пары (ID группы, версия)
+
+        """
+        return await self.group_repo.get_user_group_versions(user_id)
+
     async def get_user_groups(self, user_id: int) -> GroupList:
         """
         Получение списка групп пользователя.
@@ -91,14 +121,27 @@ class GroupService:
             bool: True если успешно, False если пользователь уже в группе
 
         """
-        group = await self.group_repo.get(group_id)
-        if not group or user_id in group.members:
-            return False
+        async with self.uow:
+            return await self.group_repo.add_members(group_id, [user_id]) is not None
+
+    async def add_members(self, group_id: int, user_ids: list[int]) -> list[int] | None:
+        """
+        Массовое добавление участников в группу одним запросом.
 
-        await self.group_repo.update(group_id, {
-            "members": [*group.members, user_id]
-        })
-        return True
+        Args:
+            group_id: ID группы
+            user_ids: ID добавляемых пользователей
+
+        Returns:
+            list[int] | None: Актуальный список участников или None, если группа не найдена
+
+        """
+        async with self.uow:
+            members = await self.group_repo.add_members(group_id, user_ids)
+            if members is None:
+                # Все пользователи уже в группе, либо группы нет
+                return await self.get_group_members(group_id) or None
+            return members
 
     async def remove_member(self, group_id: int, user_id: int) -> bool:
         """
@@ -112,14 +155,8 @@ class GroupService:
             bool: True если успешно, False если пользователя не было в группе
 
         """
-        group = await self.group_repo.get(group_id)
-        if not group or user_id not in group.members:
-            return False
-
-        await self.group_repo.update(group_id, {
-            "members": [m for m in group.members if m != user_id]
-        })
-        return True
+        async with self.uow:
+            return await self.group_repo.remove_member(group_id, user_id) is not None
 
     async def get_group_members(self, group_id: int) -> list[int]:
         """
@@ -132,5 +169,5 @@ class GroupService:
             list[int]: Список ID участников
 
         """
-        group = await self.group_repo.get(group_id)
+        group = await self.group_repo.load(group_id)
         return group.members if group else []
@@ -4,22 +4,51 @@
 Реализует проверку прав доступа и управление статусом сообщений.
 """
 
-import asyncio
-
+from app.config import settings
+from app.core.cache import LRUCache
+from app.core.locks import chat_locks
+from app.core.snowflake import message_ids
 from app.db.repositories.chat import ChatRepository
+from app.db.repositories.inbox import InboxRepository
 from app.db.repositories.message import MessageRepository
-from app.schemas.message import MessageRead
+from app.db.repositories.outbox import OutboxRepository
+from app.db.uow import UnitOfWork
+from app.schemas.message import ChatSync, MessageRead, UnreadCount
+from app.services.profile import ProfileService
+
+# Окно недавних отправок с ключом идемпотентности: (chat_id, sender_id, client_message_id) -> сообщение
+recent_sends: LRUCache[tuple[int, int, str], MessageRead] = LRUCache(
+    settings.cache.send_dedupe_size,
+    settings.cache.send_dedupe_ttl
+)
 
 
 class MessageService:
     """Сервис для работы с сообщениями."""
 
-    def __init__(self, message_repo: MessageRepository, chat_repo: ChatRepository):
+    def __init__(
+            self,
+            message_repo: MessageRepository,
+            chat_repo: ChatRepository,
+            uow: UnitOfWork,
+            profile_service: ProfileService,
+            inbox_repo: InboxRepository,
+            outbox_repo: OutboxRepository
+    ):
         self.message_repo = message_repo
         self.chat_repo = chat_repo
-        self.lock = asyncio.Lock()  # Для предотвращения дублирования сообщений
+        self.uow = uow
+        self.profile_service = profile_service
+        self.inbox_repo = inbox_repo
+        self.outbox_repo = outbox_repo
 
-    async def send_message(self, chat_id: int, sender_id: int, text: str) -> MessageRead:
+    async def send_message(
+            self,
+            chat_id: int,
+            sender_id: int,
+            text: str,
+            client_message_id: str | None = None
+    ) -> MessageRead:
         """
         Отправка сообщения в чат.
 
@@ -27,25 +56,122 @@ class MessageService:
             chat_id: ID чата
             sender_id: ID отправителя
             text: Текст сообщения
+            client_message_id: Ключ идемпотентности, переданный клиентом
+
+        Returns:
+            MessageRead: Отправленное сообщение (с профилем отправителя)
+
+        """
+        message, _ = await self.send_message_once(chat_id, sender_id, text, client_message_id)
+        return message
+
+    async def send_message_once(
+            self,
+            chat_id: int,
+            sender_id: int,
+            text: str,
+            client_message_id: str | None = None,
+            origin: str | None = None
+    ) -> tuple[MessageRead, bool]:
+        """
+        Отправка сообщения в чат без дубликатов при повторах.
+
+        Отправки в один чат выполняются по очереди (общая для процесса блокировка чата),
+        отправки в разные чаты - параллельно. Сообщение получает следующий порядковый
+        номер чата (seq), раскладывается по входящим получателей и записывается
+        в outbox для рассылки по WebSocket в той же транзакции. Повтор с тем же client_message_id
+        возвращает ранее созданное сообщение: в пределах окна recent_sends - без
+        обращения к БД, позже - поиском по уникальному индексу под блокировкой чата
+        до выдачи номера (ON CONFLICT страхует от параллельной отправки из другого процесса).
+
+        Args:
+            chat_id: ID чата
+            sender_id: ID отправителя
+            text: Текст сообщения
+            client_message_id: Ключ идемпотентности, переданный клиентом
+            origin: ID устройства отправителя, которому сообщение не рассылается
 
         Returns:
-            MessageRead: Отправленное сообщение
+            tuple[MessageRead, bool]: Сообщение и флаг, создано ли оно этим вызовом (False для повтора)
+
+        Raises:
+            ValueError: Если у пользователя нет доступа к чату
 
         """
-        async with self.lock:
-            if not await self._user_has_access(sender_id, chat_id):
+        key = (chat_id, sender_id, client_message_id)
+        if client_message_id is not None:
+            cached = recent_sends.get(key)
+            if cached is not None:
+                return cached, False
+
+        async with chat_locks.hold(chat_id), self.uow:
+            if not await self.user_has_access(sender_id, chat_id):
                 msg = "Пользователь не имеет доступа к этому чату"
                 raise ValueError(msg)
 
-            message = await self.message_repo.create({
-                "chat_id": chat_id,
-                "sender_id": sender_id,
-                "text": text
-            })
-            return MessageRead.from_orm(message)
+            existing = None
+            if client_message_id is not None:
+                # Повтор находится до выдачи номера: номер и версия чата не расходуются
+                existing = await self.message_repo.get_by_client_message_id(chat_id, sender_id, client_message_id)
+            if existing is not None:
+                message, created = existing, False
+            else:
+                data = {
+                    "id": message_ids.next_id(),
+                    "chat_id": chat_id,
+                    "sender_id": sender_id,
+                    "seq": await self.chat_repo.next_seq(chat_id),
+                    "text": text
+                }
+                if client_message_id is None:
+                    message, created = await self.message_repo.create(data), True
+                else:
+                    # Параллельный повтор из другого процесса, найденный по индексу, пропускает выданный номер
+                    message, created = await self.message_repo.create_once(
+                        {**data, "client_message_id": client_message_id}
+                    )
+            if created:
+                await self.inbox_repo.fan_out(message, settings.inbox.inbox_fanout_max_members)
+            result = MessageRead.from_orm(message)
+            await self.profile_service.attach_senders([result])
+            if created:
+                await self.outbox_repo.add(chat_id, self._message_event(result), origin)
+        if client_message_id is not None:
+            recent_sends.set(key, result)
+        return result, created
+
+    async def get_chat_version(self, chat_id: int, user_id: int) -> int:
+        """
+        Получение версии чата для условных запросов истории.
+
+        Args:
+            chat_id: ID чата
+            user_id: ID пользователя (для проверки доступа)
+
+        Returns:
+            int: Текущая версия чата
+
+        Raises:
+            ValueError: Если у пользователя нет доступа к чату
+
+        """
+        if not await self.user_has_access(user_id, chat_id):
+            msg = "Пользователь не имеет доступа к этому чату"
+            raise ValueError(msg)
+
+        chat = await self.chat_repo.load(chat_id)
+        return chat.version
 
     async def get_chat_history(
-            self, chat_id: int, user_id: int, limit: int = 100, offset: int = 0
+            self,
+            chat_id: int,
+            user_id: int,
+            limit: int = 100,
+            offset: int = 0,
+            *,
+            before_seq: int | None = None,
+            include_sender: bool = False,
+            check_access: bool = True
     ) -> list[MessageRead]:
         """
         Получение истории сообщений чата.
@@ -55,31 +181,178 @@ class MessageService:
             user_id: ID пользователя (для проверки доступа)
             limit: Количество сообщений
             offset: Смещение
+            before_seq: Курсор страницы: только сообщения с seq меньше указанного
+            include_sender: Встроить профили отправителей
+            check_access: Проверять доступ (False, если он уже проверен в get_chat_version)
 
         Returns:
             list[MessageRead]: Список сообщений
 
         """
-        if not await self._user_has_access(user_id, chat_id):
+        if check_access and not await self.user_has_access(user_id, chat_id):
             msg = "Пользователь не имеет доступа к этому чату"
             raise ValueError(msg)
 
-        messages = await self.message_repo.get_chat_messages(chat_id, limit, offset)
-        return [MessageRead.from_orm(msg) for msg in messages]
+        messages = await self.message_repo.get_chat_messages(chat_id, limit, offset, before_seq=before_seq)
+        result = [MessageRead.from_orm(msg) for msg in messages]
+        if include_sender:
+            await self.profile_service.attach_senders(result)
+        return result
+
+    async def sync(self, user_id: int, cursors: dict[int, int], limit: int = 100) -> list[ChatSync]:
+        """
+        Получение сообщений, пропущенных клиентом, по всем переданным чатам.
+
+        Недоступные пользователю чаты и чаты без новых сообщений в ответ не попадают.
+        Выполняется тремя запросами независимо от числа чатов: доступ и номера
+        последних сообщений, новые сообщения, профили отправителей.
+
+        Args:
+            user_id: ID пользователя
+            cursors: Последний известный клиенту seq по чатам {chat_id: last_seq}
+            limit: Максимум сообщений на чат
+
+        Returns:
+            list[ChatSync]: Новые сообщения по чатам
+
+        """
+        chats = await self.chat_repo.get_accessible_chats(user_id, cursors)
+        stale = {chat.id: chat.last_seq for chat in chats if chat.last_seq > cursors[chat.id]}
+        messages = await self.message_repo.get_messages_after(
+            {chat_id: cursors[chat_id] for chat_id in stale},
+            limit + 1
+        )
 
-    async def mark_as_read(self, message_id: int) -> bool:
+        by_chat: dict[int, list[MessageRead]] = {chat_id: [] for chat_id in sorted(stale)}
+        for message in messages:
+            by_chat[message.chat_id].append(MessageRead.from_orm(message))
+        result = [
+            ChatSync(
+                chat_id=chat_id,
+                # Сообщения могли быть зафиксированы после чтения чата
+                last_seq=max(stale[chat_id], items[-1].seq) if items else stale[chat_id],
+                messages=items[:limit],
+                has_more=len(items) > limit
+            )
+            for chat_id, items in by_chat.items()
+        ]
+        await self.profile_service.attach_senders([message for chat in result for message in chat.messages])
+        return result
+
+    async def get_inbox(
+            self,
+            user_id: int,
+            limit: int = 50,
+            before_id: int | None = None,
+            *,
+            include_sender: bool = False
+    ) -> list[MessageRead]:
+        """
+        Получение входящих сообщений пользователя по всем чатам, от новых к старым.
+
+        Сообщения личных чатов и небольших групп читаются из проекции входящих,
+        сообщения больших групп (больше INBOX_FANOUT_MAX_MEMBERS участников) -
+        из messages, после чего обе выборки объединяются по ID.
+
+        Args:
+            user_id: ID пользователя
+            limit: Количество сообщений
+            before_id: Курсор страницы: ID последнего полученного сообщения
+            include_sender: Встроить профили отправителей
+
+        Returns:
+            list[MessageRead]: Сообщения
+
+        """
+        messages = await self.inbox_repo.get_messages(user_id, limit, before_id)
+        large_chats = await self.inbox_repo.get_large_group_chat_ids(user_id, settings.inbox.inbox_fanout_max_members)
+        if large_chats:
+            # Сообщения, разложенные по входящим, пока группа была небольшой, встречаются в обеих выборках
+            merged = {message.id: message for message in messages}
+            for message in await self.inbox_repo.get_chat_messages(large_chats, user_id, limit, before_id):
+                merged.setdefault(message.id, message)
+            messages = sorted(merged.values(), key=lambda message: message.id, reverse=True)[:limit]
+
+        result = [MessageRead.from_orm(message) for message in messages]
+        if include_sender:
+            await self.profile_service.attach_senders(result)
+        return result
+
+    async def get_unread_counts(self, user_id: int) -> list[UnreadCount]:
+        """
+        Получение количества непрочитанных сообщений по чатам пользователя.
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            list[UnreadCount]: Чаты с непрочитанными сообщениями
+
+        """
+        counts = dict(await self.inbox_repo.unread_counts(user_id))
+        large_chats = await self.inbox_repo.get_large_group_chat_ids(user_id, settings.inbox.inbox_fanout_max_members)
+        counts.update(
+            await self.inbox_repo.unread_chat_counts(large_chats, user_id, settings.inbox.unread_count_limit)
+        )
+        return [UnreadCount(chat_id=chat_id, unread=count) for chat_id, count in sorted(counts.items())]
+
+    async def mark_as_read(
+            self,
+            message_id: int,
+            reader_id: int | None = None,
+            origin: str | None = None,
+            chat_id: int | None = None
+    ) -> bool:
         """
         Пометка сообщения как прочитанного.
 
         Args:
             message_id: ID сообщения
+            reader_id: ID прочитавшего пользователя: его входящие в чате помечаются
+                прочитанными до этого сообщения включительно, участники чата
+                получают уведомление о прочтении
+            origin: ID устройства прочитавшего, которому уведомление не рассылается
+            chat_id: ID чата, в котором читает пользователь: сообщение другого чата
+                не помечается (ни версия чужого чата, ни уведомление не меняются)
 
         Returns:
-            bool: True если успешно, False если сообщение не найдено
+            bool: True если успешно, False если сообщение не найдено или оно из другого чата
 
         """
-        return await self.message_repo.mark_as_read(message_id)
+        async with self.uow:
+            message = await self.message_repo.mark_as_read(message_id, chat_id)
+            if message is None:
+                return False
+            chat_id = message.chat_id
+            await self.chat_repo.bump_version(chat_id)
+            if reader_id is not None:
+                await self.inbox_repo.mark_read(reader_id, chat_id, message_id, message.seq)
+                await self.outbox_repo.add(
+                    chat_id,
+                    {"type": "read", "message_id": message_id, "chat_id": chat_id, "reader_id": reader_id},
+                    origin
+                )
+        return True
 
-    async def _user_has_access(self, user_id: int, chat_id: int) -> bool:
+    async def user_has_access(self, user_id: int, chat_id: int) -> bool:
         """Проверка доступа пользователя к чату."""
         return await self.chat_repo.user_has_access(user_id, chat_id)
+
+    async def get_member_count(self, user_id: int, chat_id: int) -> int | None:
+        """Число участников чата, если у пользователя есть к нему доступ (иначе None)."""
+        return await self.chat_repo.get_member_count(user_id, chat_id)
+
+    @staticmethod
+    def _message_event(message: MessageRead) -> dict:
+        """Фрейм нового сообщения для участников чата."""
+        return {
+            "type": "message",
+            "id": message.id,
+            "seq": message.seq,
+            "chat_id": message.chat_id,
+            "text": message.text,
+            "sender_id": message.sender_id,
+            "sender": message.sender.model_dump(mode="json") if message.sender else None,
+            "client_message_id": message.client_message_id,
+            "timestamp": message.created_at.isoformat()
+        }
@@ -0,0 +1,112 @@
+"""
+Сервис профилей пользователей.
+Предоставляет краткие профили (id, username) для встраивания в сообщения и поиск пользователей.
+Профили кэшируются в LRU процесса, промахи догружаются одним запросом через загрузчик запроса.
+"""
+from collections.abc import Iterable
+
+from app.config import settings
+from app.core.cache import LRUCache
+from app.db.repositories.user import UserRepository
+from app.schemas.message import MessageRead
+from app.schemas.user import UserSummary
+
+# Минимальная длина запроса для нечеткого поиска: у более коротких строк нет триграмм для индекса
+MIN_SIMILAR_QUERY_LENGTH = 3
+
+user_summaries: LRUCache[int, UserSummary] = LRUCache(settings.cache.user_summary_cache_size)
+
+# Результаты поиска по коротким префиксам: (префикс в нижнем регистре, limit) -> профили
+user_search_results: LRUCache[tuple[str, int], list[UserSummary]] = LRUCache(
+    settings.cache.user_search_cache_size,
+    settings.cache.user_search_cache_ttl
+)
+
+
+class ProfileService:
+    """Сервис для получения кратких профилей пользователей."""
+
+    def __init__(self, user_repo: UserRepository):
+        self.user_repo = user_repo
+
+    async def get_summaries(self, user_ids: Iterable[int]) -> dict[int, UserSummary]:
+        """
+        Получение кратких профилей пользователей.
+
+        Args:
+            user_ids: ID пользователей
+
+        Returns:
+            dict[int, UserSummary]: Профили по ID (несуществующие пользователи пропускаются)
+
+        """
+        summaries: dict[int, UserSummary] = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            summary = user_summaries.get(user_id)
+            if summary is None:
+                missing.append(user_id)
+            else:
+                summaries[user_id] = summary
+
+        if missing:
+            for user in await self.user_repo.load_many(missing):
+                if user is not None:
+                    summary = UserSummary.from_orm(user)
+                    user_summaries.set(user.id, summary)
+                    summaries[user.id] = summary
+        return summaries
+
+    async def attach_senders(self, messages: list[MessageRead]) -> list[MessageRead]:
+        """
+        Встраивание профилей отправителей в сообщения.
+
+        Для страницы любого размера требуется не более одного запроса к БД.
+
+        Args:
+            messages: Сообщения
+
+        Returns:
+            list[MessageRead]: Те же сообщения с заполненным полем sender
+
+        """
+        summaries = await self.get_summaries(message.sender_id for message in messages)
+        for message in messages:
+            message.sender = summaries.get(message.sender_id)
+        return messages
+
+    async def search(self, query: str, limit: int = 20) -> list[UserSummary]:
+        """
+        Поиск пользователей для автодополнения.
+
+        Сначала выбираются пользователи, чей username начинается с query;
+        если их меньше limit, список дополняется похожими (нечеткий поиск),
+        для query не короче трех символов. Результаты для коротких запросов
+        (самых частых при вводе по символу) кэшируются на время user_search_cache_ttl.
+
+        Args:
+            query: Строка поиска
+            limit: Максимум пользователей
+
+        Returns:
+            list[UserSummary]: Найденные пользователи (пустой список для пустого после обрезки пробелов query)
+
+        """
+        query = query.strip().lower()
+        if not query:
+            # Пустой префикс совпал бы со всеми пользователями
+            return []
+        cacheable = len(query) <= settings.cache.user_search_cached_prefix
+        if cacheable:
+            cached = user_search_results.get((query, limit))
+            if cached is not None:
+                return cached
+
+        users = await self.user_repo.search_by_prefix(query, limit)
+        if len(users) < limit and len(query) >= MIN_SIMILAR_QUERY_LENGTH:
+            users += await self.user_repo.search_similar(query, limit - len(users), [user.id for user in users])
+        result = [UserSummary.from_orm(user) for user in users]
+
+        if cacheable:
+            user_search_results.set((query, limit), result)
+        return result
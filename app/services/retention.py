@@ -0,0 +1,127 @@
+"""
+Удаление сообщений старше срока хранения.
+Задача планировщика удаляет сообщения небольшими пачками в коротких транзакциях
+по возрастанию ключа, сохраняя позицию после каждой пачки: блокировки держатся
+только на время удаления пачки, а прерванный проход продолжается с того же места.
+Освобождение места остается обычному autovacuum.
+"""
+
+import asyncio
+import datetime
+import logging
+from itertools import takewhile
+
+from app.config import settings
+from app.db.repositories.chat import ChatRepository
+from app.db.repositories.retention import RetentionRepository
+from app.db.session import write_session
+
+logger = logging.getLogger(__name__)
+
+# Позиция общего прохода; проходы чатов называются "chat:<id>"
+GLOBAL_CHECKPOINT = 'messages'
+
+
+class MessageRetention:
+    """
+    Задача удаления сообщений по сроку хранения.
+
+    Общий срок действует для всех чатов и проходится по ID сообщений (ID возрастают
+    со временем отправки). Срок чата может быть только короче общего и проходится
+    по индексу (chat_id, seq). Пачка читается с сохраненной позиции и удаляется
+    до первого сообщения, срок которого еще не истек: позиция никогда не обгоняет
+    неудаленные сообщения.
+    """
+
+    def __init__(
+            self,
+            retention_days: int | None = settings.retention.message_retention_days,
+            batch_size: int = settings.retention.retention_batch_size,
+            batch_pause: float = settings.retention.retention_batch_pause
+    ):
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.deleted = 0
+        self.batches = 0
+
+    async def purge(self, now: datetime.datetime | None = None) -> int:
+        """
+        Удаление сообщений с истекшим сроком хранения по всем политикам.
+
+        Args:
+            now: Текущее время - для тестов
+
+        Returns:
+            int: Количество удаленных сообщений
+
+        """
+        now = now or datetime.datetime.now(datetime.UTC)
+        deleted = 0
+        if self.retention_days is not None:
+            deleted += await self.purge_pass(GLOBAL_CHECKPOINT, now - datetime.timedelta(days=self.retention_days))
+
+        async with write_session() as db:
+            policies = await RetentionRepository(db).get_chat_policies()
+        for chat_id, days in policies:
+            if self.retention_days is not None and days >= self.retention_days:
+                # Такие сообщения удаляет общий проход
+                continue
+            deleted += await self.purge_pass(f'chat:{chat_id}', now - datetime.timedelta(days=days), chat_id)
+        return deleted
+
+    async def purge_pass(self, name: str, cutoff: datetime.datetime, chat_id: int | None = None) -> int:
+        """
+        Один проход: удаление пачками сообщений, отправленных раньше cutoff.
+
+        Каждая пачка удаляется в отдельной транзакции вместе с сохранением позиции
+        и увеличением версий затронутых чатов.
+        Между пачками выдерживается пауза batch_pause, чтобы не занимать БД целиком.
+
+        Args:
+            name: Имя прохода (ключ позиции)
+            cutoff: Граница срока хранения
+            chat_id: ID чата для прохода по сроку чата (None - все чаты)
+
+        Returns:
+            int: Количество удаленных сообщений
+
+        """
+        deleted = 0
+        position: int | None = None
+        while True:
+            async with write_session() as db:
+                repo = RetentionRepository(db)
+                if position is None:
+                    position = await repo.get_position(name)
+                rows = await repo.get_messages_after(position, self.batch_size, chat_id)
+                expired = list(takewhile(lambda row: row.created_at < cutoff, rows))
+                count = 0
+                if expired:
+                    chat_ids = await repo.delete_messages([row.id for row in expired])
+                    # Версии чатов участвуют в ETag истории: закэшированные ответы устаревают
+                    await ChatRepository(db).bump_versions(chat_ids)
+                    count = len(chat_ids)
+                    position = expired[-1].position
+                    await repo.save_position(name, position)
+                    await db.commit()
+            deleted += count
+            self.deleted += count
+            self.batches += 1
+            if len(expired) < self.batch_size:
+                # Дошли до сообщений, срок которых еще не истек
+                break
+            await asyncio.sleep(self.batch_pause)
+        if deleted:
+            logger.info('Retention pass %s deleted %s messages (position %s)', name, deleted, position)
+        return deleted
+
+    def stats(self) -> dict:
+        """Число удаленных сообщений и прочитанных пачек."""
+        return {
+            'deleted': self.deleted,
+            'batches': self.batches,
+        }
+
+
+message_retention = MessageRetention()
@@ -0,0 +1,122 @@
+"""
+Сервис сессий пользователей.
+Выдает пары access/refresh токенов, выполняет ротацию и отзыв refresh-токенов.
+Отозванные токены отклоняются по кэшу без обращения к БД и без проверки пароля.
+"""
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from app.config import settings
+from app.core.revocation import revocation_cache
+from app.core.security import create_access_token, create_refresh_token, decode_refresh_token
+from app.db.repositories.session import SessionRepository
+from app.db.uow import UnitOfWork
+from app.schemas.token import Token, TokenData
+
+
+class SessionService:
+    """Сервис для работы с сессиями и refresh-токенами."""
+
+    def __init__(self, session_repo: SessionRepository, uow: UnitOfWork):
+        self.session_repo = session_repo
+        self.uow = uow
+
+    async def issue_tokens(self, user_id: int) -> Token:
+        """
+        Создание новой сессии и выдача пары токенов.
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Token: Access и refresh токены
+
+        """
+        jti = str(uuid.uuid4())
+        expires_at = datetime.now(UTC) + timedelta(days=settings.auth.refresh_token_expire_days)
+        async with self.uow:
+            await self.session_repo.create_session(user_id, jti, expires_at)
+
+        token_data = TokenData(user_id=str(user_id))
+        return Token(
+            access_token=create_access_token(token_data),
+            refresh_token=create_refresh_token(token_data, jti, expires_at)
+        )
+
+    async def refresh(self, refresh_token: str) -> Token:
+        """
+        Ротация refresh-токена: текущая сессия отзывается, выдается новая пара токенов.
+
+        Повторное предъявление уже использованного токена считается компрометацией:
+        в этом случае отзываются все сессии пользователя.
+
+        Args:
+            refresh_token: Refresh-токен
+
+        Returns:
+            Token: Новая пара токенов
+
+        Raises:
+            ValueError: Если токен невалидный, истек или отозван
+
+        """
+        payload = decode_refresh_token(refresh_token)
+        if not payload:
+            msg = "Недействительный refresh-токен"
+            raise ValueError(msg)
+
+        jti = payload['jti']
+        if revocation_cache.is_reused(jti):
+            # Все сессии уже отозваны при первом повторном предъявлении
+            msg = "Refresh-токен отозван"
+            raise ValueError(msg)
+
+        user_id = tokens = None
+        if not revocation_cache.is_revoked(jti):
+            # Отзыв старой и создание новой сессии — одна транзакция
+            async with self.uow:
+                user_id = await self.session_repo.consume(jti)
+                if user_id is not None:
+                    tokens = await self.issue_tokens(user_id)
+
+        revocation_cache.revoke(jti, payload['exp'])
+        if tokens is None:
+            await self.revoke_all(int(payload['user_id']))
+            revocation_cache.mark_reused(jti, payload['exp'])
+            msg = "Refresh-токен отозван"
+            raise ValueError(msg)
+
+        return tokens
+
+    async def revoke(self, refresh_token: str) -> None:
+        """
+        Отзыв refresh-токена (выход из сессии).
+
+        Args:
+            refresh_token: Refresh-токен
+
+        Raises:
+            ValueError: Если токен невалидный
+
+        """
+        payload = decode_refresh_token(refresh_token)
+        if not payload:
+            msg = "Недействительный refresh-токен"
+            raise ValueError(msg)
+
+        async with self.uow:
+            await self.session_repo.consume(payload['jti'])
+        revocation_cache.revoke(payload['jti'], payload['exp'])
+
+    async def revoke_all(self, user_id: int) -> None:
+        """
+        Отзыв всех сессий пользователя.
+
+        Args:
+            user_id: ID пользователя
+
+        """
+        async with self.uow:
+            revoked = await self.session_repo.revoke_user_sessions(user_id)
+        for jti, expires_at in revoked:
+            revocation_cache.revoke(jti, expires_at.timestamp())
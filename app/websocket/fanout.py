@@ -0,0 +1,195 @@
+"""
+Шардированная рассылка сообщений в больших чатах.
+Подключения, подписанные на чат, распределяются по шардам, у каждого шарда своя очередь
+и своя задача доставки, поэтому рассылка в мега-группу не блокирует event loop.
+Содержит метрики времени рассылки по чатам.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING
+
+from app.config import settings
+from app.core.cache import LRUCache
+
+if TYPE_CHECKING:
+    from app.websocket.registry import Connection
+
+logger = logging.getLogger(__name__)
+
+SendFunc = Callable[['Connection', str], Awaitable[None]]
+
+
+class ChatFanoutStats:
+    """Накопленная статистика рассылки одного чата."""
+
+    __slots__ = ('deliveries', 'dropped', 'last_seconds', 'max_seconds', 'recipients', 'total_seconds')
+
+    def __init__(self):
+        self.deliveries = 0
+        self.recipients = 0
+        self.dropped = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        """Представление статистики для отдачи в API."""
+        return {
+            'deliveries': self.deliveries,
+            'recipients': self.recipients,
+            'dropped': self.dropped,
+            'avg_ms': round(self.total_seconds / self.deliveries * 1000, 3) if self.deliveries else 0.0,
+            'max_ms': round(self.max_seconds * 1000, 3),
+            'last_ms': round(self.last_seconds * 1000, 3),
+        }
+
+
+class FanoutMetrics:
+    """Метрики времени рассылки по чатам (хранятся для ограниченного числа активных чатов)."""
+
+    def __init__(self, maxsize: int):
+        self._stats: LRUCache[int, ChatFanoutStats] = LRUCache(maxsize)
+
+    def _get(self, chat_id: int) -> ChatFanoutStats:
+        stats = self._stats.get(chat_id)
+        if stats is None:
+            stats = ChatFanoutStats()
+            self._stats.set(chat_id, stats)
+        return stats
+
+    def record(self, chat_id: int, seconds: float, recipients: int) -> None:
+        """Учет завершенной рассылки одного сообщения."""
+        stats = self._get(chat_id)
+        stats.deliveries += 1
+        stats.recipients += recipients
+        stats.total_seconds += seconds
+        stats.last_seconds = seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+
+    def record_drop(self, chat_id: int) -> None:
+        """Учет сообщения, не поставленного в переполненную очередь шарда."""
+        self._get(chat_id).dropped += 1
+
+    def snapshot(self) -> dict[int, dict]:
+        """Статистика по всем отслеживаемым чатам."""
+        return {chat_id: stats.as_dict() for chat_id, stats in self._stats.items()}
+
+
+class _Delivery:
+    """Рассылка одного сообщения: завершается, когда ее обработали все шарды."""
+
+    __slots__ = ('chat_id', 'metrics', 'recipients', 'remaining', 'started')
+
+    def __init__(self, chat_id: int, shards: int, metrics: FanoutMetrics):
+        self.chat_id = chat_id
+        self.metrics = metrics
+        self.remaining = shards
+        self.recipients = 0
+        self.started = time.perf_counter()
+
+    def shard_done(self, recipients: int) -> None:
+        self.recipients += recipients
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.metrics.record(self.chat_id, time.perf_counter() - self.started, self.recipients)
+
+
+class FanoutShard:
+    """Часть подключений большого чата с собственной очередью и задачей доставки."""
+
+    def __init__(self, send: SendFunc, queue_size: int, yield_every: int):
+        self.connections: set[Connection] = set()
+        self.queue: asyncio.Queue[tuple[str, Connection | None, _Delivery]] = asyncio.Queue(queue_size)
+        self._send = send
+        self._yield_every = yield_every
+        self.busy = False
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            message, exclude, delivery = await self.queue.get()
+            self.busy = True
+            recipients = 0
+            for position, connection in enumerate(tuple(self.connections), 1):
+                if connection is not exclude:
+                    try:
+                        await self._send(connection, message)
+                        recipients += 1
+                    except Exception:  # noqa: BLE001
+                        logger.warning('Fan-out delivery to user %s failed', connection.user_id, exc_info=True)
+                if position % self._yield_every == 0:
+                    # Отдаем управление циклу, чтобы один шард не занимал его целиком
+                    await asyncio.sleep(0)
+            delivery.shard_done(recipients)
+            self.busy = False
+            self.queue.task_done()
+
+    def close(self) -> None:
+        """Остановка задачи доставки."""
+        self._task.cancel()
+
+
+class ShardedChat:
+    """
+    Большой чат в режиме шардированной рассылки.
+
+    Подключения пользователя закрепляются за шардом по остатку от деления его ID,
+    публикация только ставит сообщение в очереди шардов и не ждет доставки.
+    """
+
+    def __init__(
+            self,
+            chat_id: int,
+            send: SendFunc,
+            metrics: FanoutMetrics,
+            shards: int = settings.websocket.fanout_shards,
+            queue_size: int = settings.websocket.fanout_queue_size,
+            yield_every: int = settings.websocket.fanout_yield_every
+    ):
+        self.chat_id = chat_id
+        self.metrics = metrics
+        self.shards = [FanoutShard(send, queue_size, yield_every) for _ in range(shards)]
+
+    def _shard(self, connection: 'Connection') -> FanoutShard:
+        return self.shards[connection.user_id % len(self.shards)]
+
+    def add(self, connection: 'Connection') -> None:
+        """Добавление подписанного подключения."""
+        self._shard(connection).connections.add(connection)
+
+    def discard(self, connection: 'Connection') -> None:
+        """Удаление отписавшегося подключения."""
+        self._shard(connection).connections.discard(connection)
+
+    def publish(self, message: str, exclude: 'Connection | None' = None) -> None:
+        """
+        Постановка сообщения в очереди всех шардов.
+
+        Если очередь шарда переполнена (клиенты не успевают принимать сообщения),
+        сообщение для этого шарда отбрасывается и учитывается в метриках.
+
+        Args:
+            message: Текст сообщения
+            exclude: Подключение, которому не нужно отправлять сообщение
+
+        """
+        delivery = _Delivery(self.chat_id, len(self.shards), self.metrics)
+        for shard in self.shards:
+            try:
+                shard.queue.put_nowait((message, exclude, delivery))
+            except asyncio.QueueFull:
+                self.metrics.record_drop(self.chat_id)
+                delivery.shard_done(0)
+
+    @property
+    def idle(self) -> bool:
+        """Нет сообщений, ожидающих доставки."""
+        return all(shard.queue.empty() and not shard.busy for shard in self.shards)
+
+    def close(self) -> None:
+        """Остановка задач доставки всех шардов."""
+        for shard in self.shards:
+            shard.close()
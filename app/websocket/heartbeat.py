@@ -0,0 +1,175 @@
+"""
+Контроль живости WebSocket-подключений.
+Сервер периодически отправляет ping-фреймы и закрывает подключения, не ответившие
+за отведенное время. Сроки хранятся в хешированном колесе таймеров: одна задача
+на все подключения, а обработка тика стоит O(число наступивших сроков).
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from app.websocket.registry import Connection
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=Hashable)
+
+PING_FRAME = json.dumps({'type': 'ping'})
+PONG_FRAME = json.dumps({'type': 'pong'})
+
+
+class TimerWheel(Generic[T]):
+    """
+    Хешированное колесо таймеров.
+
+    Время делится на тики длительностью tick, элемент со сроком через k тиков
+    попадает в ячейку (текущий тик + k) % slots. Срок ограничен длиной оборота
+    колеса, поэтому все элементы сработавшей ячейки просрочены и проверять
+    остальные не нужно. Перенос срока элемента стоит O(1).
+    """
+
+    def __init__(self, tick: float, slots: int, now: float | None = None):
+        self.tick = tick
+        self._slots: list[set[T]] = [set() for _ in range(slots)]
+        self._due: dict[T, int] = {}
+        self._current = self._tick_of(time.monotonic() if now is None else now)
+
+    def _tick_of(self, moment: float) -> int:
+        return math.floor(moment / self.tick)
+
+    def schedule(self, item: T, delay: float) -> None:
+        """
+        Установка (или перенос) срока элемента.
+
+        Args:
+            item: Элемент
+            delay: Через сколько секунд наступает срок (не больше длины оборота колеса)
+
+        """
+        ticks = min(max(1, math.ceil(delay / self.tick)), len(self._slots) - 1)
+        due = self._current + ticks
+        previous = self._due.get(item)
+        if previous == due:
+            return
+        if previous is not None:
+            self._slots[previous % len(self._slots)].discard(item)
+        self._slots[due % len(self._slots)].add(item)
+        self._due[item] = due
+
+    def cancel(self, item: T) -> None:
+        """Удаление элемента из колеса."""
+        due = self._due.pop(item, None)
+        if due is not None:
+            self._slots[due % len(self._slots)].discard(item)
+
+    def advance(self, now: float | None = None) -> list[T]:
+        """
+        Продвижение колеса до текущего момента.
+
+        Args:
+            now: Текущее время (time.monotonic) - для тестов
+
+        Returns:
+            list[T]: Элементы, срок которых наступил
+
+        """
+        target = self._tick_of(time.monotonic() if now is None else now)
+        # Отставание больше оборота обрабатывается одним проходом по всем ячейкам
+        steps = min(target - self._current, len(self._slots))
+        expired: list[T] = []
+        for step in range(1, steps + 1):
+            slot = self._slots[(self._current + step) % len(self._slots)]
+            if slot:
+                expired.extend(slot)
+                for item in slot:
+                    del self._due[item]
+                slot.clear()
+        self._current = max(self._current, target)
+        return expired
+
+    def __len__(self) -> int:
+        """Количество элементов в колесе."""
+        return len(self._due)
+
+
+class HeartbeatMonitor:
+    """
+    Ping/pong и закрытие неактивных подключений.
+
+    Подключение, от которого interval секунд не было фреймов, получает ping.
+    Если и после этого до timeout секунд с момента последней активности
+    ничего не пришло, подключение считается мертвым и передается в on_expire.
+    Любой входящий фрейм (в том числе pong) продлевает срок.
+    """
+
+    def __init__(
+            self,
+            on_expire: Callable[['Connection'], Awaitable[None]],
+            interval: float = settings.websocket.heartbeat_interval,
+            timeout: float = settings.websocket.heartbeat_timeout,
+            tick: float = settings.websocket.heartbeat_tick
+    ):
+        self.on_expire = on_expire
+        self.interval = interval
+        self.timeout = timeout
+        self.wheel: TimerWheel[Connection] = TimerWheel(tick, math.ceil(max(interval, timeout) / tick) + 2)
+        self.pings_sent = 0
+        self.expired_total = 0
+        self._task: asyncio.Task | None = None
+
+    def track(self, connection: 'Connection') -> None:
+        """Начало контроля подключения."""
+        self.touch(connection)
+
+    def touch(self, connection: 'Connection') -> None:
+        """Отметка активности подключения (получен фрейм)."""
+        connection.awaiting_pong = False
+        self.wheel.schedule(connection, self.interval)
+
+    def forget(self, connection: 'Connection') -> None:
+        """Окончание контроля подключения."""
+        self.wheel.cancel(connection)
+
+    async def tick(self, now: float | None = None) -> None:
+        """Обработка наступивших сроков: ping для молчащих, закрытие не ответивших."""
+        for connection in self.wheel.advance(now):
+            if connection.awaiting_pong:
+                self.expired_total += 1
+                await self.on_expire(connection)
+                continue
+            connection.awaiting_pong = True
+            self.wheel.schedule(connection, self.timeout - self.interval)
+            self.pings_sent += 1
+            try:
+                await connection.send(PING_FRAME)
+            except Exception:  # noqa: BLE001
+                logger.debug('Ping to user %s failed', connection.user_id)
+
+    def start(self) -> None:
+        """Запуск фоновой задачи (если еще не запущена)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception('Heartbeat tick failed')
+
+    def stats(self) -> dict:
+        """Число контролируемых (живых) и закрытых по таймауту подключений."""
+        return {
+            'live': len(self.wheel),
+            'expired': self.expired_total,
+            'pings_sent': self.pings_sent,
+        }
@@ -0,0 +1,128 @@
+"""
+Входящие события для отключившихся пользователей.
+Собирает события чатов, пропущенные пользователем за время отключения,
+и отдает их одним пакетным фреймом при повторном подключении.
+
+Очереди хранятся в памяти процесса: события собираются только для пользователей,
+отключившихся от этого же процесса, и только пока процесс работает. Если клиент
+переподключился к другому процессу (или процесс перезапущен), пропущенные события
+не приходят во фрейме pending - их нужно получить через POST /messages/sync,
+который читает сохраненные в БД сообщения и входящие (inbox_entries).
+"""
+
+import json
+import time
+from collections import deque
+
+from app.config import settings
+from app.core.cache import LRUCache
+
+PENDING_FRAME_TYPE = 'pending'
+
+
+class PendingInbox:
+    """
+    Ограниченные по размеру и времени жизни очереди событий пользователей.
+
+    После отключения пользователь остается «наблюдателем» чата на время ttl:
+    события, разосланные в чат за это время, попадают в его очередь.
+    Очередь хранит не более maxlen последних событий, число пользователей
+    с очередями ограничено max_users (давно не пополнявшиеся вытесняются).
+    Просроченные наблюдатели удаляются при каждом обращении к входящим, в том числе
+    наблюдатели чатов, в которые больше ничего не рассылается.
+    """
+
+    def __init__(
+            self,
+            maxlen: int = settings.websocket.inbox_size,
+            ttl: float = settings.websocket.inbox_ttl,
+            max_users: int = settings.websocket.inbox_users
+    ):
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self._events: LRUCache[int, deque[tuple[float, int, str]]] = LRUCache(max_users, ttl)
+        self._watchers: dict[int, dict[int, float]] = {}
+        # Сроки наблюдателей в порядке назначения (ttl общий, поэтому и в порядке истечения)
+        self._expirations: deque[tuple[float, int, int]] = deque()
+
+    def watch(self, chat_id: int, user_id: int) -> None:
+        """Начало сбора событий чата для отключившегося пользователя."""
+        now = time.monotonic()
+        self._prune(now)
+        expires_at = now + self.ttl
+        self._watchers.setdefault(chat_id, {})[user_id] = expires_at
+        self._expirations.append((expires_at, chat_id, user_id))
+
+    def unwatch(self, chat_id: int, user_id: int) -> None:
+        """Окончание сбора событий чата (пользователь снова подключен)."""
+        watchers = self._watchers.get(chat_id)
+        if watchers is not None:
+            watchers.pop(user_id, None)
+            if not watchers:
+                del self._watchers[chat_id]
+
+    def watchers(self, chat_id: int) -> list[int]:
+        """ID отключившихся пользователей, для которых собираются события чата."""
+        self._prune(time.monotonic())
+        return list(self._watchers.get(chat_id, ()))
+
+    @property
+    def watcher_count(self) -> int:
+        """Число наблюдателей (пар чат - пользователь), включая еще не удаленные просроченные."""
+        return sum(len(watchers) for watchers in self._watchers.values())
+
+    def _prune(self, now: float) -> None:
+        """Удаление наблюдателей с истекшим сроком (амортизированно O(1) на наблюдателя)."""
+        while self._expirations and self._expirations[0][0] < now:
+            expires_at, chat_id, user_id = self._expirations.popleft()
+            watchers = self._watchers.get(chat_id)
+            # Повторный watch продлевает срок: удаляется только запись с этим же сроком
+            if watchers is not None and watchers.get(user_id) == expires_at:
+                del watchers[user_id]
+                if not watchers:
+                    del self._watchers[chat_id]
+
+    def push(self, user_id: int, chat_id: int, event: str) -> None:
+        """
+        Сохранение события для пользователя.
+
+        Args:
+            user_id: ID получателя
+            chat_id: ID чата события
+            event: Сериализованный фрейм события
+
+        """
+        now = time.monotonic()
+        self._prune(now)
+        events = self._events.get(user_id)
+        if events is None:
+            events = deque(maxlen=self.maxlen)
+        events.append((now + self.ttl, chat_id, event))
+        self._events.set(user_id, events)
+
+    def drain(self, user_id: int) -> str | None:
+        """
+        Извлечение всех непросроченных событий пользователя одним фреймом.
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            str | None: Фрейм {"type": "pending", "events": [{"chat_id": ..., "event": {...}}]}
+            или None, если событий нет
+
+        """
+        now = time.monotonic()
+        self._prune(now)
+        events = self._events.pop(user_id)
+        if not events:
+            return None
+        # События уже сериализованы, поэтому фрейм собирается без повторного разбора JSON
+        items = [
+            f'{{"chat_id": {chat_id}, "event": {event}}}'
+            for expires_at, chat_id, event in events
+            if expires_at >= now
+        ]
+        if not items:
+            return None
+        return f'{{"type": {json.dumps(PENDING_FRAME_TYPE)}, "events": [{", ".join(items)}]}}'
@@ -1,31 +1,96 @@
 """
 Менеджер WebSocket соединений.
 Управляет активными WebSocket соединениями и их жизненным циклом.
-Обрабатывает подключение/отключение пользователей и маршрутизацию сообщений.
+Обрабатывает подключение/отключение устройств пользователей, подписки на чаты и маршрутизацию сообщений.
+Большие чаты переводятся в режим шардированной рассылки (см. app.websocket.fanout),
+события для отключившихся пользователей копятся во входящих (см. app.websocket.inbox).
+События чатов поступают из outbox после фиксации изменений (см. app.websocket.outbox).
 """
 
+import asyncio
 import json
+import logging
+import time
 
 from fastapi import WebSocket
-
-from app.core.security import decode_token
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.config import settings
+from app.core.admission import Priority, admission
+from app.core.query_budget import QueryBudget, count_queries
+from app.core.ratelimit import FrameRateLimiter
+from app.core.security import REFRESH_TOKEN_TYPE, decode_token
+from app.schemas.message import MessageCreate
 from app.services.message import MessageService
+from app.websocket.fanout import FanoutMetrics, ShardedChat
+from app.websocket.heartbeat import PONG_FRAME, HeartbeatMonitor
+from app.websocket.inbox import PendingInbox
+from app.websocket.registry import Connection, ConnectionRegistry
+
+logger = logging.getLogger(__name__)
+
+# Фреймы, обращающиеся к БД: отправка сообщений важнее чтения и подписок
+FRAME_PRIORITIES = {
+    'message': Priority.HIGH,
+    'read': Priority.LOW,
+    'subscribe': Priority.LOW,
+}
+
+# Бюджеты запросов к БД на обработку одного фрейма
+FRAME_QUERY_BUDGETS = {
+    'message': QueryBudget(6),
+    'read': QueryBudget(4),
+    'subscribe': QueryBudget(1),
+}
 
 
 class ConnectionManager:
     """
     Менеджер для управления WebSocket соединениями и рассылкой сообщений.
 
+    Один сокет может быть подписан на несколько чатов, у пользователя может быть
+    по одному сокету на каждое устройство.
+
     Атрибуты:
-        active_connections: Словарь активных соединений {user_id: websocket}
-        user_chats: Словарь чатов пользователей {user_id: set(chat_ids)}
-        chat_users: Словарь пользователей в чатах {chat_id: set(user_ids)}
+        registry: Подключения пользователей по устройствам
+        chat_connections: Подключения, подписанные на чат {chat_id: set(Connection)}
+        large_chats: Чаты в режиме шардированной рассылки {chat_id: ShardedChat}
+        chat_members: Число участников чатов с подписками {chat_id: count} (по данным БД при подписке)
+        fanout_metrics: Метрики времени рассылки по чатам
+        inbox: События, пропущенные отключившимися пользователями
+        heartbeat: Ping/pong и закрытие неактивных (полуоткрытых) подключений
+        rate_limiter: Лимиты частоты входящих фреймов по пользователям и чатам
+
+    Рассылаемые сообщения ставятся в очередь отправки подключения, которую разбирает
+    его собственная задача: рассылка (и диспетчер outbox) не ждет сокет получателя.
+    Подключение, не принявшее фрейм за send_timeout секунд или накопившее больше
+    send_queue_size неотправленных сообщений, закрывается.
+
+    Чат переводится в шардированный режим, когда число подписанных подключений
+    достигает large_chat_threshold или число участников чата достигает
+    large_chat_member_threshold (подключения участников большой группы придут
+    и на другие процессы, и к этому). В обычный режим чат возвращается, только
+    когда оба числа падают ниже половины своих порогов: чат у границы порога
+    не переключается туда и обратно на каждой подписке.
     """
 
-    def __init__(self):
-        self.active_connections: dict[int, WebSocket] = {}
-        self.user_chats: dict[int, set[int]] = {}
-        self.chat_users: dict[int, set[int]] = {}
+    def __init__(
+            self,
+            large_chat_threshold: int = settings.websocket.large_chat_threshold,
+            large_chat_member_threshold: int = settings.websocket.large_chat_member_threshold
+    ):
+        self.registry = ConnectionRegistry()
+        self.chat_connections: dict[int, set[Connection]] = {}
+        self.large_chat_threshold = large_chat_threshold
+        self.large_chat_member_threshold = large_chat_member_threshold
+        self.large_chats: dict[int, ShardedChat] = {}
+        self.chat_members: dict[int, int] = {}
+        self.fanout_metrics = FanoutMetrics(settings.websocket.fanout_stats_size)
+        self.inbox = PendingInbox()
+        self.heartbeat = HeartbeatMonitor(self._expire)
+        self.rate_limiter = FrameRateLimiter()
+        self.send_queue_size = settings.websocket.send_queue_size
+        self.send_timeout = settings.websocket.send_timeout
 
     async def authenticate_token(self, token: str) -> int:
         """
@@ -42,134 +107,414 @@ class ConnectionManager:
 
         """
         payload = decode_token(token)
-        if not payload or 'user_id' not in payload:
+        if not payload or 'user_id' not in payload or payload.get('type') == REFRESH_TOKEN_TYPE:
             msg = 'Invalid token'
             raise ValueError(msg)
         return int(payload['user_id'])
 
-    async def connect(self, user_id: int, chat_id: int, websocket: WebSocket):
+    async def connect(self, user_id: int, websocket: WebSocket, device_id: str | None = None) -> Connection:
         """
-        Регистрирует новое подключение пользователя к чату.
+        Регистрирует новое подключение устройства пользователя.
+
+        Прежнее подключение того же устройства закрывается. Если за время отключения
+        пользователю были адресованы события, они отправляются сразу после
+        подключения одним фреймом типа pending.
 
         Args:
             user_id: ID пользователя
-            chat_id: ID чата
             websocket: Объект WebSocket соединения
+            device_id: ID устройства (если не задан, подключение считается отдельным устройством)
+
+        Returns:
+            Connection: Зарегистрированное подключение
 
         """
         await websocket.accept()
 
-        self.active_connections[user_id] = websocket
+        connection = Connection(user_id, websocket, device_id)
+        replaced = self.registry.register(connection)
+        if replaced is not None:
+            self.heartbeat.forget(replaced)
+            self._drop_subscriptions(replaced)
+            await self._close(replaced)
+        self.heartbeat.track(connection)
+        self.heartbeat.start()
+        await self._send_pending(connection)
+        return connection
+
+    def disconnect(self, connection: Connection):
+        """
+        Удаляет подключение устройства вместе с его подписками.
 
-        if user_id not in self.user_chats:
-            self.user_chats[user_id] = set()
-        self.user_chats[user_id].add(chat_id)
+        Args:
+            connection: Подключение
 
-        if chat_id not in self.chat_users:
-            self.chat_users[chat_id] = set()
-        self.chat_users[chat_id].add(user_id)
+        """
+        if self.registry.unregister(connection):
+            self.heartbeat.forget(connection)
+            self._drop_subscriptions(connection)
+            connection.outgoing.clear()
 
-    def disconnect(self, user_id: int, chat_id: int):
+    async def subscribe(self, connection: Connection, chat_id: int, members: int | None = None):
         """
-        Удаляет подключение пользователя.
+        Подписывает подключение на события чата.
+
+        Доступ пользователя к чату проверяется вызывающим кодом.
 
         Args:
-            user_id: ID пользователя
+            connection: Подключение
             chat_id: ID чата
+            members: Число участников чата (если известно вызывающему коду)
 
         """
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+        connection.chats.add(chat_id)
+        self.chat_connections.setdefault(chat_id, set()).add(connection)
+        if members is not None:
+            self.chat_members[chat_id] = members
 
-        if user_id in self.user_chats and chat_id in self.user_chats[user_id]:
-            self.user_chats[user_id].remove(chat_id)
+        if chat_id in self.large_chats:
+            self.large_chats[chat_id].add(connection)
+        else:
+            self._update_mode(chat_id)
 
-        if chat_id in self.chat_users and user_id in self.chat_users[chat_id]:
-            self.chat_users[chat_id].remove(user_id)
+        self.inbox.unwatch(chat_id, connection.user_id)
+        await self._send_pending(connection)
 
-    async def send_personal_message(self, message: str, user_id: int):
+    def unsubscribe(self, connection: Connection, chat_id: int):
         """
-        Отправляет сообщение конкретному пользователю.
+        Отписывает подключение от событий чата.
+
+        Если у пользователя не осталось подписанных на чат подключений, события чата
+        для него собираются во входящих до повторной подписки.
+
+        Args:
+            connection: Подключение
+            chat_id: ID чата
+
+        """
+        connection.chats.discard(chat_id)
+        connections = self.chat_connections.get(chat_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.chat_connections[chat_id]
+                self.chat_members.pop(chat_id, None)
+
+        if not self.is_subscribed(connection.user_id, chat_id):
+            self.inbox.watch(chat_id, connection.user_id)
+
+        sharded = self.large_chats.get(chat_id)
+        if sharded is not None:
+            sharded.discard(connection)
+            self._update_mode(chat_id)
+
+    def is_subscribed(self, user_id: int, chat_id: int) -> bool:
+        """Подписано ли на чат хотя бы одно подключение пользователя."""
+        return any(chat_id in connection.chats for connection in self.registry.devices(user_id))
+
+    def _update_mode(self, chat_id: int) -> None:
+        """Перевод чата между обычным и шардированным режимом по порогам с гистерезисом."""
+        connections = len(self.chat_connections.get(chat_id, ()))
+        members = self.chat_members.get(chat_id, 0)
+        sharded = self.large_chats.get(chat_id)
+        if sharded is None:
+            if connections and (
+                    connections >= self.large_chat_threshold or members >= self.large_chat_member_threshold
+            ):
+                self.promote(chat_id)
+        elif (
+                connections < self.large_chat_threshold // 2
+                and members < self.large_chat_member_threshold // 2
+                and sharded.idle
+        ):
+            self.demote(chat_id)
+
+    def promote(self, chat_id: int) -> None:
+        """
+        Перевод чата в режим шардированной рассылки.
+
+        Args:
+            chat_id: ID чата
+
+        """
+        if chat_id in self.large_chats:
+            return
+        sharded = ShardedChat(chat_id, self._deliver, self.fanout_metrics)
+        for connection in self.chat_connections.get(chat_id, ()):
+            sharded.add(connection)
+        self.large_chats[chat_id] = sharded
+
+    def demote(self, chat_id: int) -> None:
+        """
+        Возврат чата в режим обычной рассылки.
+
+        Args:
+            chat_id: ID чата
+
+        """
+        sharded = self.large_chats.pop(chat_id, None)
+        if sharded is not None:
+            sharded.close()
+
+    def stats(self) -> dict:
+        """Статистика: число подключений, чаты в шардированном режиме и метрики рассылки по чатам."""
+        return {
+            'users': self.registry.user_count,
+            'connections': len(self.registry),
+            'heartbeat': self.heartbeat.stats(),
+            'large_chats': sorted(self.large_chats),
+            'fanout': self.fanout_metrics.snapshot(),
+        }
+
+    async def send_personal_message(self, message: str, user_id: int, chat_id: int | None = None):
+        """
+        Отправляет сообщение на все устройства пользователя.
 
         Args:
             message: Текст сообщения
             user_id: ID пользователя-получателя
+            chat_id: ID чата события (если задан, сообщение для неподключенного
+                пользователя сохраняется во входящих)
 
         """
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_text(message)
-
-    async def broadcast_to_chat(self, message: str, chat_id: int, exclude_user: int | None = None):
+        connections = self.registry.devices(user_id)
+        if connections:
+            for connection in connections:
+                await self._deliver(connection, message)
+        elif chat_id is not None:
+            self.inbox.push(user_id, chat_id, message)
+
+    async def broadcast_to_chat(self, message: str, chat_id: int, exclude: Connection | None = None):
         """
-        Рассылает сообщение всем участникам чата.
+        Рассылает сообщение всем подключениям, подписанным на чат.
 
         Args:
             message: Текст сообщения
             chat_id: ID чата
-            exclude_user: ID пользователя, которому не нужно отправлять сообщение
+            exclude: Подключение, которому не нужно отправлять сообщение (сокет отправителя;
+                другие устройства отправителя сообщение получают)
 
         """
-        if chat_id not in self.chat_users:
+        for user_id in self.inbox.watchers(chat_id):
+            self.inbox.push(user_id, chat_id, message)
+
+        if chat_id not in self.chat_connections:
+            return
+
+        sharded = self.large_chats.get(chat_id)
+        if sharded is not None:
+            # Доставку выполняют задачи шардов, отправитель не ждет ее окончания
+            sharded.publish(message, exclude)
             return
 
-        for user_id in self.chat_users[chat_id]:
-            if user_id != exclude_user and user_id in self.active_connections:
-                await self.active_connections[user_id].send_text(message)
+        started = time.perf_counter()
+        recipients = 0
+        for connection in tuple(self.chat_connections[chat_id]):
+            if connection is not exclude:
+                await self._deliver(connection, message)
+                recipients += 1
+        self.fanout_metrics.record(chat_id, time.perf_counter() - started, recipients)
 
-    async def handle_message(self, user_id: int, chat_id: int, data: str, message_service: MessageService):
+    async def publish(self, chat_id: int, payload: dict, origin: str | None = None) -> None:
         """
-        Обрабатывает входящее сообщение через WebSocket.
+        Рассылка события outbox участникам чата.
 
         Args:
-            user_id: ID отправителя
             chat_id: ID чата
-            data: Строка с данными сообщения
+            payload: Фрейм события
+            origin: Устройство-источник "user_id:device_id"; если оно подключено
+                к этому процессу, событие ему не отправляется
+
+        """
+        exclude = None
+        if origin is not None:
+            user_id, device_id = origin.split(':', 1)
+            exclude = self.registry.get(int(user_id), device_id)
+        await self.broadcast_to_chat(json.dumps(payload), chat_id, exclude=exclude)
+
+    async def handle_message(
+            self,
+            connection: Connection,
+            data: str,
+            message_service: MessageService,
+            chat_id: int | None = None
+    ):
+        """
+        Обрабатывает входящий фрейм WebSocket.
+
+        Args:
+            connection: Подключение отправителя
+            data: Строка с данными фрейма
             message_service: Сервис для работы с сообщениями
+            chat_id: ID чата сокета /ws/{chat_id}; для мультиплексированного сокета
+                берется из поля chat_id фрейма
 
         """
+        user_id = connection.user_id
+        self.heartbeat.touch(connection)
         try:
             message_data = json.loads(data)
-
-            if message_data.get('type') == 'message':
-                # Создание нового сообщения
-                message = await message_service.send_message(
-                    chat_id=chat_id,
-                    sender_id=user_id,
-                    text=message_data['text']
-                )
-
-                # Рассылка сообщения участникам чата
-                await self.broadcast_to_chat(
-                    json.dumps({
-                        'type': 'message',
-                        'id': message.id,
-                        'text': message.text,
-                        'sender_id': user_id,
-                        'timestamp': message.created_at.isoformat()
-                    }),
-                    chat_id,
-                    exclude_user=user_id
-                )
-
-            elif message_data.get('type') == 'read':
-                # Пометка сообщения как прочитанного
-                message_id = message_data['message_id']
-                await message_service.mark_as_read(message_id)
-
-                # Уведомление участников чата
-                await self.broadcast_to_chat(
-                    json.dumps({
-                        'type': 'read',
-                        'message_id': message_id,
-                        'chat_id': chat_id,
-                        'reader_id': user_id
-                    }),
-                    chat_id,
-                    exclude_user=user_id
-                )
-
-        except (json.JSONDecodeError, KeyError, ValueError):
-            await self.send_personal_message(
-                json.dumps({'error': 'Invalid message format'}),
-                user_id
+            frame_type = message_data.get('type')
+            if frame_type == 'pong':
+                return
+            if frame_type == 'ping':
+                await connection.send(PONG_FRAME)
+                return
+            if chat_id is None:
+                chat_id = int(message_data['chat_id'])
+
+            wait = self.rate_limiter.check(frame_type, user_id, chat_id)
+            if wait:
+                # Фрейм отклоняется до любых обращений к БД
+                await connection.send(json.dumps({
+                    'error': 'Slow down',
+                    'code': 'rate_limited',
+                    'type': frame_type,
+                    'chat_id': chat_id,
+                    'retry_after': round(wait, 3)
+                }))
+                return
+
+            priority = FRAME_PRIORITIES.get(frame_type)
+            if priority is None:
+                await self._dispatch(connection, frame_type, chat_id, message_data, message_service)
+                return
+
+            retry_after = admission.try_admit(priority)
+            if retry_after is not None:
+                await connection.send(self._overloaded_frame(frame_type, chat_id, retry_after))
+                return
+            try:
+                with count_queries(f'WS {frame_type}', FRAME_QUERY_BUDGETS.get(frame_type)):
+                    await self._dispatch(connection, frame_type, chat_id, message_data, message_service)
+            except PoolTimeoutError:
+                await connection.send(self._overloaded_frame(frame_type, chat_id, 1))
+            finally:
+                admission.release()
+
+        except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError):
+            await connection.send(json.dumps({'error': 'Invalid message format'}))
+
+    async def _dispatch(
+            self,
+            connection: Connection,
+            frame_type: str,
+            chat_id: int,
+            message_data: dict,
+            message_service: MessageService
+    ) -> None:
+        """Выполнение фрейма, прошедшего проверки лимитов и допуска."""
+        user_id = connection.user_id
+        if frame_type == 'subscribe':
+            members = await message_service.get_member_count(user_id, chat_id)
+            if members is None:
+                await connection.send(json.dumps({'error': 'Access denied', 'chat_id': chat_id}))
+                return
+            await self.subscribe(connection, chat_id, members)
+            await connection.send(json.dumps({'type': 'subscribed', 'chat_id': chat_id}))
+
+        elif frame_type == 'unsubscribe':
+            self.unsubscribe(connection, chat_id)
+            await connection.send(json.dumps({'type': 'unsubscribed', 'chat_id': chat_id}))
+
+        elif chat_id not in connection.chats:
+            await connection.send(json.dumps({'error': 'Not subscribed', 'chat_id': chat_id}))
+
+        elif frame_type == 'message':
+            # Создание нового сообщения (повтор с тем же client_message_id не создает дубликат);
+            # участникам чата сообщение рассылается из outbox после фиксации транзакции
+            payload = MessageCreate.model_validate(message_data)
+            message, created = await message_service.send_message_once(
+                chat_id=chat_id,
+                sender_id=user_id,
+                text=payload.text,
+                client_message_id=payload.client_message_id,
+                origin=connection.origin
             )
+            if payload.client_message_id is not None:
+                await connection.send(json.dumps({
+                    'type': 'sent',
+                    'id': message.id,
+                    'seq': message.seq,
+                    'chat_id': chat_id,
+                    'client_message_id': payload.client_message_id,
+                    'duplicate': not created
+                }))
+
+        elif frame_type == 'read':
+            # Пометка сообщения как прочитанного; уведомление участников чата - через outbox
+            # Сообщение должно принадлежать чату фрейма, на который подписано подключение
+            await message_service.mark_as_read(
+                message_data['message_id'], reader_id=user_id, origin=connection.origin, chat_id=chat_id
+            )
+
+    @staticmethod
+    def _overloaded_frame(frame_type: str, chat_id: int, retry_after: int) -> str:
+        """Фрейм ошибки перегрузки БД."""
+        return json.dumps({
+            'error': 'Service overloaded',
+            'code': 'overloaded',
+            'type': frame_type,
+            'chat_id': chat_id,
+            'retry_after': retry_after
+        })
+
+    def _drop_subscriptions(self, connection: Connection) -> None:
+        """Отписка подключения от всех чатов."""
+        for chat_id in tuple(connection.chats):
+            self.unsubscribe(connection, chat_id)
+
+    async def _expire(self, connection: Connection) -> None:
+        """Отключение устройства, не ответившего на ping."""
+        self.disconnect(connection)
+        await self._close(connection)
+
+    async def _close(self, connection: Connection) -> None:
+        """Закрытие сокета (замененного новым подключением или не отвечающего)."""
+        try:
+            await asyncio.wait_for(connection.websocket.close(), self.send_timeout)
+        except Exception:  # noqa: BLE001
+            logger.debug('Connection of user %s already closed', connection.user_id)
+
+    async def _send_pending(self, connection: Connection) -> None:
+        """Отправка накопленных во входящих событий пользователя."""
+        pending = self.inbox.drain(connection.user_id)
+        if pending is not None:
+            await connection.send(pending)
+
+    async def _deliver(self, connection: Connection, message: str) -> None:
+        """Постановка сообщения в очередь отправки подключения (без ожидания сокета получателя)."""
+        if len(connection.outgoing) >= self.send_queue_size:
+            logger.warning('Send queue of user %s is full, closing connection', connection.user_id)
+            self._drop(connection)
+            return
+        connection.outgoing.append(message)
+        if connection.writer is None:
+            connection.writer = asyncio.create_task(self._write(connection))
+
+    async def _write(self, connection: Connection) -> None:
+        """Отправка очереди подключения с изоляцией ошибок: закрытый сокет не прерывает разбор очереди."""
+        try:
+            while connection.outgoing:
+                message = connection.outgoing.popleft()
+                try:
+                    await asyncio.wait_for(connection.send(message), self.send_timeout)
+                except TimeoutError:
+                    logger.warning('Delivery to user %s timed out, closing connection', connection.user_id)
+                    self.disconnect(connection)
+                    await self._close(connection)
+                    return
+                except Exception:  # noqa: BLE001
+                    logger.warning('Delivery to user %s failed', connection.user_id, exc_info=True)
+        finally:
+            if connection.writer is asyncio.current_task():
+                connection.writer = None
+
+    def _drop(self, connection: Connection) -> None:
+        """Отключение получателя, не успевающего принимать сообщения."""
+        self.disconnect(connection)
+        connection.outgoing.clear()
+        if connection.writer is not None:
+            connection.writer.cancel()
+        # Ссылка на задачу закрытия хранится в подключении до ее завершения
+        connection.writer = asyncio.create_task(self._close(connection))
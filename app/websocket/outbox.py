@@ -0,0 +1,289 @@
+"""
+Доставка событий outbox подключенным клиентам.
+Каждый процесс слушает канал LISTEN/NOTIFY на отдельном соединении (вне пула)
+и по уведомлению читает новые события из outbox_events. Периодический опрос таблицы
+страхует от потерянных уведомлений и обрыва соединения слушателя. Старые события
+удаляются задачей планировщика (cleanup).
+"""
+
+import asyncio
+import contextlib
+import datetime
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+import asyncpg
+
+from app.config import settings
+from app.db.models import OutboxEvent
+from app.db.repositories.outbox import OutboxRepository
+from app.db.session import write_engine, write_session
+
+logger = logging.getLogger(__name__)
+
+# Обработчик события: (chat_id, фрейм, устройство-источник)
+EventHandler = Callable[[int, dict, str | None], Awaitable[None]]
+
+
+class OutboxDispatcher:
+    """
+    Чтение событий outbox по возрастанию ID и передача их обработчику.
+
+    Событие с меньшим ID может быть зафиксировано позже события с большим
+    (параллельные транзакции), поэтому курсор продвигается только по непрерывному
+    префиксу прочитанных ID, а уже доставленные события выше курсора запоминаются.
+
+    Пропуск в нумерации окончателен (транзакция откачена), когда завершились все
+    транзакции, которые могли получить пропущенный ID: при пропуске запоминается
+    горизонт - xmax снимка, взятого после чтения, - и пропуск закрывается, когда
+    xmin нового снимка дошел до горизонта. Если горизонт не достигнут за gap_timeout
+    секунд (например, его держит долгая транзакция), курсор все равно продвигается,
+    а пропущенные ID перечитываются при каждом опросе: поздно зафиксированное
+    событие доставляется, а не теряется. Потерянными считаются только ID,
+    не разрешившиеся за срок хранения событий.
+    """
+
+    def __init__(
+            self,
+            handler: EventHandler,
+            channel: str = settings.outbox.outbox_channel,
+            poll_interval: float = settings.outbox.outbox_poll_interval,
+            batch_size: int = settings.outbox.outbox_batch_size,
+            gap_timeout: float = settings.outbox.outbox_gap_timeout,
+            retention: float = settings.outbox.outbox_retention
+    ):
+        self.handler = handler
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self.retention = retention
+        self.cursor: int | None = None
+        self.dispatched = 0
+        self.notifications = 0
+        self.polls = 0
+        self.rolled_back = 0
+        self.late = 0
+        self.lost = 0
+        self._seen: set[int] = set()
+        self._top = 0
+        self._gap_since: float | None = None
+        # (наибольший ID, прочитанный до снимка, xmax снимка)
+        self._horizon: tuple[int, int] | None = None
+        # Пропущенные курсором ID без подтверждения отката: ID -> время пропуска
+        self._unresolved: dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._listener: asyncpg.Connection | None = None
+        self._listen_failed = False
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """
+        Запуск фоновой задачи (если еще не запущена).
+
+        Слушатель и курсор готовятся до возврата: события запросов,
+        принятых после запуска, не пропускаются.
+        """
+        if self._task is not None and not self._task.done():
+            return
+        await self._listen()
+        try:
+            await self.poll()
+        except Exception:
+            logger.exception('Outbox cursor initialization failed')
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановка фоновой задачи после текущего чтения и закрытие соединения слушателя."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self._listener is not None:
+            with contextlib.suppress(Exception):
+                await self._listener.close()
+            self._listener = None
+
+    def notify(self, *_args) -> None:
+        """Обработчик уведомления канала: пробуждение цикла чтения."""
+        self.notifications += 1
+        self._wakeup.set()
+
+    async def dispatch(self, events: list[OutboxEvent], now: float | None = None) -> int:
+        """
+        Передача прочитанных событий обработчику.
+
+        Args:
+            events: События с ID больше курсора по возрастанию ID и перечитанные пропущенные события
+            now: Текущее время (time.monotonic) - для тестов
+
+        Returns:
+            int: Количество переданных событий (без уже доставленных ранее)
+
+        """
+        delivered = 0
+        for event in events:
+            if event.id in self._unresolved:
+                # Транзакция зафиксирована после того, как курсор прошел ее ID
+                del self._unresolved[event.id]
+                self.late += 1
+            elif event.id <= self.cursor or event.id in self._seen:
+                continue
+            else:
+                self._seen.add(event.id)
+                self._top = max(self._top, event.id)
+            try:
+                await self.handler(event.chat_id, event.payload, event.origin)
+            except Exception:
+                logger.exception('Outbox event %s dispatch failed', event.id)
+            delivered += 1
+        self.dispatched += delivered
+        self._advance(time.monotonic() if now is None else now)
+        return delivered
+
+    def settle(self, top: int, snapshot: tuple[int, int], covered: int | None = None) -> None:
+        """
+        Закрытие пропусков, все возможные транзакции которых завершились.
+
+        Args:
+            top: Наибольший прочитанный ID до взятия снимка
+            snapshot: (xmin, xmax) снимка, взятого перед чтением событий
+            covered: Последний прочитанный ID, если прочитана полная пачка (None - прочитаны все)
+
+        """
+        xmin, xmax = snapshot
+        if self._horizon is not None and xmin >= self._horizon[1]:
+            # Чтение после снимка видит все зафиксированные события с ID не выше горизонта
+            final = self._horizon[0]
+            for event_id in [event_id for event_id in self._unresolved if event_id <= final]:
+                del self._unresolved[event_id]
+                self.rolled_back += 1
+            final = final if covered is None else min(final, covered)
+            while self.cursor < final:
+                self.cursor += 1
+                if self.cursor in self._seen:
+                    self._seen.remove(self.cursor)
+                else:
+                    self.rolled_back += 1
+            self._horizon = None
+            self._advance_prefix()
+            if not self._seen:
+                self._gap_since = None
+        if self._horizon is None and (self._seen or self._unresolved):
+            self._horizon = (top, xmax)
+
+    def _advance_prefix(self) -> None:
+        """Продвижение курсора по непрерывному префиксу доставленных событий."""
+        while self.cursor + 1 in self._seen:
+            self.cursor += 1
+            self._seen.remove(self.cursor)
+
+    def _advance(self, now: float) -> None:
+        """Продвижение курсора; пропуск дольше gap_timeout переносится в перечитываемые ID."""
+        self._advance_prefix()
+        if not self._seen:
+            self._gap_since = None
+        elif self._gap_since is None:
+            self._gap_since = now
+        elif now - self._gap_since >= self.gap_timeout:
+            for event_id in range(self.cursor + 1, min(self._seen)):
+                self._unresolved[event_id] = now
+            self.cursor = min(self._seen) - 1
+            self._gap_since = None
+            self._advance(now)
+        for event_id, skipped_at in list(self._unresolved.items()):
+            if now - skipped_at >= self.retention:
+                # Событие с таким ID уже было бы удалено очисткой outbox
+                del self._unresolved[event_id]
+                self.lost += 1
+
+    async def poll(self) -> int:
+        """
+        Чтение и доставка новых событий.
+
+        При первом вызове курсор устанавливается на последнее событие:
+        события, записанные до запуска процесса, не рассылаются. Пока есть пропуски,
+        перед чтением берется снимок транзакций, а пропущенные курсором ID перечитываются.
+
+        Returns:
+            int: Количество переданных событий
+
+        """
+        async with write_session() as db:
+            repo = OutboxRepository(db)
+            if self.cursor is None:
+                self.cursor = self._top = await repo.last_id()
+                return 0
+            top = self._top
+            snapshot = await repo.snapshot() if self._seen or self._unresolved else None
+            events = await repo.get_after(self.cursor, self.batch_size)
+            late = await repo.get_by_ids(sorted(self._unresolved)) if self._unresolved else []
+        delivered = await self.dispatch([*late, *events])
+        if snapshot is not None:
+            self.settle(top, snapshot, events[-1].id if len(events) == self.batch_size else None)
+        if delivered and len(events) == self.batch_size:
+            # Прочитана полная пачка: продолжение без ожидания уведомления
+            self._wakeup.set()
+        return delivered
+
+    async def cleanup(self) -> int:
+        """Удаление событий старше срока хранения (возвращает число удаленных)."""
+        moment = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=self.retention)
+        async with write_session() as db:
+            deleted = await OutboxRepository(db).delete_before(moment)
+            await db.commit()
+        return deleted
+
+    async def _listen(self) -> None:
+        """Подключение слушателя канала на отдельном соединении."""
+        dsn = write_engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+        try:
+            self._listener = await asyncpg.connect(dsn)
+            await self._listener.add_listener(self.channel, self.notify)
+        except Exception:  # noqa: BLE001
+            if not self._listen_failed:
+                logger.warning('Outbox listener is unavailable, falling back to polling', exc_info=True)
+            self._listen_failed = True
+            self._listener = None
+        else:
+            self._listen_failed = False
+
+    async def _run(self) -> None:
+        while True:
+            if self._listener is None or self._listener.is_closed():
+                await self._listen()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except TimeoutError:
+                self.polls += 1
+            self._wakeup.clear()
+            if self._stopping:
+                return
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception('Outbox poll failed')
+
+    def stats(self) -> dict:
+        """
+        Курсор, число доставленных событий, уведомлений и опросов по таймауту.
+
+        rolled_back - пропуски откаченных транзакций, late - события, доставленные
+        после пропуска курсором, lost - пропуски, не разрешившиеся за срок хранения.
+        """
+        return {
+            'cursor': self.cursor,
+            'listening': self._listener is not None and not self._listener.is_closed(),
+            'dispatched': self.dispatched,
+            'ahead_of_cursor': len(self._seen),
+            'unresolved': len(self._unresolved),
+            'rolled_back': self.rolled_back,
+            'late': self.late,
+            'lost': self.lost,
+            'notifications': self.notifications,
+            'polls': self.polls,
+        }
@@ -0,0 +1,151 @@
+"""
+Реестр WebSocket-подключений.
+Хранит несколько одновременных подключений пользователя (по одному на устройство)
+и состояние доставки для каждого из них.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import deque
+
+from fastapi import WebSocket
+
+
+class Connection:
+    """
+    Подключение одного устройства пользователя.
+
+    Запись объявлена через __slots__: при сотнях тысяч подключений
+    отсутствие __dict__ у каждого экземпляра заметно экономит память.
+    """
+
+    __slots__ = (
+        'awaiting_pong',
+        'chats',
+        'connected_at',
+        'delivered',
+        'device_id',
+        'failed',
+        'last_delivered_at',
+        'outgoing',
+        'user_id',
+        'websocket',
+        'writer',
+    )
+
+    def __init__(self, user_id: int, websocket: WebSocket, device_id: str | None = None):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.device_id = device_id or uuid.uuid4().hex
+        self.chats: set[int] = set()
+        self.connected_at = time.time()
+        self.delivered = 0
+        self.failed = 0
+        self.last_delivered_at: float | None = None
+        self.awaiting_pong = False
+        # Очередь рассылаемых сообщений и задача, отправляющая ее в сокет (есть, пока очередь не пуста)
+        self.outgoing: deque[str] = deque()
+        self.writer: asyncio.Task | None = None
+
+    async def send(self, message: str) -> None:
+        """Отправка текстового фрейма в сокет с учетом состояния доставки."""
+        try:
+            await self.websocket.send_text(message)
+        except Exception:
+            self.failed += 1
+            raise
+        self.delivered += 1
+        self.last_delivered_at = time.time()
+
+    @property
+    def origin(self) -> str:
+        """Ключ устройства для событий outbox: по нему источник события исключается из рассылки."""
+        return f'{self.user_id}:{self.device_id}'
+
+    def state(self) -> dict:
+        """Состояние доставки устройства."""
+        return {
+            'device_id': self.device_id,
+            'chats': sorted(self.chats),
+            'connected_at': self.connected_at,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'last_delivered_at': self.last_delivered_at,
+            'queued': len(self.outgoing),
+        }
+
+
+class ConnectionRegistry:
+    """
+    Подключения пользователей по устройствам {user_id: {device_id: Connection}}.
+
+    Регистрация и удаление выполняются за O(1). Повторное подключение
+    с тем же device_id заменяет прежнее подключение устройства.
+    """
+
+    def __init__(self):
+        self._users: dict[int, dict[str, Connection]] = {}
+        self._count = 0
+
+    def register(self, connection: Connection) -> Connection | None:
+        """
+        Регистрация подключения.
+
+        Args:
+            connection: Подключение
+
+        Returns:
+            Connection | None: Замененное подключение того же устройства, если оно было
+
+        """
+        devices = self._users.setdefault(connection.user_id, {})
+        replaced = devices.get(connection.device_id)
+        devices[connection.device_id] = connection
+        if replaced is None:
+            self._count += 1
+        return replaced
+
+    def unregister(self, connection: Connection) -> bool:
+        """
+        Удаление подключения.
+
+        Подключение, уже замененное более новым с того же устройства, не удаляет новое.
+
+        Args:
+            connection: Подключение
+
+        Returns:
+            bool: True, если подключение было зарегистрировано
+
+        """
+        devices = self._users.get(connection.user_id)
+        if devices is None or devices.get(connection.device_id) is not connection:
+            return False
+        del devices[connection.device_id]
+        if not devices:
+            del self._users[connection.user_id]
+        self._count -= 1
+        return True
+
+    def devices(self, user_id: int) -> list[Connection]:
+        """Подключения всех устройств пользователя."""
+        devices = self._users.get(user_id)
+        return list(devices.values()) if devices else []
+
+    def get(self, user_id: int, device_id: str) -> Connection | None:
+        """Подключение устройства пользователя."""
+        return self._users.get(user_id, {}).get(device_id)
+
+    def is_online(self, user_id: int) -> bool:
+        """Есть ли у пользователя хотя бы одно подключение."""
+        return user_id in self._users
+
+    @property
+    def user_count(self) -> int:
+        """Количество подключенных пользователей."""
+        return len(self._users)
+
+    def __len__(self) -> int:
+        """Количество подключений."""
+        return self._count
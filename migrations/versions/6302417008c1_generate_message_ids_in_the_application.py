@@ -0,0 +1,38 @@
+"""Generate message ids in the application
+
+Revision ID: 6302417008c1
+Revises: 54d446f3d69b
+Create Date: 2026-10-19 08:37:51.714090
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6302417008c1'
+down_revision = '54d446f3d69b'
+
+
+def upgrade() -> None:
+    # Идентификаторы сообщений генерируются приложением (app.core.snowflake)
+    op.execute('ALTER TABLE messages ALTER COLUMN id DROP IDENTITY')
+    op.alter_column('messages', 'id',
+               existing_type=sa.INTEGER(),
+               type_=sa.BigInteger(),
+               comment='Уникальный идентификатор сообщения (Snowflake: возрастает со временем создания)',
+               existing_comment='Уникальный идентификатор сообщения',
+               existing_nullable=False)
+
+
+def downgrade() -> None:
+    # Тип остается BIGINT: выданные приложением идентификаторы не помещаются в INTEGER
+    op.alter_column('messages', 'id',
+               existing_type=sa.BigInteger(),
+               comment='Уникальный идентификатор сообщения',
+               existing_comment='Уникальный идентификатор сообщения (Snowflake: возрастает со временем создания)',
+               existing_nullable=False)
+    op.execute('ALTER TABLE messages ALTER COLUMN id ADD GENERATED ALWAYS AS IDENTITY')
+    op.execute("SELECT setval(pg_get_serial_sequence('messages', 'id'), coalesce(max(id), 0) + 1, false) FROM messages")
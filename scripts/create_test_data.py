@@ -35,7 +35,9 @@ async def create_test_data():
         for i in range(1, 5):
             chat = Chat(
                 name=f"Личный чат {i}-{i+1}",
-                is_group=False
+                is_group=False,
+                user_low_id=i,
+                user_high_id=i+1
             )
             session.add(chat)
             await session.commit()
@@ -53,10 +55,12 @@ async def create_test_data():
                 message = Message(
                     chat_id=chat.id,
                     sender_id=i if j % 2 == 0 else i+1,
+                    seq=j+1,
                     text=f"Тестовое сообщение {j+1} в чате {chat.id}"
                 )
                 session.add(message)
                 messages.append(message)
+            chat.last_seq = len(messages)
             await session.commit()
 
         print("\nСозданные личные чаты:")
@@ -87,10 +91,12 @@ async def create_test_data():
             message = Message(
                 chat_id=group_chat.id,
                 sender_id=i,
+                seq=i,
                 text=f"Сообщение в группе от пользователя {i}"
             )
             session.add(message)
             group_messages.append(message)
+        group_chat.last_seq = len(group_messages)
         await session.commit()
 
         print("\nСозданный групповой чат:")
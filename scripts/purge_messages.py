@@ -0,0 +1,30 @@
+"""Однократное удаление сообщений старше срока хранения (например, из cron вместо фоновой задачи)."""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Корень проекта добавляется в путь до импорта приложения: скрипт запускается как python scripts/purge_messages.py
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+from app.config import settings  # noqa: E402
+from app.services.retention import MessageRetention  # noqa: E402
+
+
+async def purge_messages(retention_days: int | None, batch_size: int, batch_pause: float):
+    """Удаление сообщений по общему сроку и срокам чатов."""
+    retention = MessageRetention(retention_days=retention_days, batch_size=batch_size, batch_pause=batch_pause)
+    deleted = await retention.purge()
+    stats = retention.stats()
+    print(f"Удалено сообщений: {deleted} (пачек: {stats['batches']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=settings.retention.message_retention_days,
+                        help="Общий срок хранения в днях (по умолчанию MESSAGE_RETENTION_DAYS)")
+    parser.add_argument("--batch-size", type=int, default=settings.retention.retention_batch_size)
+    parser.add_argument("--batch-pause", type=float, default=settings.retention.retention_batch_pause)
+    args = parser.parse_args()
+    asyncio.run(purge_messages(args.days, args.batch_size, args.batch_pause))
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from tests.integration.seed import seed
+
+TEST_DSN = os.getenv('TEST_DATABASE_DSN')
+
+
+@pytest_asyncio.fixture(scope='session', loop_scope='session')
+async def engine():
+    """Отдельная БД, пересоздаваемая и наполняемая один раз на все интеграционные тесты."""
+    if not TEST_DSN:
+        pytest.skip('TEST_DATABASE_DSN не задан')
+    if settings.database.database_dsn == TEST_DSN:
+        pytest.fail('TEST_DATABASE_DSN должен указывать на отдельную БД: она пересоздается')
+    engine = create_async_engine(TEST_DSN, poolclass=NullPool)
+    await seed(engine)
+    yield engine
+    await engine.dispose()
@@ -0,0 +1,132 @@
+"""
+Сбор и проверка планов запросов репозиториев.
+Каждый запрос, отправленный в БД, перед выполнением повторяется как
+EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) в точке сохранения, которая затем откатывается,
+поэтому запросы на изменение не применяются дважды.
+"""
+
+import json
+from collections.abc import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+EXPLAIN = 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) '
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+# Таблицы, полный просмотр которых на реальных объемах недопустим
+LARGE_TABLES = frozenset({
+    'users', 'chats', 'user_chats', 'groups', 'messages', 'inbox_entries', 'outbox_events', 'sessions',
+})
+SORT_NODES = frozenset({'Sort', 'Incremental Sort'})
+
+
+class Plan:
+    """План одного запроса (вывод EXPLAIN в формате JSON)."""
+
+    def __init__(self, statement: str, explain: dict):
+        self.statement = statement
+        self.root = explain['Plan']
+
+    def nodes(self) -> Iterator[dict]:
+        """Все узлы плана в порядке обхода в глубину."""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.get('Plans', [])))
+
+    @property
+    def node_types(self) -> set[str]:
+        """Типы узлов плана."""
+        return {node['Node Type'] for node in self.nodes()}
+
+    @property
+    def indexes(self) -> set[str]:
+        """Индексы, по которым читает план."""
+        return {node['Index Name'] for node in self.nodes() if 'Index Name' in node}
+
+    @property
+    def seq_scans(self) -> set[str]:
+        """Таблицы, которые план просматривает целиком."""
+        return {node['Relation Name'] for node in self.nodes() if node['Node Type'] == 'Seq Scan'}
+
+    @property
+    def buffers(self) -> int:
+        """Прочитанные страницы (из кэша и с диска) всего запроса."""
+        return self.root.get('Shared Hit Blocks', 0) + self.root.get('Shared Read Blocks', 0)
+
+    def __str__(self) -> str:
+        """Запрос и дерево плана для сообщений об ошибках."""
+        lines = [' '.join(self.statement.split())]
+        depth = {id(self.root): 0}
+        for node in self.nodes():
+            level = depth[id(node)]
+            for child in node.get('Plans', []):
+                depth[id(child)] = level + 1
+            target = ' '.join(
+                f'{key.split()[0].lower()}={node[key]}' for key in ('Relation Name', 'Index Name') if key in node
+            )
+            buffers = node.get('Shared Hit Blocks', 0) + node.get('Shared Read Blocks', 0)
+            lines.append(
+                f"{'  ' * level}-> {node['Node Type']} {target} rows={node.get('Actual Rows')} buffers={buffers}"
+            )
+        return '\n'.join(lines)
+
+
+class PlanCapture:
+    """Перехват запросов движка на время блока with: планы собираются в plans."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine.sync_engine
+        self.plans: list[Plan] = []
+
+    def __enter__(self) -> 'PlanCapture':
+        """Подписка на выполнение запросов движка."""
+        event.listen(self.engine, 'before_cursor_execute', self._explain)
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        """Отписка от выполнения запросов."""
+        event.remove(self.engine, 'before_cursor_execute', self._explain)
+
+    def _explain(self, _conn, cursor, statement, parameters, _context, executemany) -> None:
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return
+        if executemany:
+            parameters = parameters[0]
+        cursor.execute('SAVEPOINT plan_capture')
+        cursor.execute(EXPLAIN + statement, parameters)
+        result = cursor.fetchone()[0]
+        # asyncpg декодирует json сам, другие драйверы возвращают строку
+        [explain] = json.loads(result) if isinstance(result, str) else result
+        cursor.execute('ROLLBACK TO SAVEPOINT plan_capture')
+        self.plans.append(Plan(statement, explain))
+
+
+def check_plan(
+        plan: Plan,
+        *,
+        max_buffers: int,
+        indexes: tuple[str, ...] = (),
+        sort: bool = False,
+        seq_scans: tuple[str, ...] = ()
+) -> None:
+    """
+    Проверка формы плана и бюджета чтения страниц.
+
+    Args:
+        plan: План запроса
+        max_buffers: Максимум прочитанных страниц
+        indexes: Индексы, которые должен использовать план
+        sort: Допустим ли узел сортировки (по умолчанию порядок должен давать индекс)
+        seq_scans: Большие таблицы, полный просмотр которых допустим
+
+    """
+    unexpected_scans = plan.seq_scans & LARGE_TABLES - set(seq_scans)
+    assert not unexpected_scans, f'Seq Scan по {sorted(unexpected_scans)}:\n{plan}'
+    missing = set(indexes) - plan.indexes
+    assert not missing, f'План не использует {sorted(missing)}:\n{plan}'
+    if not sort:
+        assert not plan.node_types & SORT_NODES, f'Сортировка вместо порядка индекса:\n{plan}'
+    assert plan.buffers <= max_buffers, f'Прочитано {plan.buffers} страниц (бюджет {max_buffers}):\n{plan}'
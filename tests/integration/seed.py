@@ -0,0 +1,131 @@
+"""
+Наполнение тестовой БД объемами, при которых планировщик выбирает реальные планы.
+Данные генерируются на стороне сервера (generate_series); PLAN_TEST_SCALE умножает объемы.
+"""
+
+import os
+
+from sqlalchemy import BigInteger, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import app.db.models  # noqa: F401
+from app.db.session import Base
+
+SCALE = int(os.getenv('PLAN_TEST_SCALE', '1'))
+USERS = 50_000
+GROUPS = 2_000
+GROUP_MEMBERS = 30
+LARGE_GROUPS = 10
+LARGE_GROUP_MEMBERS = 2_000
+MESSAGES = 1_000_000
+OUTBOX_EVENTS = 100_000
+TRIGRAM_INDEX = 'ix_users_username_trgm'
+
+SEED = """
+INSERT INTO users (id, username, email, hashed_password) OVERRIDING SYSTEM VALUE
+SELECT g, substr(md5(g::text), 1, 6) || g, 'user' || g || '@example.com', 'x'
+FROM generate_series(1, :users) g;
+
+-- Личный чат i - пара пользователей (i, i + 1)
+INSERT INTO chats (id, name, is_group, user_low_id, user_high_id) OVERRIDING SYSTEM VALUE
+SELECT g, 'Personal Chat ' || g, false, least(g, g % :users + 1), greatest(g, g % :users + 1)
+FROM generate_series(1, :users) g;
+
+INSERT INTO user_chats (user_id, chat_id)
+SELECT u, c.id FROM chats c, LATERAL (VALUES (c.user_low_id), (c.user_high_id)) AS m(u);
+
+INSERT INTO chats (id, name, is_group) OVERRIDING SYSTEM VALUE
+SELECT :users + g, 'Group ' || g, true FROM generate_series(1, :groups + :large_groups) g;
+
+INSERT INTO groups (chat_id, name, creator_id, members)
+SELECT :users + g, 'Group ' || g, (g * 31) % :users + 1,
+       (SELECT jsonb_agg((g * 31 + k) % :users + 1 ORDER BY k)
+        FROM generate_series(0, CASE WHEN g > :groups THEN :large_group_members ELSE :group_members END - 1) k)
+FROM generate_series(1, :groups + :large_groups) g;
+
+-- Каждое пятое сообщение - в группе, остальные - в личных чатах; ID растут со временем отправки
+INSERT INTO messages (id, chat_id, sender_id, seq, text, client_message_id, is_read, created_at)
+SELECT g * 4096, chat_id, sender_id,
+       row_number() OVER (PARTITION BY chat_id ORDER BY g),
+       'message ' || g, 'm' || g, g < :messages * 0.95,
+       now() - (:messages - g) * interval '1 second'
+FROM (
+    SELECT g,
+           CASE WHEN g % 5 = 0 THEN :users + 1 + (g / 5) % (:groups + :large_groups)
+                ELSE 1 + (g * 7919) % :users END AS chat_id,
+           CASE WHEN g % 5 = 0 THEN ((:users + 1 + (g / 5) % (:groups + :large_groups) - :users) * 31) % :users + 1
+                ELSE 1 + (g * 7919) % :users END AS sender_id
+    FROM generate_series(1, :messages) g
+) m;
+
+UPDATE chats c SET last_seq = m.last_seq, version = m.last_seq
+FROM (SELECT chat_id, max(seq) AS last_seq FROM messages GROUP BY chat_id) m
+WHERE m.chat_id = c.id;
+
+UPDATE chats SET retention_days = 30 WHERE id % 100 = 0;
+
+INSERT INTO inbox_entries (user_id, message_id, chat_id, is_read)
+SELECT CASE WHEN m.sender_id = c.user_low_id THEN c.user_high_id ELSE c.user_low_id END, m.id, m.chat_id, m.is_read
+FROM messages m JOIN chats c ON c.id = m.chat_id
+WHERE NOT c.is_group;
+
+INSERT INTO outbox_events (chat_id, payload, created_at)
+SELECT 1 + g % :users, '{"type": "message"}', now() - (:outbox_events - g) * interval '70 milliseconds'
+FROM generate_series(1, :outbox_events) g;
+
+INSERT INTO sessions (user_id, jti, expires_at, revoked_at)
+SELECT 1 + g % :users, md5(g::text), now() + interval '30 days', CASE WHEN g % 2 = 0 THEN now() END
+FROM generate_series(1, :users * 2) g;
+
+INSERT INTO retention_checkpoints (name, position) VALUES ('messages', 4096);
+
+SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT max(id) FROM users));
+SELECT setval(pg_get_serial_sequence('chats', 'id'), (SELECT max(id) FROM chats));
+"""
+
+
+async def seed(engine: AsyncEngine, scale: int = SCALE) -> bool:
+    """
+    Пересоздание схемы и наполнение БД.
+
+    Returns:
+        bool: Доступно ли расширение pg_trgm (без него индекс нечеткого поиска не создается)
+
+    """
+    params = {
+        'users': USERS * scale,
+        'groups': GROUPS * scale,
+        'group_members': GROUP_MEMBERS,
+        'large_groups': LARGE_GROUPS,
+        'large_group_members': LARGE_GROUP_MEMBERS,
+        'messages': MESSAGES * scale,
+        'outbox_events': OUTBOX_EVENTS * scale,
+    }
+    async with engine.begin() as conn:
+        trigram = await conn.scalar(text("SELECT count(*) FROM pg_available_extensions WHERE name = 'pg_trgm'"))
+        if trigram:
+            await conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        await conn.run_sync(Base.metadata.drop_all)
+        # Без pg_trgm схема создается без индекса нечеткого поиска
+        users = Base.metadata.tables['users']
+        skipped = set() if trigram else {index for index in users.indexes if index.name == TRIGRAM_INDEX}
+        users.indexes.difference_update(skipped)
+        try:
+            await conn.run_sync(Base.metadata.create_all)
+        finally:
+            users.indexes.update(skipped)
+        for statement in SEED.split(';\n'):
+            if statement.strip():
+                # Типы параметров задаются явно: в выражениях вида :users + g asyncpg их не выводит
+                query = text(statement).bindparams(
+                    *(bindparam(name, type_=BigInteger) for name in params if f':{name}' in statement)
+                )
+                await conn.execute(query, {name: value for name, value in params.items() if f':{name}' in statement})
+
+    autocommit = await engine.connect()
+    try:
+        await autocommit.execution_options(isolation_level='AUTOCOMMIT')
+        await autocommit.execute(text('VACUUM ANALYZE'))
+    finally:
+        await autocommit.close()
+    return bool(trigram)
@@ -0,0 +1,163 @@
+"""
+Проверка бюджетов запросов к БД маршрутов API и фреймов WebSocket.
+
+Запросы выполняются через приложение к наполненной тестовой БД в строгом режиме:
+превышение бюджета, объявленного маршрутом (QueryBudget) или типом фрейма
+(FRAME_QUERY_BUDGETS), вызывает QueryBudgetExceededError. Используются пользователи и чаты,
+не задействованные в проверках планов запросов.
+"""
+
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import app.api.websocket
+import app.db.session
+from app.config import settings
+from app.core.http_cache import response_cache
+from app.core.query_budget import count_queries
+from app.core.security import create_access_token
+from app.core.snowflake import message_ids
+from app.main import app as application
+from app.schemas import TokenData
+from app.websocket.manager import ConnectionManager
+from tests.integration.seed import SCALE, USERS
+
+pytestmark = pytest.mark.asyncio(loop_scope='session')
+
+# Пользователь 1000 - участник личных чатов 999 и 1000 и группы 32 (участники 993-1022)
+USER_ID = 1_000
+PERSONAL_CHAT_ID = 1_000
+GROUP_ID = 32
+GROUP_CHAT_ID = USERS * SCALE + GROUP_ID
+OUTSIDER_ID = 2_000
+
+
+@pytest_asyncio.fixture(scope='module', loop_scope='session')
+async def client(engine):
+    session_factory = sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(app.db.session, 'write_session', session_factory)
+        patch.setattr(app.api.websocket, 'write_session', session_factory)
+        patch.setattr(settings.query_budget, 'query_budget_strict', True)
+        # Клиент не выполняет lifespan приложения, где назначается ID процесса
+        patch.setattr(message_ids, 'worker_id', 0)
+        async with AsyncClient(transport=ASGITransport(app=application), base_url='http://test') as client:
+            yield client
+
+
+@pytest.fixture(autouse=True)
+def _cold_cache():
+    # Бюджет рассчитан на запрос без попадания в кэш ответов
+    response_cache.clear()
+
+
+def auth(user_id: int = USER_ID) -> dict:
+    return {'Authorization': f'Bearer {create_access_token(TokenData(user_id=str(user_id)))}'}
+
+
+async def call(client, method: str, url: str, user_id: int | None = USER_ID, **kwargs):
+    headers = auth(user_id) if user_id is not None else {}
+    with count_queries() as stats:
+        response = await client.request(method, f'/api/v1{url}', headers=headers, **kwargs)
+    assert stats.statements, 'Запрос не обратился к БД'
+    return response
+
+
+async def test_auth_flow(client):
+    credentials = {'username': 'budget_user', 'email': 'budget_user@example.com', 'password': 'password123'}
+    response = await call(client, 'POST', '/auth/register', user_id=None, json=credentials)
+    assert response.status_code == 201
+
+    form = {'username': credentials['username'], 'password': credentials['password']}
+    response = await call(client, 'POST', '/auth/token', user_id=None, data=form)
+    assert response.status_code == 200
+    refresh_token = response.json()['refresh_token']
+
+    response = await call(client, 'POST', '/auth/refresh', user_id=None, json={'refresh_token': refresh_token})
+    assert response.status_code == 200
+    refresh_token = response.json()['refresh_token']
+
+    response = await call(client, 'POST', '/auth/logout', user_id=None, json={'refresh_token': refresh_token})
+    assert response.status_code == 204
+
+
+async def test_search_users(client):
+    response = await call(client, 'GET', '/users/search', params={'q': 'ab'})
+    assert response.status_code == 200
+
+
+async def test_chats(client):
+    response = await call(client, 'POST', '/chats/', json={'user_id': USER_ID + 5})
+    assert response.status_code == 201
+    response = await call(client, 'PUT', f'/chats/{PERSONAL_CHAT_ID}/retention', json={'retention_days': None})
+    assert response.status_code == 200
+    # Срок хранения группы меняет только ее создатель (пользователь 993)
+    response = await call(client, 'PUT', f'/chats/{GROUP_CHAT_ID}/retention', json={'retention_days': 7})
+    assert response.status_code == 403
+
+
+async def test_messages(client):
+    response = await call(client, 'POST', f'/messages/{PERSONAL_CHAT_ID}/send', json={'text': 'budget'})
+    assert response.status_code == 201
+    # С ключом идемпотентности перед выдачей номера ищется повтор
+    message = {'text': 'budget', 'client_message_id': 'budget-rest'}
+    response = await call(client, 'POST', f'/messages/{PERSONAL_CHAT_ID}/send', json=message)
+    assert response.status_code == 201
+    response = await call(client, 'GET', f'/messages/history/{GROUP_CHAT_ID}', params={'include_sender': True})
+    assert response.status_code == 200
+    response = await call(client, 'POST', '/messages/sync', json={'chats': {PERSONAL_CHAT_ID: 0, GROUP_CHAT_ID: 10}})
+    assert response.status_code == 200
+    response = await call(client, 'GET', '/messages/inbox', params={'include_sender': True})
+    assert response.status_code == 200
+    response = await call(client, 'GET', '/messages/unread')
+    assert response.status_code == 200
+
+
+async def test_groups(client):
+    response = await call(client, 'POST', '/groups/', json={'name': 'Budget'})
+    assert response.status_code == 201
+    response = await call(client, 'GET', '/groups/')
+    assert response.status_code == 200
+    response = await call(client, 'GET', f'/groups/{GROUP_ID}')
+    assert response.status_code == 200
+    response = await call(client, 'GET', f'/groups/{GROUP_ID}/members')
+    assert response.status_code == 200
+    response = await call(client, 'POST', f'/groups/{GROUP_ID}/members/{OUTSIDER_ID}')
+    assert response.status_code == 204
+    response = await call(client, 'POST', f'/groups/{GROUP_ID}/members', json={'user_ids': [OUTSIDER_ID + 1]})
+    assert response.status_code == 200
+    response = await call(client, 'DELETE', f'/groups/{GROUP_ID}/members/{OUTSIDER_ID}')
+    assert response.status_code == 204
+
+
+async def test_group_access_denied(client):
+    response = await call(client, 'GET', f'/groups/{GROUP_ID}', user_id=OUTSIDER_ID + 2)
+    assert response.status_code == 403
+
+
+@pytest.mark.usefixtures('client')
+async def test_websocket_frames(engine):
+    manager = ConnectionManager()
+    connection = await manager.connect(USER_ID, AsyncMock())
+    async with engine.connect() as conn:
+        message_id = await conn.scalar(
+            text('SELECT max(id) FROM messages WHERE chat_id = :chat_id'), {'chat_id': PERSONAL_CHAT_ID}
+        )
+    frames = [
+        {'type': 'subscribe', 'chat_id': PERSONAL_CHAT_ID},
+        {'type': 'message', 'chat_id': PERSONAL_CHAT_ID, 'text': 'budget', 'client_message_id': 'budget-1'},
+        {'type': 'message', 'chat_id': PERSONAL_CHAT_ID, 'text': 'budget', 'client_message_id': 'budget-1'},
+        {'type': 'read', 'chat_id': PERSONAL_CHAT_ID, 'message_id': message_id},
+    ]
+    for frame in frames:
+        async with app.api.websocket.frame_message_service() as message_service:
+            await manager.handle_message(connection, json.dumps(frame), message_service)
+        sent = json.loads(connection.websocket.send_text.await_args.args[0])
+        assert 'error' not in sent, sent
@@ -0,0 +1,469 @@
+"""
+Регрессионные проверки планов запросов репозиториев.
+
+Запускаются на отдельной БД PostgreSQL (TEST_DATABASE_DSN), которая пересоздается
+и наполняется данными (PLAN_TEST_SCALE умножает объемы). Для каждого метода
+репозитория проверяется план каждого его запроса: используемые индексы, отсутствие
+сортировки там, где порядок дает индекс, и бюджет прочитанных страниц.
+"""
+
+import datetime
+import hashlib
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Message
+from app.db.repositories import (
+    ChatRepository,
+    GroupRepository,
+    InboxRepository,
+    MessageRepository,
+    OutboxRepository,
+    RetentionRepository,
+    SessionRepository,
+    UserRepository,
+)
+from tests.integration.plans import Plan, PlanCapture, check_plan
+from tests.integration.seed import GROUPS, MESSAGES, OUTBOX_EVENTS, SCALE, USERS
+
+pytestmark = pytest.mark.asyncio(loop_scope='session')
+
+USER_ID = 42
+# Личный чат 42 - пара пользователей (42, 43); пользователь 42 состоит в группе 1
+PERSONAL_CHAT_ID = 42
+GROUP_ID = 1
+GROUP_CHAT_ID = USERS * SCALE + GROUP_ID
+# Пользователь первой большой группы (участники - 2000 ID подряд)
+LARGE_GROUP_USER_ID = ((GROUPS * SCALE + 1) * 31) % (USERS * SCALE) + 1
+MIDDLE_MESSAGE_ID = MESSAGES * SCALE // 2 * 4096
+# Группа 100 - чат с собственным сроком хранения (срок задан чатам с ID, кратным 100)
+RETENTION_CHAT_ID = USERS * SCALE + 100
+USERNAME = hashlib.md5(str(USER_ID).encode()).hexdigest()[:6] + str(USER_ID)  # noqa: S324
+
+
+@pytest.fixture
+def explain(engine):
+    """Выполнение вызова репозитория в откатываемой транзакции со сбором планов всех запросов."""
+
+    async def run(call) -> list[Plan]:
+        async with AsyncSession(engine) as session:
+            with PlanCapture(engine) as capture:
+                await call(session)
+            await session.rollback()
+        assert capture.plans, 'Вызов не выполнил ни одного запроса'
+        return capture.plans
+
+    return run
+
+
+# Базовый репозиторий
+
+
+async def test_get(explain):
+    [plan] = await explain(lambda s: UserRepository(s).get(USER_ID))
+    check_plan(plan, max_buffers=8)
+
+
+async def test_get_many(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).get_many(range(1, 101)))
+    check_plan(plan, max_buffers=500)
+
+
+async def test_load_many(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).load_many([1, 2, 3]))
+    check_plan(plan, max_buffers=20)
+
+
+async def test_create(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).create_chat('Plan'))
+    check_plan(plan, max_buffers=150)
+
+
+async def test_update(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).update(PERSONAL_CHAT_ID, {'name': 'Renamed'}))
+    check_plan(plan, max_buffers=50)
+
+
+async def test_delete(explain):
+    [plan] = await explain(lambda s: SessionRepository(s).delete(10))
+    check_plan(plan, max_buffers=20)
+
+
+# Пользователи
+
+
+async def test_get_by_username(explain):
+    [plan] = await explain(lambda s: UserRepository(s).get_by_username(USERNAME))
+    check_plan(plan, indexes=('ix_users_username',), max_buffers=8)
+
+
+async def test_get_by_email(explain):
+    [plan] = await explain(lambda s: UserRepository(s).get_by_email(f'user{USER_ID}@example.com'))
+    check_plan(plan, indexes=('ix_users_email',), max_buffers=8)
+
+
+async def test_search_by_prefix(explain):
+    [plan] = await explain(lambda s: UserRepository(s).search_by_prefix('a', 20))
+    check_plan(plan, indexes=('ix_users_username_lower',), max_buffers=60)
+
+
+@pytest.mark.parametrize('prefix', ['ab', 'abc1'])
+async def test_search_by_selective_prefix(explain, prefix):
+    # Для избирательного префикса планировщик вправе выбрать bitmap-просмотр с сортировкой нескольких сотен строк
+    [plan] = await explain(lambda s: UserRepository(s).search_by_prefix(prefix, 20))
+    check_plan(plan, indexes=('ix_users_username_lower',), sort=True, max_buffers=400)
+
+
+async def test_search_similar(explain, engine):
+    async with engine.connect() as conn:
+        if not await conn.scalar(text("SELECT count(*) FROM pg_extension WHERE extname = 'pg_trgm'")):
+            pytest.skip('Расширение pg_trgm недоступно')
+    [plan] = await explain(lambda s: UserRepository(s).search_similar('abc123', 20, [1, 2]))
+    check_plan(plan, indexes=('ix_users_username_trgm',), sort=True, max_buffers=2_000)
+
+
+# Чаты
+
+
+async def test_user_has_access_personal(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).user_has_access(USER_ID, PERSONAL_CHAT_ID))
+    check_plan(plan, max_buffers=12)
+
+
+async def test_user_has_access_group(explain):
+    plans = await explain(lambda s: ChatRepository(s).user_has_access(USER_ID, GROUP_CHAT_ID))
+    for plan in plans:
+        check_plan(plan, max_buffers=12)
+
+
+@pytest.mark.parametrize('chat_id', [PERSONAL_CHAT_ID, GROUP_CHAT_ID])
+async def test_get_member_count(explain, chat_id):
+    [plan] = await explain(lambda s: ChatRepository(s).get_member_count(USER_ID, chat_id))
+    check_plan(plan, max_buffers=20)
+
+
+@pytest.mark.parametrize('chat_id', [PERSONAL_CHAT_ID, GROUP_CHAT_ID])
+async def test_is_owner(explain, chat_id):
+    [plan] = await explain(lambda s: ChatRepository(s).is_owner(USER_ID, chat_id))
+    check_plan(plan, max_buffers=20)
+
+
+async def test_get_accessible_chats(explain):
+    [plan] = await explain(
+        lambda s: ChatRepository(s).get_accessible_chats(USER_ID, [PERSONAL_CHAT_ID, GROUP_CHAT_ID, 7])
+    )
+    check_plan(plan, max_buffers=40)
+
+
+async def test_get_user_chats(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).get_user_chats(USER_ID))
+    check_plan(plan, indexes=('ix_user_chats_user_id',), max_buffers=20)
+
+
+async def test_add_user_to_chat(explain):
+    plans = await explain(lambda s: ChatRepository(s).add_user_to_chat(PERSONAL_CHAT_ID, 7))
+    for plan in plans:
+        check_plan(plan, max_buffers=150)
+
+
+async def test_add_users_to_chat(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).add_users_to_chat(PERSONAL_CHAT_ID, [7, 8]))
+    check_plan(plan, max_buffers=150)
+
+
+async def test_remove_user_from_chat(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).remove_user_from_chat(USER_ID, PERSONAL_CHAT_ID))
+    check_plan(plan, max_buffers=20)
+
+
+async def test_next_seq(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).next_seq(PERSONAL_CHAT_ID))
+    check_plan(plan, max_buffers=40)
+
+
+async def test_bump_version(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).bump_version(PERSONAL_CHAT_ID))
+    check_plan(plan, max_buffers=40)
+
+
+async def test_get_or_create_personal_chat(explain):
+    [plan] = await explain(lambda s: ChatRepository(s).get_or_create_personal_chat(USER_ID, 43, 'Personal'))
+    check_plan(plan, max_buffers=80)
+
+
+# Группы
+
+
+async def test_get_user_groups(explain):
+    [plan] = await explain(lambda s: GroupRepository(s).get_user_groups(USER_ID))
+    check_plan(plan, indexes=('ix_groups_members',), max_buffers=20)
+
+
+async def test_get_user_group_versions(explain):
+    [plan] = await explain(lambda s: GroupRepository(s).get_user_group_versions(USER_ID))
+    check_plan(plan, indexes=('ix_groups_members',), sort=True, max_buffers=20)
+
+
+async def test_is_member(explain):
+    [plan] = await explain(lambda s: GroupRepository(s).is_member(USER_ID, GROUP_ID))
+    check_plan(plan, max_buffers=12)
+
+
+async def test_add_members(explain):
+    [plan] = await explain(lambda s: GroupRepository(s).add_members(GROUP_ID, [7, 8, USER_ID]))
+    check_plan(plan, max_buffers=60)
+
+
+async def test_remove_member(explain):
+    plans = await explain(lambda s: GroupRepository(s).remove_member(GROUP_ID, USER_ID))
+    for plan in plans:
+        check_plan(plan, max_buffers=60)
+
+
+# Сообщения
+
+
+async def test_get_chat_history(explain):
+    [plan] = await explain(lambda s: MessageRepository(s).get_chat_messages(GROUP_CHAT_ID, limit=50))
+    check_plan(plan, indexes=('ix_messages_chat_id_seq',), max_buffers=30)
+
+
+async def test_get_chat_history_before_seq(explain):
+    [plan] = await explain(lambda s: MessageRepository(s).get_chat_messages(GROUP_CHAT_ID, limit=50, before_seq=60))
+    check_plan(plan, indexes=('ix_messages_chat_id_seq',), max_buffers=30)
+
+
+async def test_get_messages_after(explain):
+    cursors = {PERSONAL_CHAT_ID: 0, GROUP_CHAT_ID: 50, 7: 3}
+    [plan] = await explain(lambda s: MessageRepository(s).get_messages_after(cursors, 100))
+    check_plan(plan, indexes=('ix_messages_chat_id_seq',), sort=True, max_buffers=80)
+
+
+async def test_create_once(explain):
+    data = {
+        'id': MESSAGES * SCALE * 4096 + 1,
+        'chat_id': PERSONAL_CHAT_ID,
+        'sender_id': USER_ID,
+        'seq': 10_000,
+        'text': 'plan',
+        'client_message_id': 'plan-1',
+    }
+    [plan] = await explain(lambda s: MessageRepository(s).create_once(data))
+    check_plan(plan, max_buffers=80)
+
+
+async def test_create_once_duplicate(explain, engine):
+    async with engine.connect() as conn:
+        row = (await conn.execute(text('SELECT * FROM messages WHERE id = :id'), {'id': MIDDLE_MESSAGE_ID})).one()
+    data = {
+        'id': MESSAGES * SCALE * 4096 + 1,
+        'chat_id': row.chat_id,
+        'sender_id': row.sender_id,
+        'seq': 10_000,
+        'text': 'plan',
+        'client_message_id': row.client_message_id,
+    }
+    plans = await explain(lambda s: MessageRepository(s).create_once(data))
+    for plan in plans:
+        check_plan(plan, max_buffers=80)
+    check_plan(plans[-1], indexes=('ix_messages_client_message_id',), max_buffers=20)
+
+
+async def test_get_by_client_message_id(explain, engine):
+    async with engine.connect() as conn:
+        row = (await conn.execute(text('SELECT * FROM messages WHERE id = :id'), {'id': MIDDLE_MESSAGE_ID})).one()
+    [plan] = await explain(
+        lambda s: MessageRepository(s).get_by_client_message_id(row.chat_id, row.sender_id, row.client_message_id)
+    )
+    check_plan(plan, indexes=('ix_messages_client_message_id',), max_buffers=20)
+
+
+@pytest.mark.parametrize('chat_id', [None, PERSONAL_CHAT_ID])
+async def test_mark_as_read(explain, chat_id):
+    [plan] = await explain(lambda s: MessageRepository(s).mark_as_read(MIDDLE_MESSAGE_ID, chat_id))
+    check_plan(plan, max_buffers=80)
+
+
+# Входящие
+
+
+async def test_fan_out(explain, engine):
+    # Для сообщений групп входящие при наполнении не создаются, поэтому конфликтов ключа нет
+    async with engine.connect() as conn:
+        row = (await conn.execute(
+            text('SELECT id, sender_id FROM messages WHERE chat_id = :chat_id ORDER BY seq DESC LIMIT 1'),
+            {'chat_id': GROUP_CHAT_ID},
+        )).one()
+    message = Message(id=row.id, chat_id=GROUP_CHAT_ID, sender_id=row.sender_id)
+    [plan] = await explain(lambda s: InboxRepository(s).fan_out(message, 500))
+    check_plan(plan, sort=True, max_buffers=700)
+
+
+async def test_inbox_messages(explain):
+    [plan] = await explain(lambda s: InboxRepository(s).get_messages(USER_ID, 50))
+    check_plan(plan, indexes=('inbox_entries_pkey',), max_buffers=30)
+
+
+async def test_inbox_messages_before(explain):
+    [plan] = await explain(lambda s: InboxRepository(s).get_messages(USER_ID, 50, before_id=MIDDLE_MESSAGE_ID))
+    check_plan(plan, indexes=('inbox_entries_pkey',), max_buffers=30)
+
+
+async def test_unread_counts(explain):
+    [plan] = await explain(lambda s: InboxRepository(s).unread_counts(USER_ID))
+    check_plan(plan, sort=True, max_buffers=20)
+
+
+async def test_mark_read(explain):
+    [plan] = await explain(lambda s: InboxRepository(s).mark_read(USER_ID, PERSONAL_CHAT_ID, MIDDLE_MESSAGE_ID, 100))
+    check_plan(plan, max_buffers=20)
+
+
+async def test_large_group_chat_ids(explain):
+    [plan] = await explain(lambda s: InboxRepository(s).get_large_group_chat_ids(LARGE_GROUP_USER_ID, 500))
+    check_plan(plan, indexes=('ix_groups_members',), max_buffers=100)
+
+
+async def test_large_group_messages(explain):
+    chat_ids = [USERS * SCALE + GROUPS * SCALE + 1, USERS * SCALE + GROUPS * SCALE + 2]
+    [plan] = await explain(lambda s: InboxRepository(s).get_chat_messages(chat_ids, LARGE_GROUP_USER_ID, 50))
+    # Сообщения нескольких чатов упорядочиваются по ID общей сортировкой
+    check_plan(plan, sort=True, max_buffers=60)
+
+
+async def test_large_group_unread_counts(explain):
+    chat_ids = [USERS * SCALE + GROUPS * SCALE + 1, USERS * SCALE + GROUPS * SCALE + 2]
+    [plan] = await explain(lambda s: InboxRepository(s).unread_chat_counts(chat_ids, LARGE_GROUP_USER_ID, 1_000))
+    # Каждый чат читается диапазоном (chat_id, seq) не дальше limit строк
+    check_plan(plan, indexes=('ix_messages_chat_id_seq',), max_buffers=60)
+
+
+# Outbox
+
+
+async def test_outbox_add(explain):
+    [plan] = await explain(lambda s: OutboxRepository(s).add(PERSONAL_CHAT_ID, {'type': 'message'}, 'plan'))
+    check_plan(plan, max_buffers=150)
+
+
+@pytest.mark.parametrize('last_id', [0, OUTBOX_EVENTS * SCALE // 2, OUTBOX_EVENTS * SCALE - 500])
+async def test_outbox_get_after(explain, last_id):
+    # Пачка читается по первичному ключу с одинаковой стоимостью, как бы далеко ни отстал курсор
+    [plan] = await explain(lambda s: OutboxRepository(s).get_after(last_id, 500))
+    check_plan(plan, indexes=('outbox_events_pkey',), max_buffers=30)
+    assert not plan.seq_scans
+
+
+async def test_outbox_get_by_ids(explain):
+    event_ids = [OUTBOX_EVENTS * SCALE // 2 + i for i in range(0, 50, 7)]
+    [plan] = await explain(lambda s: OutboxRepository(s).get_by_ids(event_ids))
+    check_plan(plan, indexes=('outbox_events_pkey',), max_buffers=30)
+
+
+async def test_outbox_snapshot(explain):
+    [plan] = await explain(lambda s: OutboxRepository(s).snapshot())
+    check_plan(plan, max_buffers=0)
+
+
+async def test_outbox_last_id(explain):
+    [plan] = await explain(lambda s: OutboxRepository(s).last_id())
+    check_plan(plan, indexes=('outbox_events_pkey',), max_buffers=8)
+
+
+async def test_outbox_delete_before(explain, engine):
+    async with engine.connect() as conn:
+        oldest = await conn.scalar(text('SELECT min(created_at) FROM outbox_events'))
+    moment = oldest + datetime.timedelta(minutes=1)
+    [plan] = await explain(lambda s: OutboxRepository(s).delete_before(moment))
+    check_plan(plan, indexes=('ix_outbox_events_created_at',), max_buffers=2000)
+    assert not plan.seq_scans
+
+
+# Сессии
+
+
+async def test_create_session(explain):
+    expires_at = datetime.datetime.now(datetime.UTC) + datetime.timedelta(days=30)
+    [plan] = await explain(lambda s: SessionRepository(s).create_session(USER_ID, 'plan-jti', expires_at))
+    check_plan(plan, max_buffers=150)
+
+
+# Действующая, отозванная и несуществующая сессии
+@pytest.mark.parametrize('jti', [hashlib.md5(b'1').hexdigest(), hashlib.md5(b'2').hexdigest(), 'unknown'])  # noqa: S324
+async def test_consume_session(explain, jti):
+    [plan] = await explain(lambda s: SessionRepository(s).consume(jti))
+    check_plan(plan, indexes=('sessions_jti_key',), max_buffers=50)
+    assert not plan.seq_scans
+
+
+async def test_revoke_user_sessions(explain):
+    [plan] = await explain(lambda s: SessionRepository(s).revoke_user_sessions(USER_ID))
+    check_plan(plan, indexes=('ix_sessions_user_id',), max_buffers=80)
+    assert not plan.seq_scans
+
+
+# Удаление по сроку хранения
+
+
+async def test_retention_position(explain):
+    plans = await explain(lambda s: RetentionRepository(s).get_position('messages'))
+    plans += await explain(lambda s: RetentionRepository(s).save_position('messages', 8192))
+    for plan in plans:
+        check_plan(plan, max_buffers=30)
+
+
+async def test_retention_chat_policies(explain):
+    [plan] = await explain(lambda s: RetentionRepository(s).get_chat_policies())
+    check_plan(plan, indexes=('ix_chats_retention_days',), sort=True, max_buffers=60)
+    assert not plan.seq_scans
+
+
+@pytest.mark.parametrize('position', [0, MIDDLE_MESSAGE_ID])
+async def test_retention_global_batch(explain, position):
+    [plan] = await explain(lambda s: RetentionRepository(s).get_messages_after(position, 1_000))
+    check_plan(plan, indexes=('ix_messages_id',), max_buffers=2500)
+    assert not plan.seq_scans
+
+
+async def test_retention_chat_batch(explain):
+    [plan] = await explain(lambda s: RetentionRepository(s).get_messages_after(10, 1_000, chat_id=GROUP_CHAT_ID))
+    check_plan(plan, indexes=('ix_messages_chat_id_seq',), max_buffers=30)
+    assert not plan.seq_scans
+
+
+async def test_retention_delete(explain):
+    ids = [(MESSAGES * SCALE // 2 + i) * 4096 for i in range(100)]
+    [plan] = await explain(lambda s: RetentionRepository(s).delete_messages(ids))
+    check_plan(plan, indexes=('ix_messages_id',), max_buffers=2_000)
+    assert not plan.seq_scans
+
+
+async def test_retention_bump_versions(explain):
+    chat_ids = [PERSONAL_CHAT_ID, GROUP_CHAT_ID, RETENTION_CHAT_ID]
+    [plan] = await explain(lambda s: ChatRepository(s).bump_versions(chat_ids))
+    check_plan(plan, indexes=('ix_chats_id',), max_buffers=80)
+
+
+async def test_retention_chat_pass(explain):
+    """Пачка прохода по сроку чата - те же запросы, что выполняет MessageRetention.purge_pass."""
+    name = f'chat:{RETENTION_CHAT_ID}'
+
+    async def batch(session):
+        repo = RetentionRepository(session)
+        position = await repo.get_position(name)
+        rows = await repo.get_messages_after(position, 100, RETENTION_CHAT_ID)
+        assert rows
+        chat_ids = await repo.delete_messages([row.id for row in rows])
+        await ChatRepository(session).bump_versions(chat_ids)
+        await repo.save_position(name, rows[-1].position)
+
+    get_position, read, delete, bump, save = await explain(batch)
+    check_plan(get_position, max_buffers=10)
+    check_plan(read, indexes=('ix_messages_chat_id_seq',), max_buffers=30)
+    check_plan(delete, indexes=('ix_messages_id',), max_buffers=2_000)
+    check_plan(bump, indexes=('ix_chats_id',), max_buffers=40)
+    check_plan(save, max_buffers=30)
+    for plan in (read, delete, bump):
+        assert not plan.seq_scans
@@ -0,0 +1,41 @@
+from app.core.admission import AdmissionController, Priority
+
+
+def make_controller(**kwargs):
+    params = {"max_in_flight": 4, "read_share": 0.5, "wait_threshold": 0.5, "alpha": 1.0, "half_life": 5.0}
+    params.update(kwargs)
+    return AdmissionController(**params)
+
+
+def test_reads_are_rejected_before_writes():
+    """Чтение упирается в свою долю емкости, запись - в полную емкость."""
+    controller = make_controller()
+
+    assert controller.try_admit(Priority.LOW, now=0) is None
+    assert controller.try_admit(Priority.LOW, now=0) is None
+    assert controller.try_admit(Priority.LOW, now=0) is not None
+    assert controller.try_admit(Priority.HIGH, now=0) is None
+    assert controller.try_admit(Priority.HIGH, now=0) is None
+    assert controller.try_admit(Priority.HIGH, now=0) is not None
+    assert controller.stats()["rejected"] == {"low": 1, "high": 1}
+
+    controller.release()
+    assert controller.try_admit(Priority.HIGH, now=0) is None
+
+
+def test_slow_pool_rejects_reads_with_retry_after():
+    """Долгое ожидание пула отклоняет чтение раньше записи и задает Retry-After."""
+    controller = make_controller()
+    controller.observe_pool_wait(0.8, now=0)
+
+    assert controller.try_admit(Priority.LOW, now=0) == 2
+    assert controller.try_admit(Priority.HIGH, now=0) is None
+
+
+def test_pool_wait_decays_without_samples():
+    """Без новых замеров сглаженное ожидание затухает и допуск восстанавливается."""
+    controller = make_controller()
+    controller.observe_pool_wait(0.8, now=0)
+
+    assert controller.pool_wait(now=5) == 0.4
+    assert controller.try_admit(Priority.LOW, now=5) is None
@@ -0,0 +1,38 @@
+from unittest.mock import patch
+
+from app.core.cache import LRUCache
+
+
+def test_get_and_set():
+    """Сохраненное значение возвращается по ключу."""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+
+def test_least_recently_used_is_evicted():
+    """При переполнении вытесняется давно не использованная запись."""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_expired_entry_is_dropped():
+    """Просроченная запись не возвращается и удаляется из кэша."""
+    cache = LRUCache(maxsize=2, ttl=10)
+    with patch("app.core.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("app.core.cache.time.monotonic", return_value=105.0):
+        assert cache.get("a") == 1
+    with patch("app.core.cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is None
+    assert len(cache) == 0
@@ -5,7 +5,7 @@ from fastapi import HTTPException, status
 from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_operator, get_current_user
 from app.db.repositories.user import UserRepository
 
 
@@ -21,14 +21,14 @@ async def test_get_current_user_success(mock_db_session):
     user_id = 1
 
     mock_user_repo = AsyncMock(spec=UserRepository)
-    mock_user_repo.get = AsyncMock(return_value=MagicMock())
+    mock_user_repo.load = AsyncMock(return_value=MagicMock())
 
     with (patch('app.core.dependencies.UserRepository', return_value=mock_user_repo),
           patch('app.core.dependencies.jwt.decode', return_value={"user_id": str(user_id)})):
         result = await get_current_user(token=valid_token, db=mock_db_session)
 
         assert result == user_id
-        mock_user_repo.get.assert_called_once_with(user_id)
+        mock_user_repo.load.assert_called_once_with(user_id)
 
 
 @pytest.mark.asyncio
@@ -77,7 +77,7 @@ async def test_get_current_user_not_found(mock_db_session):
     user_id = 999
 
     mock_user_repo = AsyncMock(spec=UserRepository)
-    mock_user_repo.get = AsyncMock(return_value=None)
+    mock_user_repo.load = AsyncMock(return_value=None)
 
     with (patch('app.core.dependencies.UserRepository', return_value=mock_user_repo),
           patch('app.core.dependencies.jwt.decode', return_value={"user_id": str(user_id)})):
@@ -86,4 +86,27 @@ async def test_get_current_user_not_found(mock_db_session):
 
         assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
         assert exc_info.value.detail == "Пользователь не найден в БД"
-        mock_user_repo.get.assert_called_once_with(user_id)
+        mock_user_repo.load.assert_called_once_with(user_id)
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_refresh_token(mock_db_session):
+    """Refresh-токен не принимается в качестве access-токена."""
+    with patch('app.core.dependencies.jwt.decode', return_value={"user_id": "1", "type": "refresh"}):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_user(token="refresh.token", db=mock_db_session)
+
+        assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+        assert exc_info.value.detail == "Недействительный токен"
+
+
+@pytest.mark.asyncio
+async def test_get_current_operator():
+    """Служебная статистика доступна только пользователям из OPERATOR_IDS."""
+    with patch('app.core.dependencies.settings.auth.operator_ids', {1}):
+        assert await get_current_operator(user_id=1) == 1
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_operator(user_id=2)
+
+    assert exc_info.value.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,64 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pydantic import TypeAdapter
+
+from app.core.cache import LRUCache
+from app.core.http_cache import conditional_response, etag_matches, make_etag
+
+
+@pytest.fixture
+def response_cache():
+    cache = LRUCache(maxsize=10, ttl=30)
+    with patch("app.core.http_cache.response_cache", cache):
+        yield cache
+
+
+def make_request(if_none_match: str | None = None):
+    request = MagicMock()
+    request.headers = {"if-none-match": if_none_match} if if_none_match else {}
+    return request
+
+
+def test_etag_depends_on_version():
+    """ETag меняется вместе с версией ресурса."""
+    assert make_etag("history", 1, 1) == make_etag("history", 1, 1)
+    assert make_etag("history", 1, 1) != make_etag("history", 1, 2)
+
+
+def test_etag_matches():
+    """Сравнение с If-None-Match учитывает списки, слабые ETag и '*'."""
+    etag = make_etag("groups", 1, [])
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+@pytest.mark.asyncio
+async def test_not_modified_skips_load(response_cache):
+    """При совпадении ETag возвращается 304 без загрузки данных."""
+    etag = make_etag("history", 1, 1)
+    load = AsyncMock()
+
+    response = await conditional_response(make_request(etag), etag, TypeAdapter(list[int]), load)
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    load.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_body_is_cached_by_etag(response_cache):
+    """Сериализованное тело кэшируется и переиспользуется для той же версии."""
+    etag = make_etag("group_members", 1, 1)
+    load = AsyncMock(return_value=[1, 2])
+
+    first = await conditional_response(make_request(), etag, TypeAdapter(list[int]), load)
+    second = await conditional_response(make_request('"stale"'), etag, TypeAdapter(list[int]), load)
+
+    assert first.status_code == second.status_code == 200
+    assert first.body == second.body == b"[1,2]"
+    load.assert_awaited_once()
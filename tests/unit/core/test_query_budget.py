@@ -0,0 +1,90 @@
+import logging
+from unittest.mock import patch
+
+import pytest
+from fastapi.routing import APIRoute
+from sqlalchemy import create_engine, text
+
+from app.api import auth_router, chats_router, groups_router, messages_router, users_router
+from app.config import settings
+from app.core.query_budget import QueryBudget, QueryBudgetExceededError, count_queries, current_stats
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    yield engine
+    engine.dispose()
+
+
+def test_counts_statements_and_round_trips(engine):
+    """Учитываются команды и обращения к серверу, включая начало и фиксацию транзакции."""
+    with count_queries('outer') as outer:
+        with engine.begin() as conn:
+            conn.execute(text('CREATE TABLE t (x INTEGER)'))
+            conn.execute(text('INSERT INTO t VALUES (:x)'), [{'x': 1}, {'x': 2}, {'x': 3}])
+        with count_queries('inner') as inner, engine.connect() as conn:
+            conn.execute(text('SELECT * FROM t'))
+
+    # Пакетная вставка - три команды за одно обращение; закрытие соединения - ROLLBACK
+    assert (inner.statements, inner.round_trips) == (1, 3)
+    assert (outer.statements, outer.round_trips) == (5, 7)
+    assert current_stats() is None
+
+
+def test_untracked_queries_are_ignored(engine):
+    """Вне отслеживаемой операции запросы не учитываются."""
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    with count_queries() as stats:
+        pass
+    assert stats.statements == 0
+
+
+def test_exceeded_budget_is_logged(engine, caplog):
+    """Превышение бюджета записывается в лог, без строгого режима ошибки нет."""
+    with caplog.at_level(logging.WARNING), count_queries('GET /groups', QueryBudget(1)), engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+        conn.execute(text('SELECT 2'))
+
+    assert 'GET /groups: 2 statements' in caplog.text
+
+
+def test_strict_mode_raises(engine):
+    """В строгом режиме превышение бюджета (команд или обращений) вызывает ошибку."""
+    def run(budget: QueryBudget, statements: int) -> None:
+        with count_queries('GET /groups', budget), engine.connect() as conn:
+            for _ in range(statements):
+                conn.execute(text('SELECT 1'))
+
+    with patch.object(settings.query_budget, 'query_budget_strict', True):
+        run(QueryBudget(1), 1)
+        with pytest.raises(QueryBudgetExceededError, match='statements=1'):
+            run(QueryBudget(1), 2)
+        # BEGIN, SELECT и ROLLBACK при закрытии соединения
+        with pytest.raises(QueryBudgetExceededError, match='round_trips=2'):
+            run(QueryBudget(5, round_trips=2), 1)
+
+
+@pytest.mark.asyncio
+async def test_route_dependency_sets_budget():
+    """Зависимость маршрута назначает бюджет отслеживаемому запросу."""
+    budget = QueryBudget(3)
+    with count_queries('GET /groups') as stats:
+        await budget()
+    assert stats.budget is budget
+
+    # Вне отслеживаемого запроса зависимость ничего не делает
+    await budget()
+
+
+@pytest.mark.parametrize('router', [auth_router, chats_router, groups_router, messages_router, users_router])
+def test_every_api_route_declares_budget(router):
+    """У каждого маршрута API объявлен бюджет запросов."""
+    routes = [route for route in router.routes if isinstance(route, APIRoute)]
+    assert routes
+    missing = [
+        route.path for route in routes
+        if not any(isinstance(dependency.dependency, QueryBudget) for dependency in route.dependencies)
+    ]
+    assert not missing
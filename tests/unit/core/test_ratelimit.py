@@ -0,0 +1,34 @@
+from app.config import FrameRateLimit
+from app.core.ratelimit import FrameRateLimiter, TokenBucket
+
+
+def test_bucket_allows_burst_then_refills():
+    """Корзина пропускает burst запросов подряд и восстанавливается со скоростью rate."""
+    bucket = TokenBucket(rate=2, burst=3, maxsize=10)
+    for _ in range(3):
+        assert bucket.wait_time("user", now=0) == 0
+        bucket.take("user", now=0)
+
+    assert bucket.wait_time("user", now=0) == 0.5
+    assert bucket.wait_time("user", now=0.5) == 0
+
+
+def test_limiter_checks_user_and_chat():
+    """Фрейм проходит, только если укладывается в лимиты и пользователя, и чата."""
+    limiter = FrameRateLimiter(
+        {"message": FrameRateLimit(user_rate=1, user_burst=2, chat_rate=1, chat_burst=3)}, maxsize=10
+    )
+
+    assert limiter.check("message", 1, 5, now=0) == 0
+    assert limiter.check("message", 1, 5, now=0) == 0
+    assert limiter.check("message", 1, 5, now=0) == 1.0
+    # Другой пользователь упирается в оставшийся лимит чата
+    assert limiter.check("message", 2, 5, now=0) == 0
+    assert limiter.check("message", 2, 5, now=0) == 1.0
+
+
+def test_limiter_ignores_unconfigured_frames():
+    """Типы фреймов без лимита не ограничиваются."""
+    limiter = FrameRateLimiter({}, maxsize=10)
+
+    assert limiter.check("ping", 1, 5, now=0) == 0
@@ -0,0 +1,49 @@
+import time
+
+from app.core.revocation import RevocationCache
+
+
+def test_revoke_and_check():
+    """Отозванный токен находится в кэше."""
+    cache = RevocationCache(maxsize=10)
+    cache.revoke("jti-1", time.time() + 60)
+
+    assert cache.is_revoked("jti-1")
+    assert not cache.is_revoked("jti-2")
+
+
+def test_expired_entries_are_dropped():
+    """Истекшие токены не хранятся в кэше."""
+    cache = RevocationCache(maxsize=10)
+    cache.revoke("expired", time.time() - 1)
+
+    assert not cache.is_revoked("expired")
+    assert len(cache) == 0
+
+
+def test_oldest_entries_are_evicted():
+    """При переполнении вытесняются самые старые записи."""
+    cache = RevocationCache(maxsize=2)
+    expires_at = time.time() + 60
+    for jti in ("a", "b", "c"):
+        cache.revoke(jti, expires_at)
+
+    assert len(cache) == 2
+    assert not cache.is_revoked("a")
+    assert cache.is_revoked("b")
+    assert cache.is_revoked("c")
+
+
+def test_reused_mark_is_evicted_with_entry():
+    """Отметка о повторном предъявлении вытесняется вместе с записью."""
+    cache = RevocationCache(maxsize=1)
+    expires_at = time.time() + 60
+    cache.revoke("a", expires_at)
+    cache.mark_reused("a", expires_at)
+
+    assert cache.is_reused("a")
+    assert not cache.is_reused("b")
+
+    cache.revoke("b", expires_at)
+
+    assert not cache.is_reused("a")
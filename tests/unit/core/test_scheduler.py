@@ -0,0 +1,137 @@
+import asyncio
+import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.scheduler import CronSchedule, IntervalSchedule, Scheduler
+
+
+def ts(*args) -> float:
+    return datetime.datetime(*args, tzinfo=datetime.UTC).timestamp()
+
+
+def test_cron_next_run():
+    """Расписание cron находит ближайшее подходящее время строго после текущего."""
+    every_15 = CronSchedule('*/15 * * * *')
+    assert every_15.next_after(ts(2026, 3, 1, 10, 7, 30)) == ts(2026, 3, 1, 10, 15)
+    assert every_15.next_after(ts(2026, 3, 1, 10, 15)) == ts(2026, 3, 1, 10, 30)
+
+    nightly = CronSchedule('30 3 * * *')
+    assert nightly.next_after(ts(2026, 3, 1, 4, 0)) == ts(2026, 3, 2, 3, 30)
+
+    # 2026-12-31 - четверг; ближайший понедельник (1) - 4 января следующего года
+    monday = CronSchedule('0 0 * * 1')
+    assert monday.next_after(ts(2026, 12, 31, 12, 0)) == ts(2027, 1, 4)
+
+
+def test_cron_day_of_month_or_weekday():
+    """Если заданы и день месяца, и день недели, расписание срабатывает по любому из них."""
+    schedule = CronSchedule('0 12 15 * 0')
+    # 2026-03-08 - воскресенье, раньше 15-го числа
+    assert schedule.next_after(ts(2026, 3, 2)) == ts(2026, 3, 8, 12)
+    assert schedule.next_after(ts(2026, 3, 9)) == ts(2026, 3, 15, 12)
+    # 7 - тоже воскресенье
+    assert CronSchedule('0 12 * * 7').next_after(ts(2026, 3, 2)) == ts(2026, 3, 8, 12)
+
+
+@pytest.mark.parametrize('expression', ['* * *', '60 * * * *', '*/0 * * * *', 'a * * * *', '5-1 * * * *'])
+def test_cron_invalid_expression(expression):
+    """Некорректное выражение cron отклоняется при регистрации."""
+    with pytest.raises(ValueError, match='cron'):
+        CronSchedule(expression)
+
+
+def test_cron_never_matches():
+    """Расписание, которое никогда не срабатывает, не зацикливает поиск."""
+    with pytest.raises(ValueError, match='не срабатывает'):
+        CronSchedule('0 0 30 2 *').next_after(ts(2026, 1, 1))
+
+
+@pytest.mark.asyncio
+async def test_due_job_runs_and_is_rescheduled_with_jitter():
+    """Задача запускается в срок, следующий запуск назначается через интервал плюс случайная задержка."""
+    scheduler = Scheduler(leader_election=False)
+    func = AsyncMock()
+    job = scheduler.add_job('cleanup', func, IntervalSchedule(60), jitter=5)
+
+    now = job.next_run + 1
+    assert await scheduler.run_pending(now=now) == ['cleanup']
+    await job.task
+
+    func.assert_awaited_once()
+    assert job.stats(now)['runs'] == 1
+    assert now + 60 <= job.next_run <= now + 65
+    assert await scheduler.run_pending(now=now + 59) == []
+
+
+@pytest.mark.asyncio
+async def test_jitter_bounds():
+    """Случайная задержка не превышает jitter."""
+    scheduler = Scheduler(leader_election=False)
+    job = scheduler.add_job('cleanup', AsyncMock(), IntervalSchedule(60), jitter=5)
+
+    for _ in range(100):
+        job.plan(1000)
+        assert 1000 <= job.next_run <= 1005
+
+
+@pytest.mark.asyncio
+async def test_failure_is_counted():
+    """Ошибка задачи учитывается в статистике и не останавливает планировщик."""
+    scheduler = Scheduler(leader_election=False)
+    job = scheduler.add_job('purge', AsyncMock(side_effect=RuntimeError('boom')), IntervalSchedule(60), jitter=0)
+
+    await scheduler.run_pending(now=job.next_run)
+    await job.task
+
+    stats = job.stats(0)
+    assert stats['runs'] == 1
+    assert stats['failures'] == 1
+    assert 'boom' in stats['last_error']
+
+
+@pytest.mark.asyncio
+async def test_running_job_is_not_started_twice():
+    """Пока предыдущий запуск не завершился, очередной срок пропускается."""
+    scheduler = Scheduler(leader_election=False)
+    release = asyncio.Event()
+    job = scheduler.add_job('purge', release.wait, IntervalSchedule(1), jitter=0)
+
+    await scheduler.run_pending(now=job.next_run)
+    assert await scheduler.run_pending(now=job.next_run) == []
+    assert job.skipped == 1
+
+    release.set()
+    await job.task
+
+
+@pytest.mark.asyncio
+async def test_job_runs_only_on_leader():
+    """Задачу запускает только процесс, захвативший ее блокировку."""
+    scheduler = Scheduler(leader_election=True)
+    func = AsyncMock()
+    job = scheduler.add_job('purge', func, IntervalSchedule(60), jitter=0)
+
+    with patch.object(scheduler, '_is_leader', AsyncMock(return_value=False)):
+        assert await scheduler.run_pending(now=job.next_run) == []
+    assert not job.leader
+    func.assert_not_called()
+
+    with patch.object(scheduler, '_is_leader', AsyncMock(return_value=True)):
+        assert await scheduler.run_pending(now=job.next_run) == ['purge']
+    await job.task
+    assert job.leader
+    func.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_jobs_after_timeout():
+    """При остановке зависшая задача отменяется по истечении shutdown_timeout."""
+    scheduler = Scheduler(leader_election=False, shutdown_timeout=0.01)
+    job = scheduler.add_job('purge', asyncio.Event().wait, IntervalSchedule(60), jitter=0)
+    await scheduler.run_pending(now=job.next_run)
+
+    await scheduler.stop()
+
+    assert job.task.cancelled()
@@ -3,7 +3,7 @@ from unittest.mock import patch
 
 import pytest
 
-from app.core.security import create_access_token, decode_token
+from app.core.security import create_access_token, create_refresh_token, decode_refresh_token, decode_token
 from app.schemas import TokenData
 
 
@@ -72,3 +72,22 @@ async def test_decode_token_wrong_algorithm(sample_token_data):
 
     with patch('app.core.security.settings.auth.token_algorythm', new="HS384"):
         assert decode_token(token) is None
+
+
+@pytest.mark.asyncio
+async def test_decode_refresh_token_success(sample_token_data):
+    """Проверка декодирования refresh-токена."""
+    expires_at = datetime.now(UTC) + timedelta(days=1)
+    token = create_refresh_token(sample_token_data, "session-jti", expires_at)
+
+    decoded = decode_refresh_token(token)
+    assert decoded is not None
+    assert decoded['jti'] == "session-jti"
+    assert decoded['user_id'] == sample_token_data.user_id
+
+
+@pytest.mark.asyncio
+async def test_decode_refresh_token_rejects_access_token(sample_token_data):
+    """Access-токен не декодируется как refresh-токен."""
+    token = create_access_token(sample_token_data)
+    assert decode_refresh_token(token) is None
@@ -0,0 +1,82 @@
+import datetime
+
+import pytest
+
+from app.core.snowflake import MAX_SEQUENCE, MAX_WORKER_ID, SEQUENCE_BITS, SnowflakeGenerator
+
+EPOCH_MS = 1_704_067_200_000
+
+
+def test_ids_are_increasing_and_time_ordered():
+    """Идентификаторы возрастают и упорядочены по времени создания."""
+    generator = SnowflakeGenerator(worker_id=3, epoch_ms=EPOCH_MS)
+
+    first = generator.next_id(EPOCH_MS + 1000)
+    second = generator.next_id(EPOCH_MS + 1000)
+    later = generator.next_id(EPOCH_MS + 2000)
+
+    assert first < second < later
+    assert (first >> SEQUENCE_BITS) & MAX_WORKER_ID == 3
+    assert generator.timestamp(later) == datetime.datetime.fromtimestamp((EPOCH_MS + 2000) / 1000, tz=datetime.UTC)
+
+
+def test_workers_do_not_collide():
+    """Разные процессы в одну миллисекунду выдают разные идентификаторы."""
+    now = EPOCH_MS + 5
+    ids = {SnowflakeGenerator(worker_id=worker, epoch_ms=EPOCH_MS).next_id(now) for worker in range(10)}
+
+    assert len(ids) == 10
+
+
+def test_clock_going_backwards_keeps_ids_increasing():
+    """Перевод часов назад не нарушает возрастание идентификаторов."""
+    generator = SnowflakeGenerator(worker_id=0, epoch_ms=EPOCH_MS)
+
+    first = generator.next_id(EPOCH_MS + 10_000)
+    second = generator.next_id(EPOCH_MS + 5_000)
+
+    assert second > first
+
+
+def test_sequence_overflow_moves_to_next_millisecond():
+    """После исчерпания номеров в миллисекунде используется следующая миллисекунда."""
+    generator = SnowflakeGenerator(worker_id=0, epoch_ms=EPOCH_MS)
+    ids = [generator.next_id(EPOCH_MS) for _ in range(MAX_SEQUENCE + 2)]
+
+    assert ids == sorted(set(ids))
+    assert generator.timestamp(ids[-1]) > generator.timestamp(ids[0])
+
+
+def test_min_id_bounds_ids_by_time():
+    """min_id(момент) не больше идентификаторов, выданных в этот момент и позже."""
+    generator = SnowflakeGenerator(worker_id=7, epoch_ms=EPOCH_MS)
+    snowflake_id = generator.next_id(EPOCH_MS + 3_000)
+
+    assert generator.min_id(generator.timestamp(snowflake_id)) <= snowflake_id
+    assert generator.min_id(generator.timestamp(snowflake_id) + datetime.timedelta(milliseconds=1)) > snowflake_id
+
+
+def test_invalid_worker_id():
+    """ID процесса вне допустимого диапазона отклоняется."""
+    with pytest.raises(ValueError, match="worker_id"):
+        SnowflakeGenerator(worker_id=MAX_WORKER_ID + 1)
+
+
+def test_ids_fit_javascript_numbers():
+    """Идентификаторы до конца срока эпохи точно представимы числом JavaScript."""
+    generator = SnowflakeGenerator(worker_id=MAX_WORKER_ID, epoch_ms=EPOCH_MS)
+    generator.next_id(EPOCH_MS + (1 << 41) - 1)
+    for _ in range(MAX_SEQUENCE):
+        last = generator.next_id(EPOCH_MS + (1 << 41) - 1)
+
+    assert last == 2 ** 53 - 1
+
+
+def test_unassigned_worker_id():
+    """Без назначенного ID процесса идентификаторы не выдаются."""
+    generator = SnowflakeGenerator(worker_id=None, epoch_ms=EPOCH_MS)
+    with pytest.raises(RuntimeError):
+        generator.next_id(EPOCH_MS)
+
+    generator.assign(4)
+    assert (generator.next_id(EPOCH_MS) >> SEQUENCE_BITS) & MAX_WORKER_ID == 4
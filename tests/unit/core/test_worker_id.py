@@ -0,0 +1,103 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.snowflake import MAX_WORKER_ID, SnowflakeGenerator
+from app.core.worker_id import WorkerIdLease
+
+
+def connection(taken: set[int]) -> MagicMock:
+    """Соединение, на котором номера из taken заняты другими процессами."""
+    conn = MagicMock()
+    conn.fetchval = AsyncMock(side_effect=lambda _query, _lock_class, worker_id, **_: worker_id not in taken)
+    conn.terminate = MagicMock()
+    conn.close = AsyncMock()
+    return conn
+
+
+@pytest.fixture
+def generator():
+    return SnowflakeGenerator(worker_id=None)
+
+
+@pytest.mark.asyncio
+async def test_configured_worker_id_is_used_without_lock(generator):
+    """Заданный WORKER_ID назначается без обращения к БД."""
+    lease = WorkerIdLease(generator, worker_id=5)
+
+    with patch('app.core.worker_id.asyncpg.connect') as connect:
+        assert await lease.acquire() == 5
+    connect.assert_not_called()
+    assert generator.worker_id == 5
+
+
+@pytest.mark.asyncio
+async def test_first_free_worker_id_is_claimed(generator, caplog):
+    """Без WORKER_ID занимается первый свободный номер, выбранный номер записывается в лог."""
+    conn = connection(taken={0, 1})
+    lease = WorkerIdLease(generator, worker_id=None)
+
+    with patch('app.core.worker_id.asyncpg.connect', AsyncMock(return_value=conn)), caplog.at_level('INFO'):
+        assert await lease.acquire() == 2
+    assert generator.worker_id == 2
+    assert 'worker id 2 claimed' in caplog.text
+    generator.next_id()
+
+    await lease.release()
+    conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_all_worker_ids_taken(generator):
+    """Если все номера заняты, процесс не запускается, а соединение закрывается."""
+    conn = connection(taken=set(range(MAX_WORKER_ID + 1)))
+    lease = WorkerIdLease(generator, worker_id=None)
+
+    with patch('app.core.worker_id.asyncpg.connect', AsyncMock(return_value=conn)), pytest.raises(RuntimeError):
+        await lease.acquire()
+    conn.close.assert_awaited_once()
+    with pytest.raises(RuntimeError):
+        generator.next_id()
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_stops_ids_and_is_renewed(generator):
+    """После обрыва соединения идентификаторы не выдаются, пока номер не занят снова (сначала прежний)."""
+    first, second = connection(taken={0}), connection(taken=set())
+    lease = WorkerIdLease(generator, worker_id=None, retry_interval=0)
+    renewed = asyncio.Event()
+    connect = AsyncMock(side_effect=[first, OSError('connection refused'), second])
+    second.add_termination_listener.side_effect = lambda _listener: renewed.set()
+
+    with patch('app.core.worker_id.asyncpg.connect', connect):
+        assert await lease.acquire() == 1
+        [[listener], _] = first.add_termination_listener.call_args
+        listener(first)
+        with pytest.raises(RuntimeError):
+            generator.next_id()
+        await asyncio.wait_for(renewed.wait(), 1)
+
+    assert generator.worker_id == 1
+    assert second.fetchval.await_args_list[0].args[2] == 1
+    await lease.release()
+
+
+@pytest.mark.asyncio
+async def test_silently_lost_lease_is_detected_by_probe(generator):
+    """Если блокировка больше не удерживается (тихий обрыв), идентификаторы не выдаются до новой аренды."""
+    first, second = connection(taken=set()), connection(taken=set())
+    lease = WorkerIdLease(generator, worker_id=None, retry_interval=0, probe_interval=0.01)
+    renewed = asyncio.Event()
+    second.add_termination_listener.side_effect = lambda _listener: renewed.set()
+
+    with patch('app.core.worker_id.asyncpg.connect', AsyncMock(side_effect=[first, second])):
+        assert await lease.acquire() == 0
+        # Сервер освободил блокировку: проверка удержания возвращает false
+        first.fetchval.side_effect = lambda *_args, **_kwargs: False
+        await asyncio.wait_for(renewed.wait(), 1)
+
+    first.terminate.assert_called_once()
+    assert generator.worker_id == 0
+    generator.next_id()
+    await lease.release()
@@ -0,0 +1,85 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.db.loader import EntityLoader
+from app.db.models import Group
+from app.db.repositories.group import GroupRepository
+
+
+def make_group(group_id: int) -> Group:
+    group = MagicMock(spec=Group)
+    group.id = group_id
+    return group
+
+
+@pytest.fixture
+def mock_repo():
+    repo = AsyncMock(spec=GroupRepository)
+    repo.model = Group
+    return repo
+
+
+@pytest.fixture
+def loader(mock_repo):
+    return EntityLoader(mock_repo)
+
+
+@pytest.mark.asyncio
+async def test_repeated_load_hits_cache(loader, mock_repo):
+    """Повторная загрузка той же записи не обращается к БД."""
+    group = make_group(1)
+    mock_repo.get_many.return_value = [group]
+
+    assert await loader.load(1) is group
+    assert await loader.load(1) is group
+    mock_repo.get_many.assert_awaited_once_with([1])
+
+
+@pytest.mark.asyncio
+async def test_missing_entity_is_cached(loader, mock_repo):
+    """Отсутствие записи тоже кэшируется."""
+    mock_repo.get_many.return_value = []
+
+    assert await loader.load(999) is None
+    assert await loader.load(999) is None
+    mock_repo.get_many.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_load_many_batches_only_missing(loader, mock_repo):
+    """Пакетная загрузка запрашивает только отсутствующие в кэше ID одним запросом."""
+    mock_repo.get_many.return_value = [make_group(1)]
+    await loader.load(1)
+
+    mock_repo.get_many.return_value = [make_group(2), make_group(3)]
+    result = await loader.load_many([3, 1, 2, 3])
+
+    mock_repo.get_many.assert_awaited_with([3, 2])
+    assert [g.id for g in result] == [3, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_forget_and_prime(loader, mock_repo):
+    """Изменения записи обновляют кэш."""
+    mock_repo.get_many.return_value = [make_group(1)]
+    await loader.load(1)
+
+    loader.forget(1)
+    await loader.load(1)
+    assert mock_repo.get_many.await_count == 2
+
+    updated = make_group(1)
+    loader.prime(updated)
+    assert await loader.load(1) is updated
+    assert mock_repo.get_many.await_count == 2
+
+
+def test_loader_is_shared_per_session(mock_repo):
+    """Загрузчик модели один на сессию, т.е. общий для всех репозиториев запроса."""
+    session = MagicMock()
+    session.info = {}
+    other_repo = AsyncMock(spec=GroupRepository)
+    other_repo.model = Group
+
+    assert EntityLoader.for_session(session, mock_repo) is EntityLoader.for_session(session, other_repo)
@@ -0,0 +1,24 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.util import greenlet_spawn
+
+from app.db.session import AdmissionQueuePool
+
+
+@pytest.mark.asyncio
+async def test_pool_reports_checkout_wait():
+    """Время получения соединения (и ожидание до таймаута) передается контролю допуска при выдаче из пула."""
+    pool = AdmissionQueuePool(MagicMock, pool_size=1, max_overflow=0, timeout=0.2)
+    with patch('app.db.session.admission') as admission:
+        first = await greenlet_spawn(pool.connect)
+        admission.observe_pool_wait.assert_called_once()
+        assert admission.observe_pool_wait.call_args.args[0] < 0.2
+
+        with pytest.raises(PoolTimeoutError):
+            await greenlet_spawn(pool.connect)
+        assert admission.observe_pool_wait.call_args.args[0] >= 0.2
+
+    first.close()
+    pool.dispose()
@@ -0,0 +1,48 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.uow import UnitOfWork
+
+
+@pytest.fixture
+def session():
+    return AsyncMock(spec=AsyncSession)
+
+
+@pytest.fixture
+def uow(session):
+    return UnitOfWork(session)
+
+
+@pytest.mark.asyncio
+async def test_commit_on_success(uow, session):
+    """Успешный блок фиксирует транзакцию один раз."""
+    async with uow:
+        pass
+
+    session.commit.assert_awaited_once()
+    session.rollback.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_rollback_on_error(uow, session):
+    """Исключение откатывает транзакцию и пробрасывается дальше."""
+    with pytest.raises(ValueError, match="boom"):
+        async with uow:
+            raise ValueError("boom")
+
+    session.rollback.assert_awaited_once()
+    session.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_nested_blocks_commit_once(uow, session):
+    """Вложенные блоки не фиксируют транзакцию самостоятельно."""
+    async with uow:
+        async with uow:
+            pass
+        session.commit.assert_not_called()
+
+    session.commit.assert_awaited_once()
@@ -2,9 +2,11 @@ from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from passlib.exc import UnknownHashError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import User
 from app.db.repositories.user import UserRepository
+from app.db.uow import UnitOfWork
 from app.schemas.user import UserCreate
 from app.services.auth import UserService, get_password_hash, verify_password
 
@@ -15,8 +17,13 @@ def mock_repo():
 
 
 @pytest.fixture
-def user_service(mock_repo):
-    return UserService(mock_repo)
+def uow():
+    return UnitOfWork(AsyncMock(spec=AsyncSession))
+
+
+@pytest.fixture
+def user_service(mock_repo, uow):
+    return UserService(mock_repo, uow)
 
 
 @pytest.fixture
@@ -1,9 +1,11 @@
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import Chat
 from app.db.repositories.chat import ChatRepository
+from app.db.uow import UnitOfWork
 from app.schemas.chat import ChatCreate, ChatRead
 from app.services.chat import ChatService
 
@@ -14,8 +16,13 @@ def mock_repo():
 
 
 @pytest.fixture
-def chat_service(mock_repo):
-    return ChatService(mock_repo)
+def uow():
+    return UnitOfWork(AsyncMock(spec=AsyncSession))
+
+
+@pytest.fixture
+def chat_service(mock_repo, uow):
+    return ChatService(mock_repo, uow)
 
 
 @pytest.fixture
@@ -43,19 +50,17 @@ def sample_chat_create(sample_chat_data):
 @pytest.mark.asyncio
 async def test_create_chat_success(chat_service, mock_repo, sample_chat_data, sample_chat_create):
     """Успешное создание чата."""
-    mock_repo.check_chat_exists.return_value = False
-
     mock_chat = MagicMock(spec=Chat)
     mock_chat.id = 1
     mock_chat.name = sample_chat_data["name"]
     mock_chat.is_group = sample_chat_data["is_group"]
-    mock_repo.create.return_value = mock_chat
+    mock_repo.get_or_create_personal_chat.return_value = (mock_chat, True)
 
     result = await chat_service.create_chat(sample_chat_create)
 
     assert isinstance(result, ChatRead)
-    mock_repo.create.assert_called_once()
-    assert mock_repo.add_user_to_chat.call_count == 2
+    mock_repo.get_or_create_personal_chat.assert_awaited_once_with(1, 2, "Personal Chat 2")
+    mock_repo.add_users_to_chat.assert_called_once_with(1, [1, 2])
     assert sample_chat_create.name == f"Personal Chat {sample_chat_data['user_id']}"
 
 
@@ -69,8 +74,6 @@ async def test_create_group_chat(chat_service, mock_repo):
         user_id=2
     )
 
-    mock_repo.check_chat_exists.return_value = False
-
     mock_chat = MagicMock(spec=Chat)
     mock_chat.id = 1
     mock_chat.name = "Group Chat"
@@ -80,13 +83,82 @@ async def test_create_group_chat(chat_service, mock_repo):
     result = await chat_service.create_chat(chat_data)
 
     assert result.is_group
+    mock_repo.get_or_create_personal_chat.assert_not_called()
     assert chat_data.name == "Group Chat"  # Имя не должно измениться
 
 
 @pytest.mark.asyncio
 async def test_create_existing_chat(chat_service, mock_repo, sample_chat_create):
     """Попытка создания существующего чата."""
-    mock_repo.check_chat_exists.return_value = True
+    mock_repo.get_or_create_personal_chat.return_value = (MagicMock(spec=Chat), False)
 
     with pytest.raises(ValueError, match="Личный чат между этими пользователями уже существует"):
         await chat_service.create_chat(sample_chat_create)
+
+    mock_repo.add_users_to_chat.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_chat_single_commit(chat_service, mock_repo, uow, sample_chat_create):
+    """Создание чата и добавление участников выполняется в одной транзакции."""
+    mock_chat = MagicMock(spec=Chat)
+    mock_chat.id = 1
+    mock_chat.name = "Personal Chat 2"
+    mock_chat.is_group = False
+    mock_repo.get_or_create_personal_chat.return_value = (mock_chat, True)
+
+    await chat_service.create_chat(sample_chat_create)
+
+    uow.session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_create_existing_chat_rollback(chat_service, mock_repo, uow, sample_chat_create):
+    """При ошибке транзакция откатывается без фиксации."""
+    mock_repo.get_or_create_personal_chat.return_value = (MagicMock(spec=Chat), False)
+
+    with pytest.raises(ValueError, match="уже существует"):
+        await chat_service.create_chat(sample_chat_create)
+
+    uow.session.rollback.assert_awaited_once()
+    uow.session.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_set_retention(chat_service, mock_repo):
+    """Срок хранения сохраняется для владельца чата."""
+    mock_chat = MagicMock(spec=Chat)
+    mock_chat.id = 1
+    mock_chat.name = "Personal Chat 2"
+    mock_chat.is_group = False
+    mock_chat.retention_days = 7
+    mock_repo.is_owner.return_value = True
+    mock_repo.update.return_value = mock_chat
+
+    result = await chat_service.set_retention(1, 2, 7)
+
+    assert result.retention_days == 7
+    mock_repo.is_owner.assert_awaited_once_with(2, 1)
+    mock_repo.update.assert_awaited_once_with(1, {"retention_days": 7})
+
+
+@pytest.mark.asyncio
+async def test_set_retention_by_non_owner(chat_service, mock_repo):
+    """Участник группы, не создавший ее, как и пользователь не из чата, не может менять срок хранения."""
+    mock_repo.user_has_access.return_value = True
+    mock_repo.is_owner.return_value = False
+
+    assert await chat_service.set_retention(1, 3, 7) is None
+    mock_repo.update.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_set_retention_longer_than_global(chat_service, mock_repo):
+    """Срок чата не может быть длиннее общего срока хранения."""
+    with (
+        patch("app.services.chat.settings.retention.message_retention_days", 30),
+        pytest.raises(ValueError, match="не может превышать"),
+    ):
+        await chat_service.set_retention(1, 2, 31)
+
+    mock_repo.update.assert_not_called()
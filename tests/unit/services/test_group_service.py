@@ -1,10 +1,12 @@
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import Chat, Group
 from app.db.repositories.chat import ChatRepository
 from app.db.repositories.group import GroupRepository
+from app.db.uow import UnitOfWork
 from app.schemas.group import GroupCreate, GroupInfo, GroupList, GroupRead
 from app.services.group import GroupService
 
@@ -20,8 +22,13 @@ def mock_chat_repo():
 
 
 @pytest.fixture
-def group_service(mock_group_repo, mock_chat_repo):
-    return GroupService(mock_group_repo, mock_chat_repo)
+def uow():
+    return UnitOfWork(AsyncMock(spec=AsyncSession))
+
+
+@pytest.fixture
+def group_service(mock_group_repo, mock_chat_repo, uow):
+    return GroupService(mock_group_repo, mock_chat_repo, uow)
 
 
 @pytest.fixture
@@ -83,7 +90,7 @@ async def test_get_group_success(group_service, mock_group_repo, sample_group_da
     mock_group.id = 1
     mock_group.creator_id = sample_group_data["creator_id"]
     mock_group.members = sample_group_data["members"]
-    mock_group_repo.get.return_value = mock_group
+    mock_group_repo.load.return_value = mock_group
 
     result = await group_service.get_group(1)
 
@@ -95,7 +102,7 @@ async def test_get_group_success(group_service, mock_group_repo, sample_group_da
 @pytest.mark.asyncio
 async def test_get_group_not_found(group_service, mock_group_repo):
     """Группа не найдена."""
-    mock_group_repo.get.return_value = None
+    mock_group_repo.load.return_value = None
 
     result = await group_service.get_group(999)
     assert result is None
@@ -128,51 +135,76 @@ async def test_get_user_groups(group_service, mock_group_repo):
 
 
 @pytest.mark.asyncio
-async def test_add_member_success(group_service, mock_group_repo):
-    """Успешное добавление участника."""
-    mock_group = MagicMock(spec=Group)
-    mock_group.members = [1]
-    mock_group_repo.get.return_value = mock_group
+async def test_add_member_success(group_service, mock_group_repo, uow):
+    """Успешное добавление участника одним атомарным запросом."""
+    mock_group_repo.add_members.return_value = [1, 2]
 
     result = await group_service.add_member(1, 2)
     assert result is True
-    mock_group_repo.update.assert_called_once_with(1, {"members": [1, 2]})
+    mock_group_repo.add_members.assert_called_once_with(1, [2])
+    mock_group_repo.load.assert_not_called()
+    uow.session.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
 async def test_add_existing_member(group_service, mock_group_repo):
     """Попытка добавить существующего участника."""
-    mock_group = MagicMock(spec=Group)
-    mock_group.members = [1, 2]
-    mock_group_repo.get.return_value = mock_group
+    mock_group_repo.add_members.return_value = None
 
     result = await group_service.add_member(1, 2)
     assert result is False
-    mock_group_repo.update.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_remove_member_success(group_service, mock_group_repo):
-    """Успешное удаление участника."""
+async def test_add_members_bulk(group_service, mock_group_repo):
+    """Массовое добавление участников выполняется одним запросом."""
+    mock_group_repo.add_members.return_value = [1, 2, 3, 4]
+
+    result = await group_service.add_members(1, [2, 3, 4])
+    assert result == [1, 2, 3, 4]
+    mock_group_repo.add_members.assert_called_once_with(1, [2, 3, 4])
+
+
+@pytest.mark.asyncio
+async def test_add_members_all_existing(group_service, mock_group_repo):
+    """Если все пользователи уже в группе, возвращается текущий состав."""
+    mock_group_repo.add_members.return_value = None
     mock_group = MagicMock(spec=Group)
     mock_group.members = [1, 2]
-    mock_group_repo.get.return_value = mock_group
+    mock_group_repo.load.return_value = mock_group
+
+    result = await group_service.add_members(1, [2])
+    assert result == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_add_members_group_not_found(group_service, mock_group_repo):
+    """Массовое добавление в несуществующую группу."""
+    mock_group_repo.add_members.return_value = None
+    mock_group_repo.load.return_value = None
+
+    result = await group_service.add_members(999, [2])
+    assert result is None
+
+
+@pytest.mark.asyncio
+async def test_remove_member_success(group_service, mock_group_repo):
+    """Успешное удаление участника одним атомарным запросом."""
+    mock_group_repo.remove_member.return_value = [1]
 
     result = await group_service.remove_member(1, 2)
     assert result is True
-    mock_group_repo.update.assert_called_once_with(1, {"members": [1]})
+    mock_group_repo.remove_member.assert_called_once_with(1, 2)
+    mock_group_repo.load.assert_not_called()
 
 
 @pytest.mark.asyncio
 async def test_remove_nonexistent_member(group_service, mock_group_repo):
     """Попытка удалить отсутствующего участника."""
-    mock_group = MagicMock(spec=Group)
-    mock_group.members = [1]
-    mock_group_repo.get.return_value = mock_group
+    mock_group_repo.remove_member.return_value = None
 
     result = await group_service.remove_member(1, 2)
     assert result is False
-    mock_group_repo.update.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -180,7 +212,7 @@ async def test_get_group_members(group_service, mock_group_repo):
     """Получение списка участников группы."""
     mock_group = MagicMock(spec=Group)
     mock_group.members = [1, 2, 3]
-    mock_group_repo.get.return_value = mock_group
+    mock_group_repo.load.return_value = mock_group
 
     result = await group_service.get_group_members(1)
     assert result == [1, 2, 3]
@@ -189,7 +221,7 @@ async def test_get_group_members(group_service, mock_group_repo):
 @pytest.mark.asyncio
 async def test_get_group_members_not_found(group_service, mock_group_repo):
     """Получение участников несуществующей группы."""
-    mock_group_repo.get.return_value = None
+    mock_group_repo.load.return_value = None
 
     result = await group_service.get_group_members(999)
     assert result == []
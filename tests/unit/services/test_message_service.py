@@ -1,10 +1,17 @@
 import asyncio
-from unittest.mock import AsyncMock, MagicMock
+import datetime
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
+from app.core.cache import LRUCache
+from app.core.snowflake import SnowflakeGenerator
+from app.db.uow import UnitOfWork
 from app.schemas.message import MessageRead
 from app.services.message import MessageService
+from app.services.profile import ProfileService
 
 
 @pytest.fixture
@@ -18,8 +25,45 @@ def mock_chat_repo():
 
 
 @pytest.fixture
-def message_service(mock_message_repo, mock_chat_repo):
-    return MessageService(mock_message_repo, mock_chat_repo)
+def uow():
+    return UnitOfWork(AsyncMock(spec=AsyncSession))
+
+
+@pytest.fixture
+def mock_profile_service():
+    return AsyncMock(spec=ProfileService)
+
+
+@pytest.fixture
+def mock_inbox_repo():
+    return AsyncMock()
+
+
+@pytest.fixture
+def mock_outbox_repo():
+    return AsyncMock()
+
+
+@pytest.fixture
+def message_service(mock_message_repo, mock_chat_repo, uow, mock_profile_service, mock_inbox_repo, mock_outbox_repo):
+    return MessageService(
+        mock_message_repo, mock_chat_repo, uow, mock_profile_service, mock_inbox_repo, mock_outbox_repo
+    )
+
+
+@pytest.fixture(autouse=True)
+def _message_ids():
+    """Генератор идентификаторов с назначенным ID процесса (его назначает запуск приложения)."""
+    with patch('app.services.message.message_ids', SnowflakeGenerator(worker_id=0)):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def dedupe_window():
+    """Изолированное окно недавних отправок для каждого теста."""
+    window = LRUCache(maxsize=100, ttl=60)
+    with patch('app.services.message.recent_sends', window):
+        yield window
 
 
 @pytest.fixture
@@ -36,6 +80,7 @@ def sample_message_data():
 async def test_send_message_success(message_service, mock_message_repo, mock_chat_repo, sample_message_data):
     """Успешная отправка сообщения."""
     mock_chat_repo.user_has_access.return_value = True
+    mock_chat_repo.next_seq.return_value = 1
 
     mock_message = MagicMock()
     mock_message.id = 1
@@ -43,6 +88,9 @@ async def test_send_message_success(message_service, mock_message_repo, mock_cha
     mock_message.sender_id = sample_message_data["sender_id"]
     mock_message.text = sample_message_data["text"]
     mock_message.is_read = sample_message_data["is_read"]
+    mock_message.sender = None
+    mock_message.client_message_id = None
+    mock_message.seq = 1
     mock_message_repo.create.return_value = mock_message
 
     result = await message_service.send_message(
@@ -53,8 +101,10 @@ async def test_send_message_success(message_service, mock_message_repo, mock_cha
 
     assert isinstance(result, MessageRead)
     mock_message_repo.create.assert_called_once_with({
+        "id": ANY,
         "chat_id": sample_message_data["chat_id"],
         "sender_id": sample_message_data["sender_id"],
+        "seq": 1,
         "text": sample_message_data["text"]
     })
 
@@ -69,17 +119,23 @@ async def test_send_message_no_access(message_service, mock_chat_repo):
 
 
 @pytest.mark.asyncio
-async def test_get_chat_history_success(message_service, mock_message_repo, mock_chat_repo):
+async def test_get_chat_history_success(message_service, mock_message_repo, mock_chat_repo, mock_profile_service):
     """Успешное получение истории сообщений."""
     mock_chat_repo.user_has_access.return_value = True
 
     mock_message1 = MagicMock()
     mock_message1.id = 1
     mock_message1.text = "Message 1"
+    mock_message1.sender = None
+    mock_message1.client_message_id = None
+    mock_message1.seq = 1
 
     mock_message2 = MagicMock()
     mock_message2.id = 2
     mock_message2.text = "Message 2"
+    mock_message2.sender = None
+    mock_message2.client_message_id = None
+    mock_message2.seq = 1
 
     mock_message_repo.get_chat_messages.return_value = [mock_message1, mock_message2]
 
@@ -89,6 +145,7 @@ async def test_get_chat_history_success(message_service, mock_message_repo, mock
     assert all(isinstance(msg, MessageRead) for msg in result)
     assert result[0].text == "Message 1"
     assert result[1].text == "Message 2"
+    mock_profile_service.attach_senders.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -101,21 +158,82 @@ async def test_get_chat_history_no_access(message_service, mock_chat_repo):
 
 
 @pytest.mark.asyncio
-async def test_mark_as_read_success(message_service, mock_message_repo):
-    """Успешная пометка сообщения как прочитанного."""
-    mock_message_repo.mark_as_read.return_value = True
+async def test_mark_as_read_success(message_service, mock_message_repo, mock_chat_repo):
+    """Успешная пометка сообщения как прочитанного увеличивает версию чата."""
+    mock_message_repo.mark_as_read.return_value = MagicMock(chat_id=5, seq=7)
 
     result = await message_service.mark_as_read(1)
     assert result is True
+    mock_chat_repo.bump_version.assert_awaited_once_with(5)
 
 
 @pytest.mark.asyncio
-async def test_mark_as_read_failure(message_service, mock_message_repo):
+async def test_mark_as_read_failure(message_service, mock_message_repo, mock_chat_repo):
     """Попытка пометить несуществующее сообщение."""
-    mock_message_repo.mark_as_read.return_value = False
+    mock_message_repo.mark_as_read.return_value = None
 
     result = await message_service.mark_as_read(999)
     assert result is False
+    mock_chat_repo.bump_version.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_mark_as_read_message_from_other_chat(message_service, mock_message_repo, mock_chat_repo,
+                                                    mock_inbox_repo, mock_outbox_repo):
+    """Сообщение другого чата не помечается: ни версия чата, ни входящие, ни outbox не меняются."""
+    mock_message_repo.mark_as_read.return_value = None
+
+    assert await message_service.mark_as_read(42, reader_id=2, origin="2:phone", chat_id=5) is False
+
+    mock_message_repo.mark_as_read.assert_awaited_once_with(42, 5)
+    mock_chat_repo.bump_version.assert_not_called()
+    mock_inbox_repo.mark_read.assert_not_called()
+    mock_outbox_repo.add.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_send_message_assigns_seq(message_service, mock_message_repo, mock_chat_repo):
+    """Сообщение получает следующий номер чата (тем же запросом увеличивается версия чата)."""
+    mock_chat_repo.user_has_access.return_value = True
+    mock_chat_repo.next_seq.return_value = 42
+    mock_message = MagicMock()
+    mock_message.id = 1
+    mock_message.chat_id = 3
+    mock_message.sender_id = 1
+    mock_message.text = "Test message"
+    mock_message.is_read = False
+    mock_message.sender = None
+    mock_message.client_message_id = None
+    mock_message.seq = 1
+    mock_message_repo.create.return_value = mock_message
+
+    await message_service.send_message(3, 1, "Test message")
+
+    mock_chat_repo.next_seq.assert_awaited_once_with(3)
+    assert mock_message_repo.create.await_args.args[0]["seq"] == 42
+
+
+@pytest.mark.asyncio
+async def test_get_chat_version(message_service, mock_chat_repo):
+    """Версия чата возвращается только пользователю с доступом."""
+    mock_chat_repo.user_has_access.return_value = True
+    mock_chat_repo.load.return_value = MagicMock(version=7)
+
+    assert await message_service.get_chat_version(1, 1) == 7
+
+    mock_chat_repo.user_has_access.return_value = False
+    with pytest.raises(ValueError, match="не имеет доступа к этому чату"):
+        await message_service.get_chat_version(1, 2)
+
+
+@pytest.mark.asyncio
+async def test_get_chat_history_without_access_check(message_service, mock_message_repo, mock_chat_repo):
+    """При check_access=False повторная проверка доступа не выполняется."""
+    mock_message_repo.get_chat_messages.return_value = []
+
+    await message_service.get_chat_history(1, 1, check_access=False)
+
+    mock_chat_repo.user_has_access.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -141,6 +259,9 @@ async def test_concurrent_message_sending(message_service, mock_message_repo, mo
         mock_message.sender_id = 1
         mock_message.text = "Test message"
         mock_message.is_read = False
+        mock_message.sender = None
+        mock_message.client_message_id = None
+        mock_message.seq = 1
         return mock_message
 
     mock_message_repo.create.side_effect = mock_create
@@ -153,3 +274,285 @@ async def test_concurrent_message_sending(message_service, mock_message_repo, mo
 
     assert call_count == 2
     assert call_times[1] - call_times[0] >= 0.1
+
+
+def fake_create(wait=None):
+    """Имитация вставки сообщения: перед ответом ожидается wait (если задан)."""
+    async def create(data):
+        if wait is not None:
+            await wait(data)
+        message = MagicMock()
+        message.id = 1
+        message.chat_id = data["chat_id"]
+        message.sender_id = data["sender_id"]
+        message.text = data["text"]
+        message.is_read = False
+        message.sender = None
+        message.client_message_id = None
+        message.seq = 1
+        message.created_at = datetime.datetime.now(datetime.UTC)
+        return message
+    return create
+
+
+@pytest.mark.asyncio
+async def test_sends_to_different_chats_run_in_parallel(message_service, mock_message_repo, mock_chat_repo):
+    """Отправки в разные чаты не ждут друг друга: все входят во вставку до завершения любой."""
+    mock_chat_repo.user_has_access.return_value = True
+    barrier = asyncio.Barrier(5)
+
+    async def wait(_data):
+        await barrier.wait()
+
+    mock_message_repo.create.side_effect = fake_create(wait)
+
+    # Таймаут только страхует от зависания: при общей блокировке барьер не был бы пройден
+    await asyncio.wait_for(
+        asyncio.gather(*(message_service.send_message(chat_id, 1, "Msg") for chat_id in range(5))),
+        timeout=5
+    )
+    assert mock_message_repo.create.await_count == 5
+
+
+@pytest.mark.asyncio
+async def test_per_chat_lock_serializes_only_within_chat(message_service, mock_message_repo, mock_chat_repo):
+    """Одновременно выполняется по одной вставке на чат, а не одна на все чаты (как при общей блокировке)."""
+    mock_chat_repo.user_has_access.return_value = True
+    in_flight: dict[int, int] = {}
+    peak_per_chat = 0
+    peak_total = 0
+
+    async def wait(data):
+        nonlocal peak_per_chat, peak_total
+        chat_id = data["chat_id"]
+        in_flight[chat_id] = in_flight.get(chat_id, 0) + 1
+        peak_per_chat = max(peak_per_chat, in_flight[chat_id])
+        peak_total = max(peak_total, sum(in_flight.values()))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        in_flight[chat_id] -= 1
+
+    mock_message_repo.create.side_effect = fake_create(wait)
+    sends = [(chat_id, i) for chat_id in range(10) for i in range(5)]
+
+    await asyncio.gather(*(message_service.send_message(chat_id, 1, f"Msg {i}") for chat_id, i in sends))
+
+    assert mock_message_repo.create.await_count == 50
+    assert peak_per_chat == 1
+    assert peak_total == 10
+
+
+@pytest.mark.asyncio
+async def test_get_chat_history_with_senders(message_service, mock_message_repo, mock_chat_repo,
+                                             mock_profile_service):
+    """История с профилями отправителей запрашивает их одним вызовом."""
+    mock_chat_repo.user_has_access.return_value = True
+    mock_message = MagicMock()
+    mock_message.id = 1
+    mock_message.text = "Message"
+    mock_message.sender = None
+    mock_message.client_message_id = None
+    mock_message.seq = 1
+    mock_message_repo.get_chat_messages.return_value = [mock_message]
+
+    result = await message_service.get_chat_history(1, 1, include_sender=True)
+
+    mock_profile_service.attach_senders.assert_awaited_once_with(result)
+
+
+@pytest.mark.asyncio
+async def test_send_with_client_message_id_is_deduplicated(message_service, mock_message_repo, mock_chat_repo):
+    """Повтор с тем же client_message_id возвращает то же сообщение без обращения к БД."""
+    mock_chat_repo.user_has_access.return_value = True
+    mock_chat_repo.next_seq.return_value = 1
+    message = MagicMock(
+        id=7, chat_id=1, sender_id=1, text="Msg", is_read=False, sender=None, client_message_id="abc", seq=1
+    )
+    mock_message_repo.get_by_client_message_id.return_value = None
+    mock_message_repo.create_once.return_value = (message, True)
+
+    first, created = await message_service.send_message_once(1, 1, "Msg", client_message_id="abc")
+    retry, retry_created = await message_service.send_message_once(1, 1, "Msg", client_message_id="abc")
+
+    assert created is True
+    assert retry_created is False
+    assert retry.id == first.id == 7
+    mock_message_repo.create_once.assert_awaited_once_with(
+        {"id": ANY, "chat_id": 1, "sender_id": 1, "seq": 1, "text": "Msg", "client_message_id": "abc"}
+    )
+    mock_message_repo.create.assert_not_called()
+    assert mock_chat_repo.user_has_access.await_count == 1
+    mock_chat_repo.next_seq.assert_awaited_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_retry_is_found_before_seq_is_allocated(message_service, mock_message_repo, mock_chat_repo):
+    """Повтор вне окна recent_sends находится под блокировкой чата: номер и версия чата не расходуются."""
+    mock_chat_repo.user_has_access.return_value = True
+    message = MagicMock(
+        id=7, chat_id=1, sender_id=1, text="Msg", is_read=False, sender=None, client_message_id="abc", seq=1
+    )
+    mock_message_repo.get_by_client_message_id.return_value = message
+
+    result, created = await message_service.send_message_once(1, 1, "Msg", client_message_id="abc")
+
+    assert result.id == 7
+    assert created is False
+    mock_message_repo.get_by_client_message_id.assert_awaited_once_with(1, 1, "abc")
+    mock_chat_repo.next_seq.assert_not_called()
+    mock_message_repo.create_once.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_send_conflict_returns_existing_message(message_service, mock_message_repo, mock_chat_repo):
+    """Параллельный повтор, найденный по уникальному индексу при вставке, возвращает ранее созданное сообщение."""
+    mock_chat_repo.user_has_access.return_value = True
+    message = MagicMock(
+        id=7, chat_id=1, sender_id=1, text="Msg", is_read=False, sender=None, client_message_id="abc", seq=1
+    )
+    mock_message_repo.get_by_client_message_id.return_value = None
+    mock_message_repo.create_once.return_value = (message, False)
+
+    result, created = await message_service.send_message_once(1, 1, "Msg", client_message_id="abc")
+
+    assert result.id == 7
+    assert created is False
+
+
+def stored_message(chat_id: int, seq: int):
+    return MagicMock(
+        id=chat_id * 100 + seq, chat_id=chat_id, seq=seq, sender_id=1, text="Msg", is_read=False,
+        sender=None, client_message_id=None, created_at="2025-01-01T00:00:00"
+    )
+
+
+@pytest.mark.asyncio
+async def test_sync_returns_only_newer_messages(message_service, mock_message_repo, mock_chat_repo):
+    """Синхронизация возвращает только чаты с новыми сообщениями и только сообщения новее курсора."""
+    mock_chat_repo.get_accessible_chats.return_value = [
+        MagicMock(id=1, last_seq=5),
+        MagicMock(id=2, last_seq=3),
+    ]
+    mock_message_repo.get_messages_after.return_value = [stored_message(1, 4), stored_message(1, 5)]
+
+    result = await message_service.sync(1, {1: 3, 2: 3, 99: 0})
+
+    mock_chat_repo.get_accessible_chats.assert_awaited_once_with(1, {1: 3, 2: 3, 99: 0})
+    mock_message_repo.get_messages_after.assert_awaited_once_with({1: 3}, 101)
+    assert len(result) == 1
+    assert result[0].chat_id == 1
+    assert result[0].last_seq == 5
+    assert [message.seq for message in result[0].messages] == [4, 5]
+    assert result[0].has_more is False
+
+
+@pytest.mark.asyncio
+async def test_sync_reports_more_messages(message_service, mock_message_repo, mock_chat_repo):
+    """Если новых сообщений больше лимита, возвращается первая порция и has_more."""
+    mock_chat_repo.get_accessible_chats.return_value = [MagicMock(id=1, last_seq=10)]
+    mock_message_repo.get_messages_after.return_value = [stored_message(1, seq) for seq in range(1, 4)]
+
+    result = await message_service.sync(1, {1: 0}, limit=2)
+
+    assert [message.seq for message in result[0].messages] == [1, 2]
+    assert result[0].has_more is True
+
+
+@pytest.mark.asyncio
+async def test_send_writes_outbox_event_before_commit(message_service, mock_message_repo, mock_chat_repo, uow,
+                                                      mock_outbox_repo):
+    """Событие нового сообщения записывается в outbox в транзакции отправки."""
+    mock_chat_repo.user_has_access.return_value = True
+    mock_chat_repo.next_seq.return_value = 1
+    mock_message_repo.create.return_value = stored_message(1, 1)
+    committed_before = []
+    mock_outbox_repo.add.side_effect = lambda *_args: committed_before.append(uow.session.commit.await_count)
+
+    await message_service.send_message_once(1, 1, "Msg", origin="1:phone")
+
+    assert committed_before == [0]
+    uow.session.commit.assert_awaited_once()
+    chat_id, payload, origin = mock_outbox_repo.add.await_args.args
+    assert (chat_id, origin) == (1, "1:phone")
+    assert payload["type"] == "message"
+    assert (payload["id"], payload["seq"], payload["chat_id"]) == (101, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_send_writes_no_outbox_event(message_service, mock_message_repo, mock_chat_repo,
+                                                     mock_outbox_repo):
+    """Для повтора, найденного по индексу, событие не записывается."""
+    mock_chat_repo.user_has_access.return_value = True
+    mock_message_repo.get_by_client_message_id.return_value = None
+    mock_message_repo.create_once.return_value = (stored_message(1, 1), False)
+
+    await message_service.send_message_once(1, 1, "Msg", client_message_id="abc")
+
+    mock_outbox_repo.add.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_send_fans_out_to_inbox(message_service, mock_message_repo, mock_chat_repo, mock_inbox_repo):
+    """Новое сообщение раскладывается по входящим в той же транзакции, повтор - нет."""
+    mock_chat_repo.user_has_access.return_value = True
+    message = stored_message(1, 1)
+    mock_message_repo.create.return_value = message
+    mock_message_repo.get_by_client_message_id.return_value = message
+
+    await message_service.send_message(1, 1, "Msg")
+    await message_service.send_message(1, 1, "Msg", client_message_id="abc")
+
+    mock_inbox_repo.fan_out.assert_awaited_once_with(message, 500)
+
+
+@pytest.mark.asyncio
+async def test_inbox_merges_large_groups(message_service, mock_inbox_repo):
+    """Входящие объединяют проекцию и сообщения больших групп без дубликатов."""
+    mock_inbox_repo.get_messages.return_value = [stored_message(1, 3), stored_message(7, 1)]
+    mock_inbox_repo.get_large_group_chat_ids.return_value = [7]
+    mock_inbox_repo.get_chat_messages.return_value = [stored_message(7, 2), stored_message(7, 1)]
+
+    result = await message_service.get_inbox(1, limit=2)
+
+    mock_inbox_repo.get_chat_messages.assert_awaited_once_with([7], 1, 2, None)
+    assert [message.id for message in result] == [702, 701]
+
+
+@pytest.mark.asyncio
+async def test_inbox_without_large_groups_uses_projection_only(message_service, mock_inbox_repo):
+    """Без больших групп входящие читаются только из проекции."""
+    mock_inbox_repo.get_messages.return_value = [stored_message(1, 3)]
+    mock_inbox_repo.get_large_group_chat_ids.return_value = []
+
+    result = await message_service.get_inbox(1, before_id=500)
+
+    mock_inbox_repo.get_messages.assert_awaited_once_with(1, 50, 500)
+    mock_inbox_repo.get_chat_messages.assert_not_called()
+    assert [message.id for message in result] == [103]
+
+
+@pytest.mark.asyncio
+async def test_unread_counts(message_service, mock_inbox_repo):
+    """Счетчики непрочитанного объединяют проекцию и большие группы."""
+    mock_inbox_repo.unread_counts.return_value = [(1, 2), (3, 1)]
+    mock_inbox_repo.get_large_group_chat_ids.return_value = [7]
+    mock_inbox_repo.unread_chat_counts.return_value = [(7, 40)]
+
+    result = await message_service.get_unread_counts(1)
+
+    assert [(item.chat_id, item.unread) for item in result] == [(1, 2), (3, 1), (7, 40)]
+    mock_inbox_repo.unread_chat_counts.assert_awaited_once_with([7], 1, settings.inbox.unread_count_limit)
+
+
+@pytest.mark.asyncio
+async def test_mark_as_read_updates_reader_inbox(message_service, mock_message_repo, mock_inbox_repo,
+                                                 mock_outbox_repo):
+    """Прочтение помечает входящие читателя в чате до этого сообщения и записывает событие в outbox."""
+    mock_message_repo.mark_as_read.return_value = MagicMock(chat_id=5, seq=7)
+
+    assert await message_service.mark_as_read(42, reader_id=2, origin="2:phone") is True
+
+    mock_inbox_repo.mark_read.assert_awaited_once_with(2, 5, 42, 7)
+    mock_outbox_repo.add.assert_awaited_once_with(
+        5, {"type": "read", "message_id": 42, "chat_id": 5, "reader_id": 2}, "2:phone"
+    )
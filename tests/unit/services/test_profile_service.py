@@ -0,0 +1,123 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.cache import LRUCache
+from app.db.models import User
+from app.db.repositories.user import UserRepository
+from app.schemas.message import MessageRead
+from app.schemas.user import UserSummary
+from app.services.profile import ProfileService
+
+
+@pytest.fixture
+def mock_repo():
+    return AsyncMock(spec=UserRepository)
+
+
+@pytest.fixture
+def profile_service(mock_repo):
+    return ProfileService(mock_repo)
+
+
+@pytest.fixture(autouse=True)
+def cache():
+    """Изолированный LRU профилей для каждого теста."""
+    cache = LRUCache(maxsize=100)
+    with patch('app.services.profile.user_summaries', cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def search_cache():
+    """Изолированный кэш результатов поиска для каждого теста."""
+    cache = LRUCache(maxsize=100, ttl=60)
+    with patch('app.services.profile.user_search_results', cache):
+        yield cache
+
+
+def make_user(user_id: int) -> User:
+    user = MagicMock(spec=User)
+    user.id = user_id
+    user.username = f"user{user_id}"
+    return user
+
+
+def make_message(message_id: int, sender_id: int) -> MessageRead:
+    return MessageRead(
+        id=message_id, chat_id=1, seq=message_id, sender_id=sender_id, text="text", created_at="2025-01-01T00:00:00"
+    )
+
+
+@pytest.mark.asyncio
+async def test_attach_senders_single_batch(profile_service, mock_repo):
+    """Профили отправителей страницы загружаются одним батчем без дубликатов."""
+    mock_repo.load_many.return_value = [make_user(1), make_user(2)]
+    messages = [make_message(i, sender_id=1 + i % 2) for i in range(100)]
+
+    await profile_service.attach_senders(messages)
+
+    mock_repo.load_many.assert_awaited_once_with([1, 2])
+    assert messages[0].sender == UserSummary(id=1, username="user1")
+    assert messages[1].sender == UserSummary(id=2, username="user2")
+
+
+@pytest.mark.asyncio
+async def test_cached_summaries_skip_db(profile_service, mock_repo, cache):
+    """Профили из LRU не запрашиваются повторно."""
+    cache.set(1, UserSummary(id=1, username="user1"))
+    mock_repo.load_many.return_value = [make_user(2)]
+
+    summaries = await profile_service.get_summaries([1, 2])
+
+    mock_repo.load_many.assert_awaited_once_with([2])
+    assert set(summaries) == {1, 2}
+    assert cache.get(2) == UserSummary(id=2, username="user2")
+
+
+@pytest.mark.asyncio
+async def test_all_cached_no_query(profile_service, mock_repo, cache):
+    """Если все профили в кэше, запрос к БД не выполняется."""
+    cache.set(1, UserSummary(id=1, username="user1"))
+
+    await profile_service.get_summaries([1, 1])
+
+    mock_repo.load_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_search_caches_short_prefixes(profile_service, mock_repo):
+    """Результаты поиска по короткому префиксу кэшируются без учета регистра и пробелов."""
+    mock_repo.search_by_prefix.return_value = [make_user(1), make_user(2)]
+
+    first = await profile_service.search("Us", limit=2)
+    second = await profile_service.search(" us ", limit=2)
+
+    assert [user.id for user in first] == [1, 2]
+    assert second == first
+    mock_repo.search_by_prefix.assert_awaited_once_with("us", 2)
+    mock_repo.search_similar.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_search_blank_query(profile_service, mock_repo, search_cache):
+    """Запрос только из пробелов не обращается к БД и не кэшируется."""
+    assert await profile_service.search("   ", limit=2) == []
+
+    mock_repo.search_by_prefix.assert_not_called()
+    assert len(search_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_search_adds_similar_users(profile_service, mock_repo):
+    """Если совпадений по префиксу меньше limit, выдача дополняется похожими без повторов."""
+    mock_repo.search_by_prefix.return_value = [make_user(1)]
+    mock_repo.search_similar.return_value = [make_user(7)]
+
+    result = await profile_service.search("user1x", limit=3)
+
+    assert [user.id for user in result] == [1, 7]
+    mock_repo.search_similar.assert_awaited_once_with("user1x", 2, [1])
+
+    await profile_service.search("user1x", limit=3)
+    assert mock_repo.search_by_prefix.await_count == 2
@@ -0,0 +1,136 @@
+import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.http_cache import make_etag
+from app.db.repositories.chat import ChatRepository
+from app.db.repositories.retention import RetentionRepository
+from app.services.retention import GLOBAL_CHECKPOINT, MessageRetention
+
+NOW = datetime.datetime(2026, 1, 31, tzinfo=datetime.UTC)
+
+
+def row(position: int, days_ago: float):
+    return MagicMock(position=position, id=position * 10, created_at=NOW - datetime.timedelta(days=days_ago))
+
+
+@pytest.fixture
+def repo():
+    repo = AsyncMock(spec=RetentionRepository)
+    repo.get_position.return_value = 0
+    repo.get_chat_policies.return_value = []
+    repo.delete_messages.side_effect = lambda ids: [message_id // 10 % 2 + 1 for message_id in ids]
+    return repo
+
+
+@pytest.fixture
+def chat_repo():
+    return AsyncMock(spec=ChatRepository)
+
+
+@pytest.fixture(autouse=True)
+def session(repo, chat_repo):
+    """Сессии задачи и репозитории подменяются моками."""
+    db = AsyncMock()
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__.return_value = db
+    with (
+        patch('app.services.retention.write_session', session_factory),
+        patch('app.services.retention.RetentionRepository', return_value=repo),
+        patch('app.services.retention.ChatRepository', return_value=chat_repo),
+    ):
+        yield db
+
+
+@pytest.fixture
+def retention():
+    return MessageRetention(retention_days=30, batch_size=3, batch_pause=0)
+
+
+@pytest.mark.asyncio
+async def test_pass_stops_at_first_unexpired_message(retention, repo, session):
+    """Удаляется только префикс пачки с истекшим сроком, позиция не обгоняет оставшиеся сообщения."""
+    repo.get_messages_after.return_value = [row(1, 40), row(2, 31), row(3, 10)]
+
+    deleted = await retention.purge_pass(GLOBAL_CHECKPOINT, NOW - datetime.timedelta(days=30))
+
+    assert deleted == 2
+    repo.delete_messages.assert_awaited_once_with([10, 20])
+    repo.save_position.assert_awaited_once_with(GLOBAL_CHECKPOINT, 2)
+    session.commit.assert_awaited_once()
+    repo.get_messages_after.assert_awaited_once_with(0, 3, None)
+
+
+@pytest.mark.asyncio
+async def test_purge_changes_history_etag(retention, repo, chat_repo):
+    """Версии чатов удаленных сообщений увеличиваются в транзакции пачки - ETag истории меняется."""
+    versions = {1: 7, 2: 3}
+
+    async def bump_versions(chat_ids):
+        for chat_id in set(chat_ids):
+            versions[chat_id] += 1
+
+    chat_repo.bump_versions.side_effect = bump_versions
+    repo.get_messages_after.return_value = [row(1, 40), row(2, 40)]
+    etags = {chat_id: make_etag('history', chat_id, version) for chat_id, version in versions.items()}
+
+    await retention.purge_pass(GLOBAL_CHECKPOINT, NOW - datetime.timedelta(days=30))
+
+    # Сообщения 10 и 20 относятся к чатам 2 и 1
+    chat_repo.bump_versions.assert_awaited_once_with([2, 1])
+    assert versions == {1: 8, 2: 4}
+    assert all(make_etag('history', chat_id, versions[chat_id]) != etag for chat_id, etag in etags.items())
+
+
+@pytest.mark.asyncio
+async def test_pass_continues_from_checkpoint(retention, repo):
+    """Полная пачка продолжается следующей с сохраненной позиции; позиция читается из БД один раз."""
+    repo.get_position.return_value = 100
+    repo.get_messages_after.side_effect = [
+        [row(101, 60), row(102, 60), row(103, 60)],
+        [row(104, 60)],
+    ]
+
+    deleted = await retention.purge_pass('chat:5', NOW - datetime.timedelta(days=7), chat_id=5)
+
+    assert deleted == 4
+    assert [call.args for call in repo.get_messages_after.await_args_list] == [(100, 3, 5), (103, 3, 5)]
+    repo.get_position.assert_awaited_once_with('chat:5')
+    assert retention.stats()['batches'] == 2
+
+
+@pytest.mark.asyncio
+async def test_nothing_expired_keeps_position(retention, repo, chat_repo, session):
+    """Если срок ни одного сообщения не истек, ничего не удаляется и позиция не сохраняется."""
+    repo.get_messages_after.return_value = [row(1, 1)]
+
+    assert await retention.purge_pass(GLOBAL_CHECKPOINT, NOW - datetime.timedelta(days=30)) == 0
+
+    repo.delete_messages.assert_not_called()
+    chat_repo.bump_versions.assert_not_called()
+    repo.save_position.assert_not_called()
+    session.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_purge_runs_only_shorter_chat_policies(retention, repo):
+    """Проход чата выполняется, только если его срок короче общего."""
+    repo.get_chat_policies.return_value = [(5, 7), (6, 30)]
+    repo.get_messages_after.return_value = []
+
+    await retention.purge(now=NOW)
+
+    passes = [call.args[0] for call in repo.get_position.await_args_list]
+    assert passes == [GLOBAL_CHECKPOINT, 'chat:5']
+
+
+@pytest.mark.asyncio
+async def test_purge_without_global_retention(repo):
+    """Без общего срока удаляются только сообщения чатов с собственным сроком."""
+    repo.get_chat_policies.return_value = [(5, 365)]
+    repo.get_messages_after.return_value = []
+
+    await MessageRetention(retention_days=None, batch_size=3, batch_pause=0).purge(now=NOW)
+
+    repo.get_position.assert_awaited_once_with('chat:5')
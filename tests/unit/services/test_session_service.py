@@ -0,0 +1,131 @@
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.revocation import RevocationCache
+from app.core.security import decode_refresh_token, decode_token
+from app.db.repositories.session import SessionRepository
+from app.db.uow import UnitOfWork
+from app.schemas.token import Token
+from app.services.session import SessionService
+
+
+@pytest.fixture
+def mock_repo():
+    return AsyncMock(spec=SessionRepository)
+
+
+@pytest.fixture
+def uow():
+    return UnitOfWork(AsyncMock(spec=AsyncSession))
+
+
+@pytest.fixture
+def session_service(mock_repo, uow):
+    return SessionService(mock_repo, uow)
+
+
+@pytest.fixture(autouse=True)
+def cache():
+    """Изолированный кэш отозванных токенов для каждого теста."""
+    cache = RevocationCache(maxsize=100)
+    with patch('app.services.session.revocation_cache', cache):
+        yield cache
+
+
+@pytest.mark.asyncio
+async def test_issue_tokens(session_service, mock_repo):
+    """Выдача пары токенов создает сессию с jti refresh-токена."""
+    result = await session_service.issue_tokens(1)
+
+    assert isinstance(result, Token)
+    payload = decode_refresh_token(result.refresh_token)
+    assert payload['user_id'] == '1'
+    mock_repo.create_session.assert_called_once()
+    assert mock_repo.create_session.call_args[0][:2] == (1, payload['jti'])
+    assert decode_refresh_token(result.access_token) is None
+    assert decode_token(result.access_token)['user_id'] == '1'
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_token(session_service, mock_repo, cache):
+    """Обновление отзывает использованный токен и выдает новую пару."""
+    tokens = await session_service.issue_tokens(1)
+    old_jti = decode_refresh_token(tokens.refresh_token)['jti']
+    mock_repo.consume.return_value = 1
+
+    result = await session_service.refresh(tokens.refresh_token)
+
+    mock_repo.consume.assert_called_once_with(old_jti)
+    assert cache.is_revoked(old_jti)
+    assert decode_refresh_token(result.refresh_token)['jti'] != old_jti
+
+
+@pytest.mark.asyncio
+async def test_refresh_revoked_in_cache(session_service, mock_repo, cache):
+    """Повторное использование токена отклоняется по кэшу без ротации в БД."""
+    tokens = await session_service.issue_tokens(1)
+    payload = decode_refresh_token(tokens.refresh_token)
+    cache.revoke(payload['jti'], payload['exp'])
+    mock_repo.revoke_user_sessions.return_value = []
+
+    with pytest.raises(ValueError, match="отозван"):
+        await session_service.refresh(tokens.refresh_token)
+
+    mock_repo.consume.assert_not_called()
+    mock_repo.revoke_user_sessions.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_refresh_repeated_reuse_skips_revoke_all(session_service, mock_repo, cache):
+    """Повторные предъявления отозванного токена не отзывают сессии в БД заново."""
+    tokens = await session_service.issue_tokens(1)
+    payload = decode_refresh_token(tokens.refresh_token)
+    cache.revoke(payload['jti'], payload['exp'])
+    mock_repo.revoke_user_sessions.return_value = []
+
+    for _ in range(3):
+        with pytest.raises(ValueError, match="отозван"):
+            await session_service.refresh(tokens.refresh_token)
+
+    assert cache.is_reused(payload['jti'])
+    mock_repo.revoke_user_sessions.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_refresh_reuse_revokes_all_sessions(session_service, mock_repo, cache):
+    """Предъявление уже отозванной в БД сессии отзывает все сессии пользователя."""
+    tokens = await session_service.issue_tokens(1)
+    mock_repo.consume.return_value = None
+    other_expires_at = datetime.now(UTC) + timedelta(days=1)
+    mock_repo.revoke_user_sessions.return_value = [("other-jti", other_expires_at)]
+
+    with pytest.raises(ValueError, match="отозван"):
+        await session_service.refresh(tokens.refresh_token)
+
+    assert cache.is_revoked("other-jti")
+
+
+@pytest.mark.asyncio
+async def test_refresh_with_access_token(session_service, mock_repo):
+    """Access-токен не может использоваться для обновления."""
+    tokens = await session_service.issue_tokens(1)
+
+    with pytest.raises(ValueError, match="Недействительный"):
+        await session_service.refresh(tokens.access_token)
+
+    mock_repo.consume.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_revoke(session_service, mock_repo, cache):
+    """Выход из сессии отзывает refresh-токен."""
+    tokens = await session_service.issue_tokens(1)
+    jti = decode_refresh_token(tokens.refresh_token)['jti']
+
+    await session_service.revoke(tokens.refresh_token)
+
+    mock_repo.consume.assert_called_once_with(jti)
+    assert cache.is_revoked(jti)
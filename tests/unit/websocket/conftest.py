@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture
+def flush():
+    """Ожидание отправки очередей подключений (рассылка только ставит сообщения в очередь)."""
+    async def flush(*connections):
+        for connection in connections:
+            if connection.writer is not None:
+                await connection.writer
+    return flush
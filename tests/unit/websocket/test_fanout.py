@@ -0,0 +1,134 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.websocket.fanout import FanoutMetrics, ShardedChat
+from app.websocket.manager import ConnectionManager
+from app.websocket.registry import Connection
+
+
+async def wait_idle(sharded: ShardedChat):
+    for shard in sharded.shards:
+        await shard.queue.join()
+
+
+@pytest.mark.asyncio
+async def test_sharded_chat_delivers_to_all_but_sender():
+    """Каждый участник, кроме отправителя, получает сообщение ровно один раз."""
+    send = AsyncMock()
+    metrics = FanoutMetrics(maxsize=10)
+    sharded = ShardedChat(1, send, metrics, shards=4, queue_size=10, yield_every=2)
+    connections = [Connection(user_id, AsyncMock()) for user_id in range(10)]
+    for connection in connections:
+        sharded.add(connection)
+
+    sharded.publish("hello", exclude=connections[3])
+    await wait_idle(sharded)
+    sharded.close()
+
+    assert sorted(call.args[0].user_id for call in send.await_args_list) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    stats = metrics.snapshot()[1]
+    assert stats["deliveries"] == 1
+    assert stats["recipients"] == 9
+
+
+@pytest.mark.asyncio
+async def test_failed_send_does_not_stop_shard():
+    """Ошибка отправки одному клиенту не останавливает доставку остальным."""
+    send = AsyncMock(side_effect=[RuntimeError("closed"), None])
+    sharded = ShardedChat(1, send, FanoutMetrics(maxsize=10), shards=1, queue_size=10, yield_every=10)
+    sharded.add(Connection(1, AsyncMock()))
+    sharded.add(Connection(2, AsyncMock()))
+
+    sharded.publish("hello")
+    await wait_idle(sharded)
+    sharded.close()
+
+    assert send.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_and_counts():
+    """Сообщение сверх емкости очереди шарда отбрасывается и учитывается в метриках."""
+    release = asyncio.Event()
+
+    async def slow_send(*_):
+        await release.wait()
+
+    metrics = FanoutMetrics(maxsize=10)
+    sharded = ShardedChat(1, slow_send, metrics, shards=1, queue_size=1, yield_every=10)
+    sharded.add(Connection(1, AsyncMock()))
+
+    sharded.publish("first")
+    await asyncio.sleep(0)
+    sharded.publish("second")
+    sharded.publish("third")
+    release.set()
+    await wait_idle(sharded)
+    sharded.close()
+
+    assert metrics.snapshot()[1]["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_manager_promotes_and_demotes_large_chat(flush):
+    """Чат переходит в шардированный режим по порогу подключений и возвращается из него."""
+    manager = ConnectionManager(large_chat_threshold=4)
+    connections = [await manager.connect(user_id, AsyncMock()) for user_id in range(4)]
+    for connection in connections:
+        await manager.subscribe(connection, 1)
+
+    assert 1 in manager.large_chats
+
+    await manager.broadcast_to_chat("hello", 1, exclude=connections[0])
+    await wait_idle(manager.large_chats[1])
+    await flush(*connections)
+    for connection in connections[1:]:
+        connection.websocket.send_text.assert_awaited_once_with("hello")
+
+    for connection in connections[:3]:
+        manager.disconnect(connection)
+
+    assert 1 not in manager.large_chats
+
+
+@pytest.mark.asyncio
+async def test_large_chat_is_demoted_below_half_of_threshold():
+    """Чат у границы порога не переключается обратно: возврат в обычный режим - ниже половины порога."""
+    manager = ConnectionManager(large_chat_threshold=4)
+    connections = [await manager.connect(user_id, AsyncMock()) for user_id in range(4)]
+    for connection in connections:
+        await manager.subscribe(connection, 1)
+
+    manager.unsubscribe(connections[0], 1)
+    assert 1 in manager.large_chats
+
+    await manager.subscribe(connections[0], 1)
+    manager.unsubscribe(connections[0], 1)
+    manager.unsubscribe(connections[1], 1)
+    assert 1 in manager.large_chats
+
+    manager.unsubscribe(connections[2], 1)
+    assert 1 not in manager.large_chats
+
+
+@pytest.mark.asyncio
+async def test_chat_with_many_members_is_promoted():
+    """Чат с числом участников выше порога шардируется уже при первых подключениях."""
+    manager = ConnectionManager(large_chat_threshold=100, large_chat_member_threshold=1_000)
+    first = await manager.connect(1, AsyncMock())
+    second = await manager.connect(2, AsyncMock())
+
+    await manager.subscribe(first, 1, members=1_000)
+    assert 1 in manager.large_chats
+    await manager.subscribe(second, 1, members=1_000)
+
+    manager.unsubscribe(first, 1)
+    assert 1 in manager.large_chats
+    manager.unsubscribe(second, 1)
+    assert 1 not in manager.large_chats
+    assert manager.chat_members == {}
+
+    await manager.subscribe(first, 2, members=50)
+    assert 2 not in manager.large_chats
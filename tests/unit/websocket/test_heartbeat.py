@@ -0,0 +1,97 @@
+import json
+import math
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.websocket.heartbeat import HeartbeatMonitor, TimerWheel
+from app.websocket.manager import ConnectionManager
+from app.websocket.registry import Connection
+
+
+def test_wheel_returns_only_due_items():
+    """Колесо возвращает элементы только после наступления их срока."""
+    wheel = TimerWheel(tick=1, slots=10, now=0)
+    wheel.schedule("a", 2)
+    wheel.schedule("b", 5)
+
+    assert wheel.advance(1) == []
+    assert wheel.advance(2) == ["a"]
+    assert wheel.advance(4) == []
+    assert wheel.advance(5) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_wheel_reschedule_and_cancel():
+    """Перенос срока и отмена работают без просмотра остальных ячеек."""
+    wheel = TimerWheel(tick=1, slots=10, now=0)
+    wheel.schedule("a", 2)
+    wheel.schedule("b", 2)
+    wheel.schedule("a", 6)
+    wheel.cancel("b")
+
+    assert wheel.advance(3) == []
+    assert wheel.advance(6) == ["a"]
+
+
+def test_wheel_catches_up_after_long_pause():
+    """Отставание больше оборота колеса не теряет элементы."""
+    wheel = TimerWheel(tick=1, slots=4, now=0)
+    wheel.schedule("a", 3)
+
+    assert wheel.advance(100) == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_silent_connection_is_pinged_then_expired():
+    """Молчащее подключение получает ping, а не ответившее на него закрывается."""
+    on_expire = AsyncMock()
+    monitor = HeartbeatMonitor(on_expire, interval=10, timeout=30, tick=1)
+    monitor.wheel = TimerWheel(tick=1, slots=32, now=0)
+    connection = Connection(1, AsyncMock())
+    monitor.track(connection)
+
+    await monitor.tick(10)
+    connection.websocket.send_text.assert_awaited_once_with(json.dumps({"type": "ping"}))
+    on_expire.assert_not_called()
+
+    await monitor.tick(30)
+    on_expire.assert_awaited_once_with(connection)
+    assert monitor.stats() == {"live": 0, "expired": 1, "pings_sent": 1}
+
+
+@pytest.mark.asyncio
+async def test_pong_keeps_connection_alive():
+    """Ответ на ping продлевает срок подключения."""
+    on_expire = AsyncMock()
+    monitor = HeartbeatMonitor(on_expire, interval=10, timeout=30, tick=1)
+    monitor.wheel = TimerWheel(tick=1, slots=32, now=0)
+    connection = Connection(1, AsyncMock())
+    monitor.track(connection)
+
+    await monitor.tick(10)
+    monitor.touch(connection)
+    await monitor.tick(30)
+
+    on_expire.assert_not_called()
+    assert monitor.stats()["live"] == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_connection_is_removed_from_manager():
+    """Мертвое подключение удаляется из менеджера и не получает рассылок."""
+    manager = ConnectionManager()
+    monitor = manager.heartbeat
+    monitor.wheel = TimerWheel(tick=1, slots=math.ceil(monitor.timeout) + 2, now=0)
+    connection = await manager.connect(1, AsyncMock())
+    await manager.subscribe(connection, 5)
+
+    await monitor.tick(monitor.interval)
+    await monitor.tick(monitor.timeout)
+    await manager.broadcast_to_chat("hello", 5)
+
+    assert len(manager.registry) == 0
+    assert monitor.stats() == {"live": 0, "expired": 1, "pings_sent": 1}
+    connection.websocket.close.assert_awaited_once()
+    # Подключение получило только ping, рассылка после закрытия до него не дошла
+    connection.websocket.send_text.assert_awaited_once_with(json.dumps({"type": "ping"}))
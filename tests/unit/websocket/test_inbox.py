@@ -0,0 +1,87 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.websocket.inbox import PendingInbox
+from app.websocket.manager import ConnectionManager
+
+
+def test_drain_returns_single_batched_frame():
+    """Накопленные события отдаются одним фреймом в порядке поступления."""
+    inbox = PendingInbox(maxlen=10, ttl=60, max_users=10)
+    inbox.push(1, 5, json.dumps({"type": "message", "id": 1}))
+    inbox.push(1, 6, json.dumps({"type": "read", "message_id": 1}))
+
+    frame = json.loads(inbox.drain(1))
+
+    assert frame == {
+        "type": "pending",
+        "events": [
+            {"chat_id": 5, "event": {"type": "message", "id": 1}},
+            {"chat_id": 6, "event": {"type": "read", "message_id": 1}},
+        ],
+    }
+    assert inbox.drain(1) is None
+
+
+def test_inbox_is_bounded():
+    """Хранятся только последние maxlen событий."""
+    inbox = PendingInbox(maxlen=2, ttl=60, max_users=10)
+    for message_id in range(5):
+        inbox.push(1, 5, json.dumps({"id": message_id}))
+
+    events = json.loads(inbox.drain(1))["events"]
+
+    assert [event["event"]["id"] for event in events] == [3, 4]
+
+
+def test_expired_events_and_watchers_are_dropped():
+    """Просроченные события и наблюдатели не учитываются."""
+    inbox = PendingInbox(maxlen=10, ttl=10, max_users=10)
+    with patch("app.websocket.inbox.time.monotonic", return_value=100.0):
+        inbox.watch(5, 1)
+        inbox.push(1, 5, "{}")
+    with patch("app.websocket.inbox.time.monotonic", return_value=111.0):
+        assert inbox.watchers(5) == []
+        assert inbox.drain(1) is None
+
+
+def test_expired_watchers_of_quiet_chats_are_pruned():
+    """Просроченные наблюдатели удаляются, даже если в их чаты больше ничего не рассылается."""
+    inbox = PendingInbox(maxlen=10, ttl=10, max_users=10)
+    with patch("app.websocket.inbox.time.monotonic", return_value=100.0):
+        for chat_id in range(100):
+            inbox.watch(chat_id, 1)
+    with patch("app.websocket.inbox.time.monotonic", return_value=105.0):
+        inbox.watch(0, 1)
+
+    with patch("app.websocket.inbox.time.monotonic", return_value=111.0):
+        assert inbox.drain(2) is None
+
+    # Остался только наблюдатель, срок которого продлен повторным watch
+    assert inbox.watcher_count == 1
+    with patch("app.websocket.inbox.time.monotonic", return_value=111.0):
+        assert inbox.watchers(0) == [1]
+
+
+@pytest.mark.asyncio
+async def test_missed_broadcast_is_delivered_on_reconnect():
+    """Событие, разосланное во время отключения, приходит при повторном подключении."""
+    manager = ConnectionManager()
+    sender = await manager.connect(1, AsyncMock())
+    await manager.subscribe(sender, 5)
+    receiver = await manager.connect(2, AsyncMock())
+    await manager.subscribe(receiver, 5)
+    manager.disconnect(receiver)
+
+    await manager.broadcast_to_chat(json.dumps({"type": "message", "id": 7}), 5, exclude=sender)
+
+    connection = await manager.connect(2, AsyncMock())
+
+    frame = json.loads(connection.websocket.send_text.await_args.args[0])
+    assert frame["events"] == [{"chat_id": 5, "event": {"type": "message", "id": 7}}]
+    assert manager.inbox.watchers(5) == [2]
+
+    await manager.subscribe(connection, 5)
+    assert manager.inbox.watchers(5) == []
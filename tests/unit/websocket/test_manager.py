@@ -0,0 +1,243 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.config import FrameRateLimit
+from app.core.admission import AdmissionController
+from app.core.ratelimit import FrameRateLimiter
+from app.services.message import MessageService
+from app.websocket.manager import ConnectionManager
+
+
+@pytest.fixture
+def manager():
+    return ConnectionManager()
+
+
+@pytest.fixture
+def message_service():
+    return AsyncMock(spec=MessageService)
+
+
+async def hang(_message):
+    """Отправка в зависший сокет: не завершается никогда."""
+    await asyncio.Event().wait()
+
+
+def last_frame(connection) -> dict:
+    return json.loads(connection.websocket.send_text.await_args.args[0])
+
+
+@pytest.mark.asyncio
+async def test_subscribe_checks_access(manager, message_service):
+    """Подписка выполняется только на доступные пользователю чаты."""
+    connection = await manager.connect(1, AsyncMock())
+    message_service.get_member_count.side_effect = lambda _user_id, chat_id: 2 if chat_id == 5 else None
+
+    await manager.handle_message(connection, json.dumps({"type": "subscribe", "chat_id": 5}), message_service)
+    assert last_frame(connection) == {"type": "subscribed", "chat_id": 5}
+
+    await manager.handle_message(connection, json.dumps({"type": "subscribe", "chat_id": 6}), message_service)
+    assert last_frame(connection) == {"error": "Access denied", "chat_id": 6}
+
+    assert connection.chats == {5}
+    assert manager.chat_connections == {5: {connection}}
+
+
+@pytest.mark.asyncio
+async def test_one_socket_receives_events_of_all_subscribed_chats(manager, message_service, flush):
+    """Один сокет получает события всех чатов, на которые подписан."""
+    message_service.get_member_count.return_value = 2
+    connection = await manager.connect(1, AsyncMock())
+    for chat_id in (5, 6):
+        await manager.handle_message(connection, json.dumps({"type": "subscribe", "chat_id": chat_id}), message_service)
+
+    await manager.broadcast_to_chat("from 5", 5)
+    await manager.broadcast_to_chat("from 6", 6)
+    await manager.broadcast_to_chat("from 7", 7)
+    await flush(connection)
+
+    sent = [call.args[0] for call in connection.websocket.send_text.await_args_list]
+    assert sent[-2:] == ["from 5", "from 6"]
+
+
+@pytest.mark.asyncio
+async def test_message_requires_subscription(manager, message_service):
+    """Отправка в чат без подписки отклоняется без обращения к сервису."""
+    connection = await manager.connect(1, AsyncMock())
+
+    await manager.handle_message(
+        connection, json.dumps({"type": "message", "chat_id": 5, "text": "hi"}), message_service
+    )
+
+    assert last_frame(connection) == {"error": "Not subscribed", "chat_id": 5}
+    message_service.send_message_once.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_message_is_saved_with_origin_without_direct_broadcast(manager, message_service):
+    """Сообщение сохраняется с устройством-источником; рассылка выполняется только из outbox."""
+    message_service.get_member_count.return_value = 2
+    message = MagicMock(id=1, chat_id=5, sender_id=1, text="hi", sender=None, client_message_id=None, seq=1)
+    message_service.send_message_once.return_value = (message, True)
+    sender = await manager.connect(1, AsyncMock(), "phone")
+    receiver = await manager.connect(2, AsyncMock())
+    await manager.subscribe(sender, 5)
+    await manager.subscribe(receiver, 5)
+
+    await manager.handle_message(
+        sender, json.dumps({"type": "message", "chat_id": 5, "text": "hi"}), message_service
+    )
+
+    assert message_service.send_message_once.await_args.kwargs["origin"] == "1:phone"
+    receiver.websocket.send_text.assert_not_called()
+    sender.websocket.send_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_message_is_acked_without_broadcast(manager, message_service):
+    """Повтор фрейма с client_message_id подтверждается отправителю и не рассылается повторно."""
+    message_service.get_member_count.return_value = 2
+    message = MagicMock(id=1, chat_id=5, sender_id=1, text="hi", sender=None, client_message_id="abc", seq=1)
+    message_service.send_message_once.return_value = (message, False)
+    sender = await manager.connect(1, AsyncMock())
+    receiver = await manager.connect(2, AsyncMock())
+    await manager.subscribe(sender, 5)
+    await manager.subscribe(receiver, 5)
+    receiver.websocket.send_text.reset_mock()
+
+    await manager.handle_message(
+        sender, json.dumps({"type": "message", "chat_id": 5, "text": "hi", "client_message_id": "abc"}), message_service
+    )
+
+    assert last_frame(sender) == {
+        "type": "sent", "id": 1, "seq": 1, "chat_id": 5, "client_message_id": "abc", "duplicate": True
+    }
+    receiver.websocket.send_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_published_event_skips_origin_device(manager, flush):
+    """Событие outbox рассылается подписчикам чата, кроме устройства-источника."""
+    phone = await manager.connect(1, AsyncMock(), "phone")
+    laptop = await manager.connect(1, AsyncMock(), "laptop")
+    receiver = await manager.connect(2, AsyncMock())
+    for connection in (phone, laptop, receiver):
+        await manager.subscribe(connection, 5)
+
+    await manager.publish(5, {"type": "message", "id": 1, "chat_id": 5}, "1:phone")
+    await manager.publish(5, {"type": "read", "message_id": 1, "chat_id": 5}, "3:other-worker")
+    await flush(phone, laptop, receiver)
+
+    assert last_frame(phone)["type"] == "read"
+    phone.websocket.send_text.assert_awaited_once()
+    assert [json.loads(call.args[0])["type"] for call in laptop.websocket.send_text.await_args_list] == [
+        "message", "read"
+    ]
+    assert last_frame(receiver) == {"type": "read", "message_id": 1, "chat_id": 5}
+
+
+@pytest.mark.asyncio
+async def test_disconnect_removes_only_closed_socket(manager, flush):
+    """Отключение одного сокета не затрагивает другие сокеты пользователя."""
+    first = await manager.connect(1, AsyncMock())
+    second = await manager.connect(1, AsyncMock())
+    await manager.subscribe(first, 5)
+    await manager.subscribe(second, 5)
+
+    manager.disconnect(first)
+    await manager.broadcast_to_chat("hello", 5)
+    await flush(second)
+
+    assert manager.registry.devices(1) == [second]
+    second.websocket.send_text.assert_awaited_with("hello")
+    assert manager.inbox.watchers(5) == []
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_frame_gets_error_without_db_work(manager, message_service):
+    """Фрейм сверх лимита получает ошибку rate_limited и не доходит до сервиса."""
+    manager.rate_limiter = FrameRateLimiter(
+        {"message": FrameRateLimit(user_rate=1, user_burst=1, chat_rate=10, chat_burst=10)}, maxsize=10
+    )
+    message = MagicMock(id=1, chat_id=5, sender_id=1, text="hi", sender=None, client_message_id=None, seq=1)
+    message.created_at.isoformat.return_value = "2024-01-01T00:00:00"
+    message_service.send_message_once.return_value = (message, True)
+    connection = await manager.connect(1, AsyncMock())
+    await manager.subscribe(connection, 5)
+    frame = json.dumps({"type": "message", "chat_id": 5, "text": "hi"})
+
+    await manager.handle_message(connection, frame, message_service)
+    await manager.handle_message(connection, frame, message_service)
+
+    error = last_frame(connection)
+    assert error["code"] == "rate_limited"
+    assert error["type"] == "message"
+    assert error["retry_after"] > 0
+    message_service.send_message_once.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_overloaded_frame_is_rejected(manager, message_service, monkeypatch):
+    """При перегрузке БД фрейм отклоняется ошибкой overloaded без обращения к сервису."""
+    controller = AdmissionController(max_in_flight=0, read_share=1, wait_threshold=1, alpha=1, half_life=1)
+    monkeypatch.setattr("app.websocket.manager.admission", controller)
+    connection = await manager.connect(1, AsyncMock())
+
+    await manager.handle_message(connection, json.dumps({"type": "subscribe", "chat_id": 5}), message_service)
+
+    error = last_frame(connection)
+    assert error["code"] == "overloaded"
+    assert error["retry_after"] >= 1
+    message_service.get_member_count.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_read_is_limited_to_frame_chat(manager, message_service):
+    """Фрейм read помечает сообщение только в чате фрейма, на который подписано подключение."""
+    connection = await manager.connect(1, AsyncMock(), "phone")
+    await manager.subscribe(connection, 5)
+
+    await manager.handle_message(
+        connection, json.dumps({"type": "read", "chat_id": 5, "message_id": 42}), message_service
+    )
+
+    message_service.mark_as_read.assert_awaited_once_with(42, reader_id=1, origin="1:phone", chat_id=5)
+
+
+@pytest.mark.asyncio
+async def test_stuck_socket_does_not_block_broadcast(manager, flush):
+    """Зависший сокет не задерживает рассылку: остальные получают событие, а он закрывается по таймауту."""
+    manager.send_timeout = 0.01
+    stuck = await manager.connect(1, AsyncMock())
+    receiver = await manager.connect(2, AsyncMock())
+    stuck.websocket.send_text.side_effect = hang
+    for connection in (stuck, receiver):
+        await manager.subscribe(connection, 5)
+
+    await manager.broadcast_to_chat("hello", 5)
+    await flush(receiver)
+    receiver.websocket.send_text.assert_awaited_once_with("hello")
+
+    await flush(stuck)
+    stuck.websocket.close.assert_awaited_once()
+    assert manager.registry.devices(1) == []
+
+
+@pytest.mark.asyncio
+async def test_overflowing_send_queue_drops_connection(manager, flush):
+    """Получатель, накопивший send_queue_size неотправленных сообщений, отключается."""
+    manager.send_queue_size = 2
+    slow = await manager.connect(1, AsyncMock())
+    slow.websocket.send_text.side_effect = hang
+    await manager.subscribe(slow, 5)
+
+    for i in range(4):
+        await manager.broadcast_to_chat(f"msg {i}", 5)
+    await flush(slow)
+
+    slow.websocket.close.assert_awaited_once()
+    assert manager.registry.devices(1) == []
+    assert 5 not in manager.chat_connections
@@ -0,0 +1,126 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.websocket.outbox import OutboxDispatcher
+
+
+def event(event_id: int, chat_id: int = 5):
+    return MagicMock(id=event_id, chat_id=chat_id, payload={"type": "message", "id": event_id}, origin=None)
+
+
+@pytest.fixture
+def handler():
+    return AsyncMock()
+
+
+@pytest.fixture
+def dispatcher(handler):
+    dispatcher = OutboxDispatcher(handler, gap_timeout=5.0)
+    dispatcher.cursor = 10
+    return dispatcher
+
+
+def delivered_ids(handler) -> list[int]:
+    return [call.args[1]["id"] for call in handler.await_args_list]
+
+
+@pytest.mark.asyncio
+async def test_events_are_dispatched_in_order(dispatcher, handler):
+    """События передаются обработчику по порядку, курсор сдвигается на последнее."""
+    assert await dispatcher.dispatch([event(11), event(12), event(13)], now=0) == 3
+
+    assert delivered_ids(handler) == [11, 12, 13]
+    handler.assert_awaited_with(5, {"type": "message", "id": 13}, None)
+    assert dispatcher.cursor == 13
+
+
+@pytest.mark.asyncio
+async def test_late_commit_is_delivered_once(dispatcher, handler):
+    """Событие, зафиксированное позже следующего, доставляется; следующее не дублируется."""
+    await dispatcher.dispatch([event(12)], now=0)
+    assert dispatcher.cursor == 10
+
+    # Повторное чтение после фиксации 11 возвращает и уже доставленное 12
+    assert await dispatcher.dispatch([event(11), event(12)], now=1) == 1
+
+    assert delivered_ids(handler) == [12, 11]
+    assert dispatcher.cursor == 12
+    assert dispatcher.stats()["ahead_of_cursor"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_gap_is_closed_by_snapshot(dispatcher, handler):
+    """Пропуск закрывается, когда xmin снимка дошел до горизонта: транзакция пропущенного ID откачена."""
+    await dispatcher.dispatch([event(12), event(13)], now=0)
+
+    # Следующий опрос запоминает горизонт: xmax снимка после чтения 13
+    dispatcher.settle(13, (100, 105))
+    await dispatcher.dispatch([event(12), event(13)], now=1)
+    assert dispatcher.cursor == 10
+
+    # Транзакция 104 еще идет - пропуск не закрывается
+    dispatcher.settle(13, (104, 106))
+    assert dispatcher.cursor == 10
+
+    dispatcher.settle(13, (105, 106))
+    assert dispatcher.cursor == 13
+    assert dispatcher.stats()["rolled_back"] == 1
+    assert dispatcher.stats()["late"] == dispatcher.stats()["lost"] == 0
+    assert delivered_ids(handler) == [12, 13]
+
+
+@pytest.mark.asyncio
+async def test_settle_respects_partial_read(dispatcher):
+    """Если прочитана полная пачка, пропуски выше последнего прочитанного ID не закрываются."""
+    await dispatcher.dispatch([event(12), event(15)], now=0)
+    dispatcher.settle(15, (100, 105))
+
+    dispatcher.settle(15, (105, 106), covered=12)
+
+    assert dispatcher.cursor == 12
+    assert dispatcher.rolled_back == 1
+
+
+@pytest.mark.asyncio
+async def test_gap_after_timeout_is_delivered_late(dispatcher, handler):
+    """Через gap_timeout курсор идет дальше, но пропущенный ID перечитывается и доставляется после фиксации."""
+    await dispatcher.dispatch([event(12), event(13)], now=0)
+    await dispatcher.dispatch([event(12), event(13)], now=4)
+    assert dispatcher.cursor == 10
+
+    await dispatcher.dispatch([event(12), event(13)], now=5)
+    assert dispatcher.cursor == 13
+    assert dispatcher.stats()["unresolved"] == 1
+
+    # Перечитанное событие 11 зафиксировано позже
+    assert await dispatcher.dispatch([event(11)], now=6) == 1
+
+    assert delivered_ids(handler) == [12, 13, 11]
+    assert dispatcher.stats()["unresolved"] == 0
+    assert dispatcher.stats()["late"] == 1
+    assert dispatcher.stats()["rolled_back"] == 0
+
+
+@pytest.mark.asyncio
+async def test_unresolved_gap_is_lost_after_retention(dispatcher):
+    """Пропуск, не разрешившийся за срок хранения событий, считается потерянным, а не откаченным."""
+    await dispatcher.dispatch([event(12)], now=0)
+    await dispatcher.dispatch([event(12)], now=5)
+    assert dispatcher.stats()["unresolved"] == 1
+
+    await dispatcher.dispatch([], now=5 + dispatcher.retention)
+
+    assert dispatcher.stats()["unresolved"] == 0
+    assert dispatcher.lost == 1
+    assert dispatcher.rolled_back == 0
+
+
+@pytest.mark.asyncio
+async def test_handler_error_does_not_stop_batch(dispatcher, handler):
+    """Ошибка обработки одного события не прерывает доставку остальных."""
+    handler.side_effect = [RuntimeError("boom"), None]
+
+    assert await dispatcher.dispatch([event(11), event(12)], now=0) == 2
+
+    assert dispatcher.cursor == 12
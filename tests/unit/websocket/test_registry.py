@@ -0,0 +1,92 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.websocket.manager import ConnectionManager
+from app.websocket.registry import Connection, ConnectionRegistry
+
+
+def test_register_multiple_devices():
+    """У пользователя может быть несколько подключений с разных устройств."""
+    registry = ConnectionRegistry()
+    phone = Connection(1, AsyncMock(), "phone")
+    laptop = Connection(1, AsyncMock(), "laptop")
+
+    assert registry.register(phone) is None
+    assert registry.register(laptop) is None
+
+    assert set(registry.devices(1)) == {phone, laptop}
+    assert len(registry) == 2
+    assert registry.user_count == 1
+
+
+def test_same_device_replaces_previous_connection():
+    """Повторное подключение устройства заменяет прежнее, а его отключение не удаляет новое."""
+    registry = ConnectionRegistry()
+    old = Connection(1, AsyncMock(), "phone")
+    new = Connection(1, AsyncMock(), "phone")
+    registry.register(old)
+
+    assert registry.register(new) is old
+    assert registry.unregister(old) is False
+    assert registry.get(1, "phone") is new
+    assert len(registry) == 1
+
+    assert registry.unregister(new) is True
+    assert not registry.is_online(1)
+    assert len(registry) == 0
+
+
+def test_connection_has_no_instance_dict():
+    """Запись подключения не содержит __dict__."""
+    assert not hasattr(Connection(1, AsyncMock()), "__dict__")
+
+
+@pytest.mark.asyncio
+async def test_delivery_state_is_tracked_per_device():
+    """Успешные и неудачные отправки учитываются для каждого устройства."""
+    connection = Connection(1, AsyncMock(), "phone")
+    await connection.send("hello")
+
+    connection.websocket.send_text.side_effect = RuntimeError("closed")
+    with pytest.raises(RuntimeError):
+        await connection.send("hello")
+
+    state = connection.state()
+    assert state["delivered"] == 1
+    assert state["failed"] == 1
+    assert state["last_delivered_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_senders_other_devices(flush):
+    """Сообщение доходит до других устройств отправителя, но не до сокета-отправителя."""
+    manager = ConnectionManager()
+    phone = await manager.connect(1, AsyncMock(), "phone")
+    laptop = await manager.connect(1, AsyncMock(), "laptop")
+    await manager.subscribe(phone, 5)
+    await manager.subscribe(laptop, 5)
+
+    await manager.broadcast_to_chat("hello", 5, exclude=phone)
+    await flush(phone, laptop)
+
+    laptop.websocket.send_text.assert_awaited_once_with("hello")
+    phone.websocket.send_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_closes_replaced_socket(flush):
+    """Переподключение устройства закрывает прежний сокет и переносит доставку на новый."""
+    manager = ConnectionManager()
+    old = await manager.connect(1, AsyncMock(), "phone")
+    await manager.subscribe(old, 5)
+
+    new = await manager.connect(1, AsyncMock(), "phone")
+    await manager.subscribe(new, 5)
+    manager.disconnect(old)
+    await manager.broadcast_to_chat("hello", 5)
+    await flush(old, new)
+
+    old.websocket.close.assert_awaited_once()
+    old.websocket.send_text.assert_not_called()
+    new.websocket.send_text.assert_awaited_once_with("hello")